@@ -0,0 +1,59 @@
+"""
+Micro-benchmark del costo de autorización por request (dependencia de get_current_user),
+con y sin la cache de tokens verificados. No necesita base de datos.
+
+Uso, desde la raíz del proyecto:
+
+    python -m benchmarks.autenticacion [iteraciones]
+"""
+import sys
+import time
+
+from shared.cache import cache_tokens
+from shared.constante import Rol
+from shared.permission import get_current_user, claims_usuario
+from shared.revocacion import registro_revocaciones
+from shared.utils import create_access_token
+
+
+def _medir(dependencia, token: str, iteraciones: int, limpiar_cache: bool) -> float:
+    inicio = time.perf_counter()
+
+    for _ in range(iteraciones):
+        if limpiar_cache:
+            cache_tokens.limpiar()
+
+        dependencia(token, None)
+
+    return (time.perf_counter() - inicio) / iteraciones
+
+
+def main(iteraciones: int = 20000):
+    # Registro de revocaciones vacío, como si ya se hubiese cargado desde la base de datos
+    registro_revocaciones.cargado = True
+
+    token = create_access_token(claims_usuario({
+        'usuarioId': 1,
+        'rolId': Rol.ADMINISTRADOR,
+        'estado': 'AC',
+        'tokenVersion': 0,
+        'nombre': 'Administrador',
+        'correo': 'admin@itla.edu.do'
+    }))
+
+    dependencia = get_current_user(Rol.ADMINISTRADOR)
+
+    # Calentamiento
+    _medir(dependencia, token, 1000, True)
+
+    sin_cache = _medir(dependencia, token, iteraciones, True)
+    con_cache = _medir(dependencia, token, iteraciones, False)
+
+    print(f"iteraciones:           {iteraciones}")
+    print(f"sin cache de tokens:   {sin_cache * 1_000_000:8.1f} µs/request")
+    print(f"con cache de tokens:   {con_cache * 1_000_000:8.1f} µs/request")
+    print(f"mejora:                {sin_cache / con_cache:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
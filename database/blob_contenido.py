@@ -0,0 +1,64 @@
+import psycopg2
+
+from shared.utils import execute_query, execute_query_stream
+
+
+def obtener_resumen_blobs_pg(conexion: psycopg2.extensions.connection | None = None) -> dict:
+    """
+    Espacio del almacén contra el que ocuparían los mismos archivos guardados una vez por fila.
+    Los pendientes de migrar se miden con octet_length, que no lee el bytea.
+    """
+    sql = """
+          select b.blobs,
+                 b.blobs_compartidos,
+                 b.referencias,
+                 b.bytes_almacenados,
+                 b.bytes_referenciados,
+                 p.filas_pendientes_migrar,
+                 p.bytes_pendientes_migrar,
+                 pg_total_relation_size('libro') + pg_total_relation_size('estudiante_documento') as bytes_tablas
+          from (select count(*)                                    as blobs,
+                       count(*) filter (where referencias > 1)     as blobs_compartidos,
+                       coalesce(sum(referencias), 0)::bigint       as referencias,
+                       coalesce(sum(tamano), 0)::bigint            as bytes_almacenados,
+                       coalesce(sum(tamano * referencias), 0)::bigint as bytes_referenciados
+                from blob_contenido
+                where referencias > 0) b,
+               (select count(*)                                    as filas_pendientes_migrar,
+                       coalesce(sum(octet_length(content)), 0)::bigint as bytes_pendientes_migrar
+                from (select content from libro where content is not null
+                      union all
+                      select content from estudiante_documento where content is not null) c) p;
+          """
+
+    return execute_query(sql, conn=conexion)[0]
+
+
+def obtener_hashes_referenciados_pg(conexion: psycopg2.extensions.connection | None = None) -> set[str]:
+    """
+    Blobs que alguna fila usa; referencias lo mantienen los triggers de libro y estudiante_documento
+    en la misma transacción que la fila, así que un upload sin confirmar no cuenta todavía
+    (lo cubre el período de gracia de limpiar_blobs)
+    """
+    sql = """
+          select content_sha256 from blob_contenido where referencias > 0;
+          """
+
+    return {item['contentSha256'] for item in execute_query_stream(sql, conn=conexion)}
+
+
+def eliminar_blob_sin_referencias_pg(
+        sha256: str,
+        conexion: psycopg2.extensions.connection | None = None
+) -> bool:
+    # Solo si sigue sin referencias: una fila nueva con el mismo contenido la habría vuelto a sumar
+    query = """
+            delete from blob_contenido
+            where content_sha256 = %s
+              and referencias <= 0
+            returning content_sha256;
+            """
+
+    results = execute_query(query, [sha256], conn=conexion)
+
+    return bool(results)
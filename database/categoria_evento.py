@@ -2,6 +2,7 @@ import psycopg2
 
 from models.categoria_evento import CategoriaEvento
 from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from shared.mapeo import construir_modelos
 
 
 def registrar_cateogoria_evento_pg(
@@ -79,7 +80,7 @@ def obtener_categoria_evento_pg(
     if not results:
         return None
 
-    items = [CategoriaEvento(**item) for item in results]
+    items = construir_modelos(CategoriaEvento, results)
 
     return items
 
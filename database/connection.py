@@ -1,15 +1,707 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, TypeVar
+
+import asyncpg
 import psycopg2
-from fastapi import HTTPException
+import psycopg2.extensions
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from database.metricas import CursorInstrumentado
+
+
+class ConfiguracionBaseDatos:
+    HOST = os.getenv('DB_HOST', 'localhost')
+    DATABASE = os.getenv('DB_NAME', 'itla_api_db')
+    USER = os.getenv('DB_USER', 'postgres')
+    PASSWORD = os.getenv('DB_PASSWORD', 'admin')
+    PORT = int(os.getenv('DB_PORT', '5432'))
+
+
+class ConfiguracionPool:
+    # Todos los valores aplican por proceso (cada worker de uvicorn tiene su propio pool)
+    MIN_CONEXIONES = int(os.getenv('DB_POOL_MIN', '2'))
+    MAX_CONEXIONES = int(os.getenv('DB_POOL_MAX', '10'))
+    MAX_ESPERANDO = int(os.getenv('DB_POOL_MAX_ESPERANDO', '50'))
+    TIMEOUT_ESPERA_SEGUNDOS = float(os.getenv('DB_POOL_TIMEOUT_ESPERA', '10'))
+    TIEMPO_VIDA_SEGUNDOS = float(os.getenv('DB_POOL_TIEMPO_VIDA', '1800'))
+    TIEMPO_INACTIVA_SEGUNDOS = float(os.getenv('DB_POOL_TIEMPO_INACTIVA', '300'))
+    INTERVALO_VERIFICACION_SEGUNDOS = float(os.getenv('DB_POOL_INTERVALO_VERIFICACION', '30'))
+
+
+class Balanceo:
+    ROUND_ROBIN = 'round_robin'
+    MENOS_CONEXIONES = 'menos_conexiones'
+
+
+class ConfiguracionReplicas:
+    # host[:puerto] separados por coma; usan la misma base, usuario y clave que el primario
+    REPLICAS = [replica.strip() for replica in os.getenv('DB_REPLICAS', '').split(',') if replica.strip()]
+    BALANCEO = os.getenv('DB_REPLICAS_BALANCEO', Balanceo.ROUND_ROBIN)
+    # Tras una escritura, las lecturas del mismo cliente van al primario durante esta ventana
+    VENTANA_LECTURA_PROPIA_SEGUNDOS = float(os.getenv('DB_VENTANA_LECTURA_PROPIA', '5'))
+
+
+class ConfiguracionStreaming:
+    # Filas que trae cada viaje del cursor del lado del servidor
+    ITERSIZE = int(os.getenv('DB_STREAM_ITERSIZE', '2000'))
+    # Bytes que trae cada substring al descargar un bytea por partes
+    BLOQUE_BYTEA = int(os.getenv('DB_STREAM_BLOQUE_BYTEA', str(1024 * 1024)))
+
+
+class ConexionPool(psycopg2.extensions.connection):
+    """
+    Conexión de psycopg2 que al llamar close() vuelve al pool en lugar de desconectarse
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.prestada = False
+        self.fecha_creacion = time.monotonic()
+        self.ultimo_uso = self.fecha_creacion
+        # Sentencias preparadas en esta sesión (PREPARE vive lo que vive la conexión)
+        self.sentencias_preparadas: set[str] = set()
+        self.acciones_confirmacion: list[Callable[[], None]] = []
+        self.acciones_reversion: list[Callable[[], None]] = []
+
+    def al_confirmar(self, accion: Callable[[], None]):
+        """
+        Ejecuta la acción (estado en memoria, caches) recién cuando la transacción actual se confirme;
+        si se revierte, se descarta
+        """
+        self.acciones_confirmacion.append(accion)
+
+    def al_revertir(self, accion: Callable[[], None]):
+        """
+        Ejecuta la acción si la transacción actual se revierte o la conexión vuelve al pool sin confirmarla
+        """
+        self.acciones_reversion.append(accion)
+
+    def terminar_acciones(self, confirmada: bool):
+        acciones = self.acciones_confirmacion if confirmada else self.acciones_reversion
+        self.acciones_confirmacion, self.acciones_reversion = [], []
+
+        for accion in acciones:
+            try:
+                accion()
+            except Exception:
+                logging.exception("Error en una acción posterior al fin de la transacción")
+
+    def commit(self):
+        super().commit()
+        self.terminar_acciones(True)
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self.terminar_acciones(False)
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+            return
+
+        # Un segundo close() sobre una conexión ya devuelta no hace nada
+        if self.prestada:
+            self.pool.devolver(self)
+
+    def cerrar_definitivamente(self):
+        super().close()
+
+
+class PoolConexiones:
+
+    def __init__(self,
+                 minimo: int,
+                 maximo: int,
+                 max_esperando: int,
+                 timeout_espera: float,
+                 tiempo_vida: float,
+                 tiempo_inactiva: float,
+                 intervalo_verificacion: float,
+                 nombre: str = 'primario',
+                 solo_lectura: bool = False,
+                 **parametros_conexion):
+        self.pid = os.getpid()
+        self.nombre = nombre
+        self.solo_lectura = solo_lectura
+        self.minimo = minimo
+        self.maximo = maximo
+        self.max_esperando = max_esperando
+        self.timeout_espera = timeout_espera
+        self.tiempo_vida = tiempo_vida
+        self.tiempo_inactiva = tiempo_inactiva
+        self.intervalo_verificacion = intervalo_verificacion
+        self.parametros_conexion = parametros_conexion
+
+        self._condicion = threading.Condition()
+        self._libres = deque()
+        self._total = 0
+        self._en_uso = 0
+        self._esperando = 0
+
+        self._prestamos = 0
+        self._rechazos = 0
+        self._creadas = 0
+        self._descartadas = 0
+        self._tiempo_espera_total = 0.0
+        self._tiempo_espera_max = 0.0
+
+        self._precargar()
+
+    def _precargar(self):
+        for _ in range(self.minimo):
+            try:
+                conexion = self._crear_conexion()
+            except Exception as e:
+                logging.warning(f"No se pudo precargar el pool de conexiones: {str(e)}")
+                return
+
+            with self._condicion:
+                self._total += 1
+                self._libres.append(conexion)
+
+    def _crear_conexion(self) -> ConexionPool:
+        conexion = psycopg2.connect(connection_factory=ConexionPool, **self.parametros_conexion)
+        conexion.cursor_factory = CursorInstrumentado
+        if self.solo_lectura:
+            conexion.set_session(readonly=True)
+        conexion.pool = self
+        with self._condicion:
+            self._creadas += 1
+        return conexion
+
+    def _expirada(self, conexion: ConexionPool, ahora: float) -> bool:
+        return conexion.closed or ahora - conexion.fecha_creacion > self.tiempo_vida
+
+    def _saludable(self, conexion: ConexionPool, ahora: float) -> bool:
+        if ahora - conexion.ultimo_uso < self.intervalo_verificacion:
+            return True
+
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("select 1;")
+            cursor.close()
+            conexion.rollback()
+            return True
+        except Exception as e:
+            logging.warning(f"Conexión del pool descartada por fallar la verificación: {str(e)}")
+            return False
+
+    def _descartar(self, conexion: ConexionPool):
+        with self._condicion:
+            self._descartadas += 1
+        try:
+            conexion.cerrar_definitivamente()
+        except Exception:
+            pass
+
+    def obtener(self) -> ConexionPool:
+        inicio = time.perf_counter()
+        limite = inicio + self.timeout_espera
+
+        while True:
+            conexion = None
+            crear = False
+            descartar = []
+
+            try:
+                with self._condicion:
+                    while conexion is None and not crear:
+                        ahora = time.monotonic()
+
+                        while self._libres:
+                            candidata = self._libres.pop()
+                            if self._expirada(candidata, ahora):
+                                self._total -= 1
+                                descartar.append(candidata)
+                                continue
+                            conexion = candidata
+                            break
+
+                        if conexion is not None:
+                            break
+
+                        if self._total < self.maximo:
+                            self._total += 1
+                            crear = True
+                            break
+
+                        if self._esperando >= self.max_esperando:
+                            self._rechazos += 1
+                            raise HTTPException(
+                                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="El servicio está saturado, intente nuevamente"
+                            )
+
+                        restante = limite - time.perf_counter()
+                        if restante <= 0:
+                            self._rechazos += 1
+                            raise HTTPException(
+                                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Tiempo de espera agotado para obtener una conexión a la base de datos"
+                            )
+
+                        self._esperando += 1
+                        try:
+                            self._condicion.wait(restante)
+                        finally:
+                            self._esperando -= 1
+
+                    if conexion is not None:
+                        self._en_uso += 1
+
+            finally:
+                for expirada in descartar:
+                    self._descartar(expirada)
+
+            if crear:
+                try:
+                    conexion = self._crear_conexion()
+                except Exception as e:
+                    with self._condicion:
+                        self._total -= 1
+                        self._condicion.notify()
+                    print("Error al conectar a la base de datos:", e)
+                    raise HTTPException(status_code=500, detail=str(e))
+
+                with self._condicion:
+                    self._en_uso += 1
+
+            elif not self._saludable(conexion, time.monotonic()):
+                with self._condicion:
+                    self._en_uso -= 1
+                    self._total -= 1
+                    self._condicion.notify()
+                self._descartar(conexion)
+                continue
+
+            conexion.prestada = True
+            self._registrar_espera(time.perf_counter() - inicio)
+
+            return conexion
+
+    def devolver(self, conexion: ConexionPool):
+        conexion.prestada = False
+        ahora = time.monotonic()
+
+        reutilizable = not self._expirada(conexion, ahora)
+
+        # Descartar cualquier transacción que haya quedado abierta, igual que al cerrar una conexión
+        if reutilizable and conexion.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conexion.rollback()
+            except Exception:
+                reutilizable = False
+
+        # Lo que quedó pendiente de una transacción que nunca se confirmó
+        conexion.terminar_acciones(False)
+
+        conexion.ultimo_uso = ahora
+        descartar = []
+
+        with self._condicion:
+            self._en_uso -= 1
+
+            if reutilizable:
+                self._libres.append(conexion)
+            else:
+                self._total -= 1
+                descartar.append(conexion)
+
+            # Cerrar las conexiones inactivas que sobran por encima del mínimo
+            while self._total > self.minimo and self._libres \
+                    and ahora - self._libres[0].ultimo_uso > self.tiempo_inactiva:
+                self._total -= 1
+                descartar.append(self._libres.popleft())
+
+            self._condicion.notify()
+
+        for sobrante in descartar:
+            self._descartar(sobrante)
+
+    def _registrar_espera(self, segundos: float):
+        with self._condicion:
+            self._prestamos += 1
+            self._tiempo_espera_total += segundos
+            if segundos > self._tiempo_espera_max:
+                self._tiempo_espera_max = segundos
+
+    @property
+    def carga(self) -> int:
+        return self._en_uso + self._esperando
+
+    def estadisticas(self) -> dict:
+        with self._condicion:
+            promedio = self._tiempo_espera_total / self._prestamos if self._prestamos else 0.0
+
+            return {
+                'nombre': self.nombre,
+                'soloLectura': self.solo_lectura,
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'total': self._total,
+                'enUso': self._en_uso,
+                'libres': len(self._libres),
+                'esperando': self._esperando,
+                'prestamos': self._prestamos,
+                'rechazos': self._rechazos,
+                'conexionesCreadas': self._creadas,
+                'conexionesDescartadas': self._descartadas,
+                'tiempoEsperaPromedioMs': round(promedio * 1000, 3),
+                'tiempoEsperaMaximoMs': round(self._tiempo_espera_max * 1000, 3)
+            }
+
+    def cerrar(self):
+        with self._condicion:
+            libres = list(self._libres)
+            self._libres.clear()
+            self._total -= len(libres)
+
+        for conexion in libres:
+            self._descartar(conexion)
+
+
+def _crear_pool(host: str, port: int, nombre: str, solo_lectura: bool) -> PoolConexiones:
+    return PoolConexiones(
+        minimo=ConfiguracionPool.MIN_CONEXIONES,
+        maximo=ConfiguracionPool.MAX_CONEXIONES,
+        max_esperando=ConfiguracionPool.MAX_ESPERANDO,
+        timeout_espera=ConfiguracionPool.TIMEOUT_ESPERA_SEGUNDOS,
+        tiempo_vida=ConfiguracionPool.TIEMPO_VIDA_SEGUNDOS,
+        tiempo_inactiva=ConfiguracionPool.TIEMPO_INACTIVA_SEGUNDOS,
+        intervalo_verificacion=ConfiguracionPool.INTERVALO_VERIFICACION_SEGUNDOS,
+        nombre=nombre,
+        solo_lectura=solo_lectura,
+        host=host,
+        database=ConfiguracionBaseDatos.DATABASE,
+        user=ConfiguracionBaseDatos.USER,
+        password=ConfiguracionBaseDatos.PASSWORD,
+        port=port
+    )
+
+
+def _direccion_replica(replica: str) -> tuple[str, int]:
+    host, _, puerto = replica.partition(':')
+    return host, int(puerto) if puerto else ConfiguracionBaseDatos.PORT
+
+
+_pool: PoolConexiones | None = None
+_pools_replica: list[PoolConexiones] = []
+_pool_lock = threading.Lock()
+_turno_replica = itertools.count()
+
+
+def obtener_pool() -> PoolConexiones:
+    global _pool
+
+    # Después de un fork (workers de uvicorn) cada proceso crea su propio pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = _crear_pool(ConfiguracionBaseDatos.HOST, ConfiguracionBaseDatos.PORT, 'primario', False)
+
+    return _pool
+
+
+def obtener_pools_replica() -> list[PoolConexiones]:
+    global _pools_replica
+
+    if not ConfiguracionReplicas.REPLICAS:
+        return []
+
+    if not _pools_replica or _pools_replica[0].pid != os.getpid():
+        with _pool_lock:
+            if not _pools_replica or _pools_replica[0].pid != os.getpid():
+                _pools_replica = [
+                    _crear_pool(*_direccion_replica(replica), nombre=replica, solo_lectura=True)
+                    for replica in ConfiguracionReplicas.REPLICAS
+                ]
+
+    return _pools_replica
+
+
+def _ordenar_replicas(replicas: list, carga) -> list:
+    """
+    Orden en que se intentan las réplicas según el balanceo configurado
+    """
+    if not replicas:
+        return []
+
+    inicio = next(_turno_replica) % len(replicas)
+    replicas = replicas[inicio:] + replicas[:inicio]
+
+    # sorted es estable: a igual carga se mantiene la rotación
+    if ConfiguracionReplicas.BALANCEO == Balanceo.MENOS_CONEXIONES:
+        return sorted(replicas, key=carga)
+
+    return replicas
+
+
+def get_connection(solo_lectura: bool = False) -> ConexionPool:
+    """
+    Presta una conexión del pool; conexion.close() la devuelve al pool.
+    Con solo_lectura=True se usa una réplica si hay configuradas (con respaldo en el primario).
+    """
+    if solo_lectura:
+        for pool in _ordenar_replicas(obtener_pools_replica(), lambda replica: replica.carga):
+            try:
+                return pool.obtener()
+            except HTTPException as e:
+                logging.warning(f"Réplica {pool.nombre} no disponible, se intenta la siguiente: {e.detail}")
+
+    return obtener_pool().obtener()
+
+
+Resultado = TypeVar('Resultado')
+
+
+def ejecutar_en_transaccion(funcion: Callable[..., Resultado], *args, **kwargs) -> Resultado:
+    """
+    Llama a funcion(..., conexion=...) con una conexión prestada solo para eso, confirma y la devuelve.
+    Para rutas que esperan otro trabajo largo (bcrypt) y no deben retener una conexión del pool mientras tanto.
+    """
+    conexion = get_connection()
+
+    try:
+        resultado = funcion(*args, conexion=conexion, **kwargs)
+        conexion.commit()
+
+        return resultado
+    finally:
+        # Sin commit (error), devolver al pool revierte la transacción
+        conexion.close()
+
+
+def estadisticas_pools() -> dict[str, dict]:
+    estadisticas = {obtener_pool().nombre: obtener_pool().estadisticas()}
+
+    for pool in obtener_pools_replica():
+        estadisticas[pool.nombre] = pool.estadisticas()
+
+    return estadisticas
+
+
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+class LecturaPropia:
+    """
+    Recuerda por cliente (digest del header Authorization) la última escritura confirmada,
+    para que sus lecturas inmediatas vayan al primario y no a una réplica atrasada.
+    Es por proceso: con varios workers solo cubre las lecturas que llegan al mismo worker.
+    """
+
+    def __init__(self, ventana: float):
+        self.ventana = ventana
+        self._escrituras: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, clave: str):
+        ahora = time.monotonic()
+
+        with self._lock:
+            self._escrituras[clave] = ahora
+
+            if len(self._escrituras) > 10000:
+                self._escrituras = {
+                    cliente: momento for cliente, momento in self._escrituras.items()
+                    if ahora - momento <= self.ventana
+                }
+
+    def vigente(self, clave: str) -> bool:
+        momento = self._escrituras.get(clave)
+        return momento is not None and time.monotonic() - momento <= self.ventana
+
+
+lectura_propia = LecturaPropia(ConfiguracionReplicas.VENTANA_LECTURA_PROPIA_SEGUNDOS)
+
+
+def _clave_cliente(request: Request) -> str | None:
+    autorizacion = request.headers.get('authorization')
+    return hashlib.sha256(autorizacion.encode()).hexdigest() if autorizacion else None
+
+
+def es_solo_lectura(request: Request) -> bool:
+    if request.method not in METODOS_LECTURA:
+        return False
+
+    clave = _clave_cliente(request)
+    return clave is None or not lectura_propia.vigente(clave)
+
+
+def get_conexion(request: Request):
+    """
+    Dependencia de FastAPI: presta una sola conexión por request, compartida por
+    la autenticación y el router. RutaTransaccional hace commit/rollback y la devuelve.
+    Los GET van a una réplica (si hay) salvo que el cliente acabe de escribir.
+    """
+    conexion = getattr(request.state, 'conexion', None)
+
+    if conexion is None:
+        conexion = get_connection(solo_lectura=es_solo_lectura(request))
+        request.state.conexion = conexion
+
+    try:
+        yield conexion
+    finally:
+        # Respaldo por si la ruta no usa RutaTransaccional; si ya se devolvió no se toca,
+        # porque la misma conexión puede estar prestada a otro request
+        if getattr(request.state, 'conexion', None) is conexion:
+            request.state.conexion = None
+            conexion.close()
+
+
+def _finalizar_transaccion(request: Request, confirmar: bool):
+    conexion = getattr(request.state, 'conexion', None)
+
+    if conexion is None:
+        return
+
+    try:
+        if confirmar:
+            conexion.commit()
+        else:
+            conexion.rollback()
+    finally:
+        request.state.conexion = None
+        conexion.close()
+
+
+class RutaTransaccional(APIRoute):
+    """
+    Ruta que confirma la transacción de get_conexion antes de enviar la respuesta,
+    o la revierte si el endpoint lanza una excepción
+    """
+
+    def get_route_handler(self):
+        manejador = super().get_route_handler()
+
+        async def manejador_transaccional(request: Request) -> Response:
+            try:
+                respuesta = await manejador(request)
+
+            except (HTTPException, RequestValidationError) as e:
+                logging.warning(f"Error controlado: {getattr(e, 'detail', e)}")
+                await run_in_threadpool(_finalizar_transaccion, request, False)
+                raise
+
+            except Exception as e:
+                logging.exception("Ocurrió un error inesperado")
+                await run_in_threadpool(_finalizar_transaccion, request, False)
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+            try:
+                await run_in_threadpool(_finalizar_transaccion, request, True)
+            except Exception as e:
+                logging.exception("Ocurrió un error inesperado al confirmar la transacción")
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+            if request.method not in METODOS_LECTURA:
+                clave = _clave_cliente(request)
+                if clave is not None:
+                    lectura_propia.registrar(clave)
+
+            return respuesta
+
+        return manejador_transaccional
+
+
+_pool_async: asyncpg.Pool | None = None
+_pools_async_replica: dict[str, asyncpg.Pool] = {}
+_pool_async_lock: asyncio.Lock | None = None
+
+
+async def _inicializar_conexion_async(conexion: asyncpg.Connection):
+    # psycopg2 devuelve json/jsonb ya decodificados; asyncpg los entrega como texto
+    for tipo in ('json', 'jsonb'):
+        await conexion.set_type_codec(tipo, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+
+async def _crear_pool_async(host: str, port: int) -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        host=host,
+        database=ConfiguracionBaseDatos.DATABASE,
+        user=ConfiguracionBaseDatos.USER,
+        password=ConfiguracionBaseDatos.PASSWORD,
+        port=port,
+        min_size=ConfiguracionPool.MIN_CONEXIONES,
+        max_size=ConfiguracionPool.MAX_CONEXIONES,
+        max_inactive_connection_lifetime=ConfiguracionPool.TIEMPO_INACTIVA_SEGUNDOS,
+        init=_inicializar_conexion_async
+    )
+
+
+async def obtener_pool_async(replica: str | None = None) -> asyncpg.Pool:
+    global _pool_async, _pool_async_lock
+
+    if _pool_async_lock is None:
+        _pool_async_lock = asyncio.Lock()
+
+    if replica is not None:
+        if replica not in _pools_async_replica:
+            async with _pool_async_lock:
+                if replica not in _pools_async_replica:
+                    _pools_async_replica[replica] = await _crear_pool_async(*_direccion_replica(replica))
+
+        return _pools_async_replica[replica]
+
+    if _pool_async is None:
+        async with _pool_async_lock:
+            if _pool_async is None:
+                _pool_async = await _crear_pool_async(ConfiguracionBaseDatos.HOST, ConfiguracionBaseDatos.PORT)
+
+    return _pool_async
+
+
+def _carga_pool_async(replica: str) -> int:
+    pool = _pools_async_replica.get(replica)
+    return pool.get_size() - pool.get_idle_size() if pool is not None else 0
+
+
+async def _obtener_pool_async_lectura() -> asyncpg.Pool:
+    for replica in _ordenar_replicas(ConfiguracionReplicas.REPLICAS, _carga_pool_async):
+        try:
+            return await obtener_pool_async(replica)
+        except (OSError, asyncpg.PostgresError) as e:
+            logging.warning(f"Réplica {replica} no disponible, se intenta la siguiente: {str(e)}")
+
+    return await obtener_pool_async()
+
+
+async def get_conexion_async(request: Request):
+    """
+    Dependencia de FastAPI para endpoints async de solo lectura: presta una conexión
+    del pool de asyncpg (de una réplica si hay) dentro de una transacción de solo lectura
+    """
+    if es_solo_lectura(request):
+        pool = await _obtener_pool_async_lectura()
+    else:
+        pool = await obtener_pool_async()
 
-def get_connection():
     try:
-        return psycopg2.connect(
-            host="localhost",
-            database="itla_api_db",
-            user="postgres",
-            password="admin",
-            port=5432
+        conexion = await pool.acquire(timeout=ConfiguracionPool.TIMEOUT_ESPERA_SEGUNDOS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tiempo de espera agotado para obtener una conexión a la base de datos"
         )
-    except Exception as e:
-        print("Error al conectar a la base de datos:", e)
-        raise HTTPException(status_code=500, detail=str(e))
+
+    try:
+        async with conexion.transaction(readonly=True):
+            yield conexion
+    finally:
+        await pool.release(conexion)
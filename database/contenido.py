@@ -0,0 +1,96 @@
+import logging
+from typing import Callable, Iterator, NamedTuple
+
+import psycopg2
+
+from database.connection import get_connection, ConfiguracionStreaming
+from shared.almacenamiento import almacen_blobs
+from shared.utils import execute_query
+
+
+class TablaContenido(NamedTuple):
+    tabla: str
+    columna_id: str
+
+
+TABLA_LIBRO = TablaContenido('libro', 'libro_id')
+TABLA_ESTUDIANTE_DOCUMENTO = TablaContenido('estudiante_documento', 'estudiante_documento_id')
+
+TABLAS_CONTENIDO = {
+    TABLA_LIBRO.tabla: TABLA_LIBRO,
+    TABLA_ESTUDIANTE_DOCUMENTO.tabla: TABLA_ESTUDIANTE_DOCUMENTO,
+}
+
+
+def iterar_content_pg(
+        tabla: TablaContenido,
+        registro_id: int,
+        inicio: int,
+        fin: int,
+        tamano_bloque: int | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Iterator[bytes]:
+    """
+    Bytes inicio..fin (inclusive) de la columna content, pedidos por bloques con substring
+    para no traer el bytea completo a memoria. Sin conexion usa una propia porque el generador
+    se consume después de que la ruta devolvió la suya; repeatable read para que todos los
+    bloques salgan de la misma versión de la fila. Con conexion (migrar_blobs, que ya tiene
+    la fila bloqueada) lee dentro de esa transacción.
+    """
+    tamano_bloque = tamano_bloque or ConfiguracionStreaming.BLOQUE_BYTEA
+    conexion_propia = conexion is None
+
+    sql = f"""
+          select substring(content from %s for %s) as bloque
+          from {tabla.tabla}
+          where {tabla.columna_id} = %s;
+          """
+
+    if conexion_propia:
+        conexion = get_connection(solo_lectura=True)
+
+    try:
+        if conexion_propia:
+            execute_query("set transaction isolation level repeatable read", conn=conexion)
+
+        posicion = inicio
+
+        while posicion <= fin:
+            # substring cuenta desde 1
+            results = execute_query(
+                sql,
+                [posicion + 1, min(tamano_bloque, fin - posicion + 1), registro_id],
+                conn=conexion,
+                nombre_sentencia=f"content_{tabla.tabla}"
+            )
+
+            bloque = results[0]['bloque'] if results else None
+
+            if not bloque:
+                logging.error(f"El contenido de {tabla.tabla} {registro_id} ya no está en la tabla")
+                raise RuntimeError(f"Contenido de {tabla.tabla} {registro_id} no disponible")
+
+            posicion += len(bloque)
+
+            # psycopg2 entrega el bytea como memoryview; StreamingResponse solo acepta bytes o str
+            yield bytes(bloque)
+
+    finally:
+        if conexion_propia:
+            conexion.rollback()
+            conexion.close()
+
+
+def lector_archivo(
+        tabla: TablaContenido,
+        registro_id: int,
+        archivo: dict
+) -> Callable[[int, int], Iterator[bytes]]:
+    """
+    Lector de rangos para la descarga: desde el almacén de blobs o, si la fila aún no
+    se migró, desde el bytea por bloques
+    """
+    if archivo.get('contentSha256'):
+        return lambda inicio, fin: almacen_blobs.iterar_rango(archivo['contentSha256'], inicio, fin)
+
+    return lambda inicio, fin: iterar_content_pg(tabla, registro_id, inicio, fin)
@@ -2,8 +2,12 @@ import logging
 from typing import Optional, List, Dict, Any
 import psycopg2
 from models.cuatrimestre import Cuatrimestre
-from models.paginacion import Paginacion
+from models.paginacion import PaginacionCursor
+from shared.constante import LimitePaginacion
 from shared.utils import execute_query, formartear_secuencia_insertar_sql
+from shared.mapeo import construir_modelos
+from shared.paginacion import ConsultaPaginada, paginar_pg, OrdenKeyset, ColumnaOrden, condicion_cursor, limite_keyset, \
+    armar_pagina
 
 
 def registrar_cuatrimestre_pg(
@@ -39,6 +43,7 @@ def obtener_cuatrimestre_pg(
         estado: Optional[str] = None,
         numero_pagina: Optional[int] = None,
         limite: Optional[int] = None,
+        modo_total: Optional[str] = None,
         conexion: psycopg2.extensions.connection = None
 ) -> Optional[Dict[str, Any] | List[Cuatrimestre]]:
     try:
@@ -72,59 +77,33 @@ def obtener_cuatrimestre_pg(
             sql += " AND c.estado = %s"
             values.append(estado)
 
-        sql += " ORDER BY c.anio DESC, c.periodo"
-
         # Si no hay paginación, devolver lista directamente
         if numero_pagina is None or limite is None:
-            resultado = execute_query(sql, values, conexion)
+            resultado = execute_query(
+                sql + " ORDER BY c.anio DESC, c.periodo", values, conexion, nombre_sentencia='cuatrimestre'
+            )
             if not resultado:
                 return None
 
-            cuatrimestres = [Cuatrimestre(**row) for row in resultado]
+            cuatrimestres = construir_modelos(Cuatrimestre, resultado)
             return cuatrimestres
 
-        # Con paginación
-        offset = (numero_pagina - 1) * limite
-        sql_paginado = sql + f" LIMIT %s OFFSET %s"
-        values_paginado = values + [limite, offset]
+        # Con paginación: página y total en una sola sentencia
+        consulta = ConsultaPaginada(
+            sql=sql,
+            values=values,
+            orden="anio desc, periodo",
+            clave='cuatrimestre',
+            tabla='cuatrimestre',
+            filtrada=bool(values)
+        )
 
-        resultado = execute_query(sql_paginado, values_paginado, conexion)
+        resultado, paginacion = paginar_pg(consulta, numero_pagina, limite, modo_total, conexion)
 
         if not resultado:
             return None
 
-        # Contar total de registros
-        sql_count = """
-            SELECT COUNT(*) as total
-            FROM cuatrimestre c
-            WHERE 1=1
-        """
-
-        if cuatrimestre_id is not None:
-            sql_count += " AND c.cuatrimestre_id = %s"
-
-        if periodo is not None:
-            sql_count += " AND c.periodo = %s"
-
-        if anio is not None:
-            sql_count += " AND c.anio = %s"
-
-        if estado is not None:
-            sql_count += " AND c.estado = %s"
-
-        count_resultado = execute_query(sql_count, values, conexion)
-        total = count_resultado[0]['total'] if count_resultado else 0
-
-        total_paginas = (total + limite - 1) // limite
-
-        cuatrimestres = [Cuatrimestre(**row) for row in resultado]
-
-        paginacion = Paginacion(
-            total=total,
-            numeroPagina=numero_pagina,
-            limite=limite,
-            totalPaginas=total_paginas
-        )
+        cuatrimestres = construir_modelos(Cuatrimestre, resultado)
 
         return {
             "cuatrimestres": cuatrimestres,
@@ -136,6 +115,66 @@ def obtener_cuatrimestre_pg(
         raise e
 
 
+# (periodo, anio) es único, no hace falta desempatar por cuatrimestre_id
+ORDEN_CUATRIMESTRE = OrdenKeyset('cuatrimestre', [
+    ColumnaOrden('c.anio', 'anio', int, descendente=True),
+    ColumnaOrden('c.periodo', 'periodo', str)
+])
+
+
+def obtener_cuatrimestre_keyset_pg(
+        periodo: Optional[str] = None,
+        anio: Optional[int] = None,
+        estado: Optional[str] = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: Optional[str] = None,
+        conexion: psycopg2.extensions.connection = None
+) -> Dict[str, Any]:
+    sql = """
+        SELECT 
+            c.cuatrimestre_id,
+            c.periodo,
+            c.anio,
+            c.estado,
+            c.fecha_creacion,
+            c.fecha_actualizacion
+        FROM cuatrimestre c
+        WHERE 1=1
+    """
+
+    values = []
+
+    if periodo is not None:
+        sql += " AND c.periodo = %s"
+        values.append(periodo)
+
+    if anio is not None:
+        sql += " AND c.anio = %s"
+        values.append(anio)
+
+    if estado is not None:
+        sql += " AND c.estado = %s"
+        values.append(estado)
+
+    condicion, values_cursor = condicion_cursor(ORDEN_CUATRIMESTRE, cursor)
+    if condicion:
+        sql += " AND " + condicion
+        values += values_cursor
+
+    orden_limite, values_limite = limite_keyset(ORDEN_CUATRIMESTRE, limite)
+
+    resultado = execute_query(
+        sql + orden_limite, values + values_limite, conexion, nombre_sentencia='cuatrimestre_keyset'
+    )
+
+    filas, siguiente_cursor = armar_pagina(ORDEN_CUATRIMESTRE, resultado, limite)
+
+    return {
+        "cuatrimestres": construir_modelos(Cuatrimestre, filas),
+        "paginacion": PaginacionCursor(limite=limite, siguienteCursor=siguiente_cursor)
+    }
+
+
 def actualizar_cuatrimestre_pg(
         cuatrimestre_id: int,
         periodo: Optional[str] = None,
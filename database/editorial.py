@@ -1,6 +1,7 @@
 import psycopg2
 from models.editorial import Editorial
 from shared.utils import execute_query
+from shared.mapeo import construir_modelos
 
 def registrar_editorial_pg(nombre: str, estado: str,
                             conexion: psycopg2.extensions.connection | None = None):
@@ -38,7 +39,7 @@ def obtener_editorial_pg(editorial_id: int | None = None,
     sql += " ORDER BY editorial_id;"
 
     result = execute_query(sql, values, conn=conexion)
-    return [Editorial(**item) for item in result] if result else None
+    return construir_modelos(Editorial, result) if result else None
 
 
 def actualizar_editorial_pg(editorial_id: int,
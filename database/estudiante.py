@@ -1,11 +1,17 @@
-import math
-from typing import Dict, Any, List
+from datetime import datetime
+from typing import Dict, Any, List, Iterator
 
+import asyncpg
 import psycopg2
 from pydantic import EmailStr
 
 from models.estudiante import Estudiante
-from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from models.paginacion import PaginacionCursor
+from shared.constante import LimitePaginacion
+from shared.utils import formartear_secuencia_insertar_sql, execute_query, execute_query_async, execute_query_stream
+from shared.mapeo import construir_modelos, construir_modelo
+from shared.paginacion import ConsultaPaginada, paginar_pg, paginar_async_pg, OrdenKeyset, ColumnaOrden, \
+    condicion_cursor, agregar_condicion, limite_keyset, armar_pagina
 
 
 def registrar_estudiante_pg(
@@ -84,24 +90,12 @@ def query_seleccionar_datos_estudiante():
            '''
 
 
-def query_contar_estudiantes():
-    return '''
-           select count(*) as total
-           from estudiante e
-                    join usuario uc on e.usuario_creacion_id = uc.usuario_id
-                    left join usuario ua on e.usuario_actualizacion_id = ua.usuario_id
-           '''
-
-
-def obtener_estudiante_pg(
+def construir_filtros_estudiante(
         estudiante_id: int | None = None,
         correo: str | None = None,
         estado: str | None = None,
-        matricula: str | None = None,
-        numero_pagina: int | None = None,
-        limite: int | None = None,
-        conexion: psycopg2.extensions.connection | None = None
-) -> Dict[str, Any] | List[Estudiante] | None:
+        matricula: str | None = None
+) -> tuple[str, list]:
     # Construir las condiciones WHERE
     where_exprss = []
     values = []
@@ -126,57 +120,41 @@ def obtener_estudiante_pg(
     if where_exprss:
         where_clause = " where " + " and ".join(where_exprss)
 
-    # Si se solicita paginación
-    if numero_pagina is not None and limite is not None:
-        # Validar parámetros de paginación
-        if numero_pagina < 1:
-            numero_pagina = 1
-        if limite < 1:
-            limite = 10
-
-        # Contar total de registros
-        sql_count = query_contar_estudiantes() + where_clause + ";"
-        count_results = execute_query(sql_count, values, conn=conexion)
-
-        if not count_results:
-            return {
-                "estudiantes": [],
-                "paginacion": {
-                    "total": 0,
-                    "numeroPagina": numero_pagina,
-                    "limite": limite,
-                    "totalPaginas": 0
-                }
-            }
-
-        total_registros = count_results[0]['total']
-        total_paginas = math.ceil(total_registros / limite)
-
-        # Si la página solicitada es mayor al total de páginas, devolver la última página
-        if numero_pagina > total_paginas and total_paginas > 0:
-            numero_pagina = total_paginas
-
-        # Construir query con paginación
-        offset = (numero_pagina - 1) * limite
-        sql = query_seleccionar_datos_estudiante()
-        sql += where_clause
-        sql += " order by e.fecha_creacion desc"
-        sql += f" limit {limite} offset {offset};"
+    return where_clause, values
+
 
-        results = execute_query(sql, values, conn=conexion)
+def consulta_paginada_estudiante(where_clause: str, values: list) -> ConsultaPaginada:
+    return ConsultaPaginada(
+        sql=query_seleccionar_datos_estudiante() + where_clause,
+        values=values,
+        orden="fecha_creacion desc, estudiante_id desc",
+        clave='estudiante',
+        tabla='estudiante',
+        filtrada=bool(where_clause)
+    )
 
-        estudiantes = []
-        if results:
-            estudiantes = [Estudiante(**item) for item in results]
+
+def obtener_estudiante_pg(
+        estudiante_id: int | None = None,
+        correo: str | None = None,
+        estado: str | None = None,
+        matricula: str | None = None,
+        numero_pagina: int | None = None,
+        limite: int | None = None,
+        modo_total: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Dict[str, Any] | List[Estudiante] | None:
+    where_clause, values = construir_filtros_estudiante(estudiante_id, correo, estado, matricula)
+
+    # Si se solicita paginación: página y total en una sola sentencia
+    if numero_pagina is not None and limite is not None:
+        results, paginacion = paginar_pg(
+            consulta_paginada_estudiante(where_clause, values), numero_pagina, limite, modo_total, conexion
+        )
 
         return {
-            "estudiantes": estudiantes,
-            "paginacion": {
-                "total": total_registros,
-                "numeroPagina": numero_pagina,
-                "limite": limite,
-                "totalPaginas": total_paginas
-            }
+            "estudiantes": construir_modelos(Estudiante, results),
+            "paginacion": paginacion
         }
 
     # Sin paginación - comportamiento original
@@ -185,16 +163,134 @@ def obtener_estudiante_pg(
         sql += where_clause
         sql += " order by e.fecha_creacion desc;"
 
-        results = execute_query(sql, values, conn=conexion)
+        results = execute_query(sql, values, conn=conexion, nombre_sentencia='estudiante')
 
         if not results:
             return None
 
-        items = [Estudiante(**item) for item in results]
+        items = construir_modelos(Estudiante, results)
 
         return items
 
 
+async def obtener_estudiante_async_pg(
+        estudiante_id: int | None = None,
+        correo: str | None = None,
+        estado: str | None = None,
+        matricula: str | None = None,
+        numero_pagina: int | None = None,
+        limite: int | None = None,
+        modo_total: str | None = None,
+        conexion: asyncpg.Connection | None = None
+) -> Dict[str, Any] | List[Estudiante] | None:
+    where_clause, values = construir_filtros_estudiante(estudiante_id, correo, estado, matricula)
+
+    if numero_pagina is not None and limite is not None:
+        results, paginacion = await paginar_async_pg(
+            consulta_paginada_estudiante(where_clause, values), numero_pagina, limite, modo_total, conexion
+        )
+
+        return {
+            "estudiantes": construir_modelos(Estudiante, results),
+            "paginacion": paginacion
+        }
+
+    sql = query_seleccionar_datos_estudiante()
+    sql += where_clause
+    sql += " order by e.fecha_creacion desc;"
+
+    results = await execute_query_async(sql, values, conn=conexion)
+
+    if not results:
+        return None
+
+    return construir_modelos(Estudiante, results)
+
+
+ORDEN_ESTUDIANTE = OrdenKeyset('estudiante', [
+    ColumnaOrden('e.fecha_creacion', 'fechaCreacion', datetime, descendente=True),
+    ColumnaOrden('e.estudiante_id', 'estudianteId', int, descendente=True)
+])
+
+
+def construir_consulta_estudiante_keyset(
+        estado: str | None = None,
+        correo: str | None = None,
+        matricula: str | None = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: str | None = None
+) -> tuple[str, list]:
+    where_clause, values = construir_filtros_estudiante(None, correo, estado, matricula)
+
+    condicion, values_cursor = condicion_cursor(ORDEN_ESTUDIANTE, cursor)
+    if condicion:
+        where_clause = agregar_condicion(where_clause, condicion)
+        values += values_cursor
+
+    orden_limite, values_limite = limite_keyset(ORDEN_ESTUDIANTE, limite)
+
+    sql = query_seleccionar_datos_estudiante()
+    sql += where_clause
+    sql += orden_limite
+
+    return sql, values + values_limite
+
+
+def armar_pagina_estudiante(results, limite: int) -> Dict[str, Any]:
+    filas, siguiente_cursor = armar_pagina(ORDEN_ESTUDIANTE, results, limite)
+
+    return {
+        "estudiantes": construir_modelos(Estudiante, filas),
+        "paginacion": PaginacionCursor(limite=limite, siguienteCursor=siguiente_cursor)
+    }
+
+
+def obtener_estudiante_keyset_pg(
+        estado: str | None = None,
+        correo: str | None = None,
+        matricula: str | None = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Dict[str, Any]:
+    sql, values = construir_consulta_estudiante_keyset(estado, correo, matricula, limite, cursor)
+
+    results = execute_query(sql, values, conn=conexion, nombre_sentencia='estudiante_keyset')
+
+    return armar_pagina_estudiante(results, limite)
+
+
+async def obtener_estudiante_keyset_async_pg(
+        estado: str | None = None,
+        correo: str | None = None,
+        matricula: str | None = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: str | None = None,
+        conexion: asyncpg.Connection | None = None
+) -> Dict[str, Any]:
+    sql, values = construir_consulta_estudiante_keyset(estado, correo, matricula, limite, cursor)
+
+    results = await execute_query_async(sql, values, conn=conexion)
+
+    return armar_pagina_estudiante(results, limite)
+
+
+def obtener_estudiante_stream_pg(
+        estado: str | None = None,
+        correo: str | None = None,
+        matricula: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Iterator[Estudiante]:
+    where_clause, values = construir_filtros_estudiante(None, correo, estado, matricula)
+
+    sql = query_seleccionar_datos_estudiante()
+    sql += where_clause
+    sql += " order by e.fecha_creacion desc"
+
+    for item in execute_query_stream(sql, values, conn=conexion):
+        yield construir_modelo(Estudiante, item)
+
+
 def actualizar_estudiante_pg(
         estudiante_id: int,
         usuario_actualizacion_id: int,
@@ -1,26 +1,34 @@
+from typing import Iterator
+
 import psycopg2
 from models.estudiante_documento import EstudianteDocumento
-from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from shared.utils import formartear_secuencia_insertar_sql, execute_query, execute_query_stream
+from shared.mapeo import construir_modelos
+from shared.almacenamiento import BlobGuardado
 
 
 def registrar_estudiante_documento_pg(
         estudiante_id: int,
         tipo_documento: str,
-        content: bytes,
+        blob: BlobGuardado,
         estado: str,
         conexion: psycopg2.extensions.connection | None = None
 ):
     fields = [
         'estudiante_id',
         'tipo_documento',
-        'content',
+        'content_sha256',
+        'content_tamano',
+        'content_tipo',
         'estado'
     ]
 
     values = [
         estudiante_id,
         tipo_documento,
-        psycopg2.Binary(content),
+        blob.sha256,
+        blob.tamano,
+        blob.tipo,
         estado
     ]
 
@@ -88,12 +96,12 @@ def obtener_estudiante_documento_pg(
 
     sql += " order by ed.fecha_creacion desc;"
 
-    results = execute_query(sql, values, conn=conexion)
+    results = execute_query(sql, values, conn=conexion, nombre_sentencia='estudiante_documento')
 
     if not results:
         return None
 
-    items = [EstudianteDocumento(**item) for item in results]
+    items = construir_modelos(EstudianteDocumento, results)
 
     return items
 
@@ -125,15 +133,20 @@ def verificar_documento_existente_pg(
     return results[0]['total'] > 0
 
 
-def obtener_content_estudiante_documento_pg(
+def obtener_metadatos_archivo_estudiante_documento_pg(
         estudiante_documento_id: int,
         conexion: psycopg2.extensions.connection | None = None
 ):
     """
-    Obtiene el contenido binario de un documento del estudiante
+    Validadores de la descarga (sha256 y fecha de modificación) sin leer la columna content:
+    octet_length del bytea sale del encabezado del valor, no lo descomprime
     """
     sql = '''
-        SELECT content
+        SELECT content_sha256,
+               coalesce(content_tamano, octet_length(content)) AS content_tamano,
+               content_tipo,
+               date_trunc('second', coalesce(fecha_actualizacion, fecha_creacion) AT TIME ZONE 'EDT')
+                   AS fecha_modificacion
         FROM estudiante_documento
         WHERE estudiante_documento_id = %s;
     '''
@@ -145,7 +158,33 @@ def obtener_content_estudiante_documento_pg(
     if not results:
         return None
 
-    return results[0]['content']
+    return results[0]
+
+
+def obtener_archivos_estudiante_stream_pg(
+        estudiante_id: int,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Iterator[dict]:
+    """
+    Todos los archivos del estudiante en una sola consulta con cursor del lado del servidor.
+    Las filas sin migrar traen el bytea, así que se piden de a una: en memoria queda un documento.
+    """
+    sql = '''
+        select estudiante_documento_id,
+               tipo_documento,
+               estado,
+               fecha_creacion,
+               to_char(fecha_creacion, 'DD-MM-YYYY HH24:MI:SS') as fecha_creacion_texto,
+               content_sha256,
+               coalesce(content_tamano, octet_length(content)) as content_tamano,
+               content_tipo,
+               CASE WHEN content_sha256 IS NULL THEN content END AS content
+        from estudiante_documento
+        where estudiante_id = %s
+        order by fecha_creacion desc;
+    '''
+
+    yield from execute_query_stream(sql, [estudiante_id], conn=conexion, itersize=1)
 
 
 def verificar_documentos_completos_pg(
@@ -1,10 +1,15 @@
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from decimal import Decimal
+import asyncpg
 import psycopg2
-from models.estudiante_materia import EstudianteMateria, MateriaOut, EstudianteOut, CuatrimestreOut
-from models.paginacion import Paginacion
-from shared.utils import execute_query, formartear_secuencia_insertar_sql
+from models.estudiante_materia import EstudianteMateria
+from models.paginacion import PaginacionCursor
+from shared.constante import LimitePaginacion
+from shared.utils import execute_query, execute_query_async, execute_query_stream, formartear_secuencia_insertar_sql
+from shared.mapeo import construir_modelo
+from shared.paginacion import ConsultaPaginada, paginar_pg, paginar_async_pg, OrdenKeyset, ColumnaOrden, \
+    condicion_cursor, limite_keyset, armar_pagina
 
 
 def registrar_estudiante_materia_pg(
@@ -36,6 +41,107 @@ def registrar_estudiante_materia_pg(
         raise e
 
 
+def query_seleccionar_datos_estudiante_materia():
+    return """
+        SELECT 
+            em.estudiante_materia_id,
+            em.estudiante_id,
+            em.materia_id,
+            em.cuatrimestre_id,
+            em.estado,
+            em.calificacion,
+            em.fecha_creacion,
+            em.fecha_actualizacion,
+            e.nombres as estudiante_nombres,
+            e.apellidos as estudiante_apellidos,
+            m.nombre as materia_nombre,
+            m.codigo as materia_codigo,
+            c.periodo as cuatrimestre_periodo,
+            c.anio as cuatrimestre_anio
+        FROM estudiante_materia em
+        INNER JOIN estudiante e ON em.estudiante_id = e.estudiante_id
+        INNER JOIN materia m ON em.materia_id = m.materia_id
+        INNER JOIN cuatrimestre c ON em.cuatrimestre_id = c.cuatrimestre_id
+        WHERE 1=1
+    """
+
+
+def construir_filtros_estudiante_materia(
+        estudiante_materia_id: Optional[int] = None,
+        estudiante_id: Optional[int] = None,
+        materia_id: Optional[int] = None,
+        cuatrimestre_id: Optional[int] = None,
+        estado: Optional[str] = None
+) -> tuple[str, list]:
+    sql = ""
+    values = []
+
+    if estudiante_materia_id is not None:
+        sql += " AND em.estudiante_materia_id = %s"
+        values.append(estudiante_materia_id)
+
+    if estudiante_id is not None:
+        sql += " AND em.estudiante_id = %s"
+        values.append(estudiante_id)
+
+    if materia_id is not None:
+        sql += " AND em.materia_id = %s"
+        values.append(materia_id)
+
+    if cuatrimestre_id is not None:
+        sql += " AND em.cuatrimestre_id = %s"
+        values.append(cuatrimestre_id)
+
+    if estado is not None:
+        sql += " AND em.estado = %s"
+        values.append(estado)
+
+    return sql, values
+
+
+def mapear_estudiante_materia(row: Dict[str, Any]) -> EstudianteMateria:
+    return construir_modelo(EstudianteMateria, {
+        'estudianteMateriaId': row['estudianteMateriaId'],
+        'estudianteId': row['estudianteId'],
+        'materiaId': row['materiaId'],
+        'cuatrimestreId': row['cuatrimestreId'],
+        'estado': row['estado'],
+        'calificacion': row['calificacion'],
+        'fechaCreacion': row['fechaCreacion'],
+        'fechaActualizacion': row['fechaActualizacion'],
+        'estudiante': {
+            'estudianteId': row['estudianteId'],
+            'nombres': row['estudianteNombres'],
+            'apellidos': row['estudianteApellidos']
+        },
+        'materia': {
+            'materiaId': row['materiaId'],
+            'nombre': row['materiaNombre'],
+            'codigo': row['materiaCodigo']
+        },
+        'cuatrimestre': {
+            'cuatrimestreId': row['cuatrimestreId'],
+            'periodo': row['cuatrimestrePeriodo'],
+            'anio': row['cuatrimestreAnio']
+        }
+    })
+
+
+ORDEN_ESTUDIANTE_MATERIA = " ORDER BY c.anio DESC, c.periodo, e.apellidos, e.nombres, m.nombre"
+
+
+def consulta_paginada_estudiante_materia(filtros: str, values: list) -> ConsultaPaginada:
+    return ConsultaPaginada(
+        sql=query_seleccionar_datos_estudiante_materia() + filtros,
+        values=values,
+        orden="cuatrimestre_anio desc, cuatrimestre_periodo, estudiante_apellidos, estudiante_nombres, "
+              "materia_nombre, estudiante_materia_id",
+        clave='estudiante_materia',
+        tabla='estudiante_materia',
+        filtrada=bool(filtros)
+    )
+
+
 def obtener_estudiante_materia_pg(
         estudiante_materia_id: Optional[int] = None,
         estudiante_id: Optional[int] = None,
@@ -44,171 +150,172 @@ def obtener_estudiante_materia_pg(
         estado: Optional[str] = None,
         numero_pagina: Optional[int] = None,
         limite: Optional[int] = None,
+        modo_total: Optional[str] = None,
         conexion: psycopg2.extensions.connection = None
 ) -> Optional[Dict[str, Any] | List[EstudianteMateria]]:
     try:
-        sql = """
-            SELECT 
-                em.estudiante_materia_id,
-                em.estudiante_id,
-                em.materia_id,
-                em.cuatrimestre_id,
-                em.estado,
-                em.calificacion,
-                em.fecha_creacion,
-                em.fecha_actualizacion,
-                e.nombres as estudiante_nombres,
-                e.apellidos as estudiante_apellidos,
-                m.nombre as materia_nombre,
-                m.codigo as materia_codigo,
-                c.periodo as cuatrimestre_periodo,
-                c.anio as cuatrimestre_anio
-            FROM estudiante_materia em
-            INNER JOIN estudiante e ON em.estudiante_id = e.estudiante_id
-            INNER JOIN materia m ON em.materia_id = m.materia_id
-            INNER JOIN cuatrimestre c ON em.cuatrimestre_id = c.cuatrimestre_id
-            WHERE 1=1
-        """
-
-        values = []
-
-        if estudiante_materia_id is not None:
-            sql += " AND em.estudiante_materia_id = %s"
-            values.append(estudiante_materia_id)
-
-        if estudiante_id is not None:
-            sql += " AND em.estudiante_id = %s"
-            values.append(estudiante_id)
-
-        if materia_id is not None:
-            sql += " AND em.materia_id = %s"
-            values.append(materia_id)
-
-        if cuatrimestre_id is not None:
-            sql += " AND em.cuatrimestre_id = %s"
-            values.append(cuatrimestre_id)
-
-        if estado is not None:
-            sql += " AND em.estado = %s"
-            values.append(estado)
+        filtros, values = construir_filtros_estudiante_materia(
+            estudiante_materia_id, estudiante_id, materia_id, cuatrimestre_id, estado
+        )
 
-        sql += " ORDER BY c.anio DESC, c.periodo, e.apellidos, e.nombres, m.nombre"
+        sql = query_seleccionar_datos_estudiante_materia() + filtros + ORDEN_ESTUDIANTE_MATERIA
 
         # Si no hay paginación, devolver lista directamente
         if numero_pagina is None or limite is None:
-            resultado = execute_query(sql, values, conexion)
+            resultado = execute_query(sql, values, conexion, nombre_sentencia='estudiante_materia')
             if not resultado:
                 return None
 
-            estudiante_materias = []
-            for row in resultado:
-                estudiante_materia = EstudianteMateria(
-                    estudianteMateriaId=row['estudianteMateriaId'],
-                    estudianteId=row['estudianteId'],
-                    materiaId=row['materiaId'],
-                    cuatrimestreId=row['cuatrimestreId'],
-                    estado=row['estado'],
-                    calificacion=row['calificacion'],
-                    fechaCreacion=row['fechaCreacion'],
-                    fechaActualizacion=row['fechaActualizacion'],
-                    estudiante=EstudianteOut(
-                        estudianteId=row['estudianteId'],
-                        nombres=row['estudianteNombres'],
-                        apellidos=row['estudianteApellidos']
-                ),
-                    materia=MateriaOut(
-                        materiaId=row['materiaId'],
-                        nombre=row['materiaNombre'],
-                        codigo=row['materiaCodigo']
-                ),
-                    cuatrimestre=CuatrimestreOut(
-                        cuatrimestreId=row['cuatrimestreId'],
-                        periodo=row['cuatrimestrePeriodo'],
-                        anio=row['cuatrimestreAnio']
-                )
-                )
-                estudiante_materias.append(estudiante_materia)
-
-            return estudiante_materias
-
-        # Con paginación
-        offset = (numero_pagina - 1) * limite
-        sql_paginado = sql + f" LIMIT %s OFFSET %s"
-        values_paginado = values + [limite, offset]
-
-        resultado = execute_query(sql_paginado, values_paginado, conexion)
+            return [mapear_estudiante_materia(row) for row in resultado]
+
+        # Con paginación: página y total en una sola sentencia
+        resultado, paginacion = paginar_pg(
+            consulta_paginada_estudiante_materia(filtros, values), numero_pagina, limite, modo_total, conexion
+        )
 
         if not resultado:
             return None
 
-        # Contar total de registros
-        sql_count = """
-            SELECT COUNT(*) as total
-            FROM estudiante_materia em
-            INNER JOIN estudiante e ON em.estudiante_id = e.estudiante_id
-            INNER JOIN materia m ON em.materia_id = m.materia_id
-            INNER JOIN cuatrimestre c ON em.cuatrimestre_id = c.cuatrimestre_id
-            WHERE 1=1
-        """
+        return {
+            "estudiantesMaterias": [mapear_estudiante_materia(row) for row in resultado],
+            "paginacion": paginacion
+        }
+
+    except Exception as e:
+        logging.error(f"Error al obtener estudiante-materia: {str(e)}")
+        raise e
+
+
+ORDEN_ESTUDIANTE_MATERIA_KEYSET = OrdenKeyset('estudiante_materia', [
+    ColumnaOrden('c.anio', 'cuatrimestreAnio', int, descendente=True),
+    ColumnaOrden('c.periodo', 'cuatrimestrePeriodo', str),
+    ColumnaOrden('e.apellidos', 'estudianteApellidos', str),
+    ColumnaOrden('e.nombres', 'estudianteNombres', str),
+    ColumnaOrden('m.nombre', 'materiaNombre', str),
+    ColumnaOrden('em.estudiante_materia_id', 'estudianteMateriaId', int)
+])
+
 
-        if estudiante_materia_id is not None:
-            sql_count += " AND em.estudiante_materia_id = %s"
+def construir_consulta_estudiante_materia_keyset(
+        estudiante_id: Optional[int] = None,
+        materia_id: Optional[int] = None,
+        cuatrimestre_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: Optional[str] = None
+) -> tuple[str, list]:
+    filtros, values = construir_filtros_estudiante_materia(
+        None, estudiante_id, materia_id, cuatrimestre_id, estado
+    )
 
-        if estudiante_id is not None:
-            sql_count += " AND em.estudiante_id = %s"
+    condicion, values_cursor = condicion_cursor(ORDEN_ESTUDIANTE_MATERIA_KEYSET, cursor)
+    if condicion:
+        filtros += " AND " + condicion
+        values += values_cursor
 
-        if materia_id is not None:
-            sql_count += " AND em.materia_id = %s"
+    orden_limite, values_limite = limite_keyset(ORDEN_ESTUDIANTE_MATERIA_KEYSET, limite)
 
-        if cuatrimestre_id is not None:
-            sql_count += " AND em.cuatrimestre_id = %s"
+    sql = query_seleccionar_datos_estudiante_materia() + filtros + orden_limite
 
-        if estado is not None:
-            sql_count += " AND em.estado = %s"
-
-        count_resultado = execute_query(sql_count, values, conexion)
-        total = count_resultado[0]['total'] if count_resultado else 0
-
-        total_paginas = (total + limite - 1) // limite
-
-        estudiante_materias = []
-        for row in resultado:
-            estudiante_materia = EstudianteMateria(
-                estudianteMateriaId=row['estudianteMateriaId'],
-                estudianteId=row['estudianteId'],
-                materiaId=row['materiaId'],
-                cuatrimestreId=row['cuatrimestreId'],
-                estado=row['estado'],
-                calificacion=row['calificacion'],
-                fechaCreacion=row['fechaCreacion'],
-                fechaActualizacion=row['fechaActualizacion'],
-                estudiante=EstudianteOut(
-                    estudianteId=row['estudianteId'],
-                    nombres=row['estudianteNombres'],
-                    apellidos=row['estudianteApellidos']
-                ),
-                materia=MateriaOut(
-                    materiaId=row['materiaId'],
-                    nombre=row['materiaNombre'],
-                    codigo=row['materiaCodigo']
-                ),
-                cuatrimestre=CuatrimestreOut(
-                    cuatrimestreId=row['cuatrimestreId'],
-                    periodo=row['cuatrimestrePeriodo'],
-                    anio=row['cuatrimestreAnio']
-                )
-            )
-            estudiante_materias.append(estudiante_materia)
-
-        paginacion = Paginacion(
-            total=total,
-            numeroPagina=numero_pagina,
-            limite=limite,
-            totalPaginas=total_paginas
+    return sql, values + values_limite
+
+
+def armar_pagina_estudiante_materia(resultado, limite: int) -> Dict[str, Any]:
+    filas, siguiente_cursor = armar_pagina(ORDEN_ESTUDIANTE_MATERIA_KEYSET, resultado, limite)
+
+    return {
+        "estudiantesMaterias": [mapear_estudiante_materia(row) for row in filas],
+        "paginacion": PaginacionCursor(limite=limite, siguienteCursor=siguiente_cursor)
+    }
+
+
+def obtener_estudiante_materia_keyset_pg(
+        estudiante_id: Optional[int] = None,
+        materia_id: Optional[int] = None,
+        cuatrimestre_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: Optional[str] = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Dict[str, Any]:
+    sql, values = construir_consulta_estudiante_materia_keyset(
+        estudiante_id, materia_id, cuatrimestre_id, estado, limite, cursor
+    )
+
+    resultado = execute_query(sql, values, conexion, nombre_sentencia='estudiante_materia_keyset')
+
+    return armar_pagina_estudiante_materia(resultado, limite)
+
+
+async def obtener_estudiante_materia_keyset_async_pg(
+        estudiante_id: Optional[int] = None,
+        materia_id: Optional[int] = None,
+        cuatrimestre_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: Optional[str] = None,
+        conexion: asyncpg.Connection | None = None
+) -> Dict[str, Any]:
+    sql, values = construir_consulta_estudiante_materia_keyset(
+        estudiante_id, materia_id, cuatrimestre_id, estado, limite, cursor
+    )
+
+    resultado = await execute_query_async(sql, values, conexion)
+
+    return armar_pagina_estudiante_materia(resultado, limite)
+
+
+def obtener_estudiante_materia_stream_pg(
+        estudiante_id: Optional[int] = None,
+        materia_id: Optional[int] = None,
+        cuatrimestre_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Iterator[EstudianteMateria]:
+    filtros, values = construir_filtros_estudiante_materia(
+        None, estudiante_id, materia_id, cuatrimestre_id, estado
+    )
+
+    sql = query_seleccionar_datos_estudiante_materia() + filtros + ORDEN_ESTUDIANTE_MATERIA
+
+    for row in execute_query_stream(sql, values, conexion):
+        yield mapear_estudiante_materia(row)
+
+
+async def obtener_estudiante_materia_async_pg(
+        estudiante_materia_id: Optional[int] = None,
+        estudiante_id: Optional[int] = None,
+        materia_id: Optional[int] = None,
+        cuatrimestre_id: Optional[int] = None,
+        estado: Optional[str] = None,
+        numero_pagina: Optional[int] = None,
+        limite: Optional[int] = None,
+        modo_total: Optional[str] = None,
+        conexion: asyncpg.Connection | None = None
+) -> Optional[Dict[str, Any] | List[EstudianteMateria]]:
+    try:
+        filtros, values = construir_filtros_estudiante_materia(
+            estudiante_materia_id, estudiante_id, materia_id, cuatrimestre_id, estado
+        )
+
+        sql = query_seleccionar_datos_estudiante_materia() + filtros + ORDEN_ESTUDIANTE_MATERIA
+
+        if numero_pagina is None or limite is None:
+            resultado = await execute_query_async(sql, values, conexion)
+            if not resultado:
+                return None
+
+            return [mapear_estudiante_materia(row) for row in resultado]
+
+        resultado, paginacion = await paginar_async_pg(
+            consulta_paginada_estudiante_materia(filtros, values), numero_pagina, limite, modo_total, conexion
         )
 
+        if not resultado:
+            return None
+
         return {
-            "estudiantesMaterias": estudiante_materias,
+            "estudiantesMaterias": [mapear_estudiante_materia(row) for row in resultado],
             "paginacion": paginacion
         }
 
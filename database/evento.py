@@ -1,11 +1,16 @@
-import math
 from datetime import datetime
 from typing import Dict, Any, List
 
+import asyncpg
 import psycopg2
 
 from models.evento import Evento
-from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from models.paginacion import PaginacionCursor
+from shared.constante import LimitePaginacion
+from shared.utils import formartear_secuencia_insertar_sql, execute_query, execute_query_async
+from shared.mapeo import construir_modelos
+from shared.paginacion import ConsultaPaginada, paginar_pg, paginar_async_pg, OrdenKeyset, ColumnaOrden, \
+    condicion_cursor, agregar_condicion, limite_keyset, armar_pagina
 
 
 def registrar_evento_pg(
@@ -51,15 +56,6 @@ def registrar_evento_pg(
     return next((item['eventoId'] for item in results), None)
 
 
-def query_contar_eventos():
-    return '''
-           select count(*) as total
-           from evento e
-                    join usuario u on e.usuario_creacion_id = u.usuario_id
-                    join categoria_evento ce on e.categoria_evento_id = ce.categoria_evento_id
-           '''
-
-
 def query_seleccionar_datos_evento():
     return '''
            select e.evento_id,
@@ -85,16 +81,13 @@ def query_seleccionar_datos_evento():
            '''
 
 
-def obtener_evento_pg(
+def construir_filtros_evento(
         evento_id: int | None = None,
         categoria_evento_id: int | None = None,
         estado: str | None = None,
         fecha_inicio: datetime | None = None,
-        fecha_fin: datetime | None = None,
-        numero_pagina: int | None = None,
-        limite: int | None = None,
-        conexion: psycopg2.extensions.connection | None = None
-) -> Dict[str, Any] | List[Evento] | None:
+        fecha_fin: datetime | None = None
+) -> tuple[str, list]:
     # Construir las condiciones WHERE
     where_exprss = []
     values = []
@@ -121,57 +114,42 @@ def obtener_evento_pg(
     if where_exprss:
         where_clause = " where " + " and ".join(where_exprss)
 
-    # Si se solicita paginación
-    if numero_pagina is not None and limite is not None:
-        # Validar parámetros de paginación
-        if numero_pagina < 1:
-            numero_pagina = 1
-        if limite < 1:
-            limite = 10
-
-        # Contar total de registros
-        sql_count = query_contar_eventos() + where_clause + ";"
-        count_results = execute_query(sql_count, values, conn=conexion)
-
-        if not count_results:
-            return {
-                "eventos": [],
-                "paginacion": {
-                    "total": 0,
-                    "numeroPagina": numero_pagina,
-                    "limite": limite,
-                    "totalPaginas": 0
-                }
-            }
-
-        total_registros = count_results[0]['total']
-        total_paginas = math.ceil(total_registros / limite)
-
-        # Si la página solicitada es mayor al total de páginas, devolver la última página
-        if numero_pagina > total_paginas and total_paginas > 0:
-            numero_pagina = total_paginas
-
-        # Construir query con paginación
-        offset = (numero_pagina - 1) * limite
-        sql = query_seleccionar_datos_evento()
-        sql += where_clause
-        sql += " order by e.fecha_creacion desc"
-        sql += f" limit {limite} offset {offset};"
+    return where_clause, values
+
 
-        results = execute_query(sql, values, conn=conexion)
+def consulta_paginada_evento(where_clause: str, values: list) -> ConsultaPaginada:
+    return ConsultaPaginada(
+        sql=query_seleccionar_datos_evento() + where_clause,
+        values=values,
+        orden="fecha_creacion desc, evento_id desc",
+        clave='evento',
+        tabla='evento',
+        filtrada=bool(where_clause)
+    )
 
-        eventos = []
-        if results:
-            eventos = [Evento(**item) for item in results]
+
+def obtener_evento_pg(
+        evento_id: int | None = None,
+        categoria_evento_id: int | None = None,
+        estado: str | None = None,
+        fecha_inicio: datetime | None = None,
+        fecha_fin: datetime | None = None,
+        numero_pagina: int | None = None,
+        limite: int | None = None,
+        modo_total: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Dict[str, Any] | List[Evento] | None:
+    where_clause, values = construir_filtros_evento(evento_id, categoria_evento_id, estado, fecha_inicio, fecha_fin)
+
+    # Si se solicita paginación: página y total en una sola sentencia
+    if numero_pagina is not None and limite is not None:
+        results, paginacion = paginar_pg(
+            consulta_paginada_evento(where_clause, values), numero_pagina, limite, modo_total, conexion
+        )
 
         return {
-            "eventos": eventos,
-            "paginacion": {
-                "total": total_registros,
-                "numeroPagina": numero_pagina,
-                "limite": limite,
-                "totalPaginas": total_paginas
-            }
+            "eventos": construir_modelos(Evento, results),
+            "paginacion": paginacion
         }
 
     # Sin paginación - comportamiento original
@@ -180,16 +158,122 @@ def obtener_evento_pg(
         sql += where_clause
         sql += " order by e.fecha_creacion desc;"
 
-        results = execute_query(sql, values, conn=conexion)
+        results = execute_query(sql, values, conn=conexion, nombre_sentencia='evento')
 
         if not results:
             return None
 
-        items = [Evento(**item) for item in results]
+        items = construir_modelos(Evento, results)
 
         return items
 
 
+async def obtener_evento_async_pg(
+        evento_id: int | None = None,
+        categoria_evento_id: int | None = None,
+        estado: str | None = None,
+        fecha_inicio: datetime | None = None,
+        fecha_fin: datetime | None = None,
+        numero_pagina: int | None = None,
+        limite: int | None = None,
+        modo_total: str | None = None,
+        conexion: asyncpg.Connection | None = None
+) -> Dict[str, Any] | List[Evento] | None:
+    where_clause, values = construir_filtros_evento(evento_id, categoria_evento_id, estado, fecha_inicio, fecha_fin)
+
+    if numero_pagina is not None and limite is not None:
+        results, paginacion = await paginar_async_pg(
+            consulta_paginada_evento(where_clause, values), numero_pagina, limite, modo_total, conexion
+        )
+
+        return {
+            "eventos": construir_modelos(Evento, results),
+            "paginacion": paginacion
+        }
+
+    sql = query_seleccionar_datos_evento()
+    sql += where_clause
+    sql += " order by e.fecha_creacion desc;"
+
+    results = await execute_query_async(sql, values, conn=conexion)
+
+    if not results:
+        return None
+
+    return construir_modelos(Evento, results)
+
+
+ORDEN_EVENTO = OrdenKeyset('evento', [
+    ColumnaOrden('e.fecha_creacion', 'fechaCreacion', datetime, descendente=True),
+    ColumnaOrden('e.evento_id', 'eventoId', int, descendente=True)
+])
+
+
+def construir_consulta_evento_keyset(
+        categoria_evento_id: int | None = None,
+        estado: str | None = None,
+        fecha_inicio: datetime | None = None,
+        fecha_fin: datetime | None = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: str | None = None
+) -> tuple[str, list]:
+    where_clause, values = construir_filtros_evento(None, categoria_evento_id, estado, fecha_inicio, fecha_fin)
+
+    condicion, values_cursor = condicion_cursor(ORDEN_EVENTO, cursor)
+    if condicion:
+        where_clause = agregar_condicion(where_clause, condicion)
+        values += values_cursor
+
+    orden_limite, values_limite = limite_keyset(ORDEN_EVENTO, limite)
+
+    sql = query_seleccionar_datos_evento()
+    sql += where_clause
+    sql += orden_limite
+
+    return sql, values + values_limite
+
+
+def armar_pagina_evento(results, limite: int) -> Dict[str, Any]:
+    filas, siguiente_cursor = armar_pagina(ORDEN_EVENTO, results, limite)
+
+    return {
+        "eventos": construir_modelos(Evento, filas),
+        "paginacion": PaginacionCursor(limite=limite, siguienteCursor=siguiente_cursor)
+    }
+
+
+def obtener_evento_keyset_pg(
+        categoria_evento_id: int | None = None,
+        estado: str | None = None,
+        fecha_inicio: datetime | None = None,
+        fecha_fin: datetime | None = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Dict[str, Any]:
+    sql, values = construir_consulta_evento_keyset(categoria_evento_id, estado, fecha_inicio, fecha_fin, limite, cursor)
+
+    results = execute_query(sql, values, conn=conexion, nombre_sentencia='evento_keyset')
+
+    return armar_pagina_evento(results, limite)
+
+
+async def obtener_evento_keyset_async_pg(
+        categoria_evento_id: int | None = None,
+        estado: str | None = None,
+        fecha_inicio: datetime | None = None,
+        fecha_fin: datetime | None = None,
+        limite: int = LimitePaginacion.DEFECTO,
+        cursor: str | None = None,
+        conexion: asyncpg.Connection | None = None
+) -> Dict[str, Any]:
+    sql, values = construir_consulta_evento_keyset(categoria_evento_id, estado, fecha_inicio, fecha_fin, limite, cursor)
+
+    results = await execute_query_async(sql, values, conn=conexion)
+
+    return armar_pagina_evento(results, limite)
+
+
 def actualizar_evento_pg(
         evento_id: int,
         usuario_actualizacion_id: int,
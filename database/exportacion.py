@@ -0,0 +1,240 @@
+from datetime import date
+from typing import Iterator
+
+import psycopg2
+
+from shared.utils import execute_query, execute_query_stream
+
+
+def registrar_exportacion_pg(
+        estado: str,
+        estado_estudiante: str,
+        fecha_desde: date | None,
+        fecha_hasta: date | None,
+        usuario_creacion_id: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    query = """
+            insert into exportacion_documento (estado, estado_estudiante, fecha_desde, fecha_hasta, usuario_creacion_id)
+            values (%s, %s, %s, %s, %s)
+            returning exportacion_documento_id;
+            """
+
+    values = [estado, estado_estudiante, fecha_desde, fecha_hasta, usuario_creacion_id]
+
+    results = execute_query(query, values, conn=conexion)
+
+    return next((item['exportacionDocumentoId'] for item in results), None)
+
+
+def obtener_exportacion_pg(
+        exportacion_documento_id: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = """
+          select exportacion_documento_id,
+                 estado,
+                 estado_estudiante,
+                 to_char(fecha_desde, 'DD-MM-YYYY')                         as fecha_desde,
+                 to_char(fecha_hasta, 'DD-MM-YYYY')                         as fecha_hasta,
+                 total_documentos,
+                 documentos_procesados,
+                 tamano,
+                 error,
+                 to_char(fecha_creacion, 'DD-MM-YYYY HH24:MI:SS')           as fecha_creacion,
+                 to_char(fecha_finalizacion, 'DD-MM-YYYY HH24:MI:SS')       as fecha_finalizacion,
+                 to_char(fecha_expiracion, 'DD-MM-YYYY HH24:MI:SS')         as fecha_expiracion
+          from exportacion_documento
+          where exportacion_documento_id = %s;
+          """
+
+    results = execute_query(sql, [exportacion_documento_id], conn=conexion)
+
+    return next((item for item in results), None)
+
+
+def iniciar_exportacion_pg(
+        exportacion_documento_id: int,
+        estado: str,
+        estado_pendiente: str,
+        total_documentos: int,
+        conexion: psycopg2.extensions.connection | None = None
+) -> bool:
+    # Solo desde pendiente: si mientras esperaba en la cola se marcó con error, no se arma
+    query = """
+            update exportacion_documento
+            set estado = %s,
+                total_documentos = %s,
+                fecha_actualizacion = (now() at time zone 'EDT')
+            where exportacion_documento_id = %s
+              and estado = %s
+            returning exportacion_documento_id;
+            """
+
+    values = [estado, total_documentos, exportacion_documento_id, estado_pendiente]
+
+    results = execute_query(query, values, conn=conexion)
+
+    return bool(results)
+
+
+def actualizar_progreso_exportacion_pg(
+        exportacion_documento_id: int,
+        documentos_procesados: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    query = """
+            update exportacion_documento
+            set documentos_procesados = %s,
+                fecha_actualizacion = (now() at time zone 'EDT')
+            where exportacion_documento_id = %s;
+            """
+
+    execute_query(query, [documentos_procesados, exportacion_documento_id], conn=conexion)
+
+
+def finalizar_exportacion_pg(
+        exportacion_documento_id: int,
+        estado: str,
+        documentos_procesados: int,
+        tamano: int | None = None,
+        duracion_horas: float | None = None,
+        error: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    query = """
+            update exportacion_documento
+            set estado = %s,
+                documentos_procesados = %s,
+                tamano = %s,
+                error = %s,
+                fecha_finalizacion = (now() at time zone 'EDT'),
+                fecha_expiracion = (now() at time zone 'EDT') + make_interval(secs => %s),
+                fecha_actualizacion = (now() at time zone 'EDT')
+            where exportacion_documento_id = %s;
+            """
+
+    segundos = duracion_horas * 3600 if duracion_horas is not None else None
+    values = [estado, documentos_procesados, tamano, error, segundos, exportacion_documento_id]
+
+    execute_query(query, values, conn=conexion)
+
+
+def expirar_exportaciones_pg(
+        estado_completada: str,
+        estado_expirada: str,
+        conexion: psycopg2.extensions.connection | None = None
+) -> list[int]:
+    query = """
+            update exportacion_documento
+            set estado = %s,
+                fecha_actualizacion = (now() at time zone 'EDT')
+            where estado = %s
+              and fecha_expiracion < (now() at time zone 'EDT')
+            returning exportacion_documento_id;
+            """
+
+    results = execute_query(query, [estado_expirada, estado_completada], conn=conexion)
+
+    return [item['exportacionDocumentoId'] for item in results]
+
+
+def marcar_exportaciones_abandonadas_pg(
+        estados_activos: list[str],
+        estado_error: str,
+        minutos_sin_actividad: float,
+        error: str,
+        conexion: psycopg2.extensions.connection | None = None
+) -> list[int]:
+    """
+    Exportaciones en los estados dados sin actividad desde hace minutos_sin_actividad
+    (el progreso se actualiza seguido mientras corre): quedaron así porque se reinició el worker
+    """
+    query = """
+            update exportacion_documento
+            set estado = %s,
+                error = %s,
+                fecha_finalizacion = (now() at time zone 'EDT'),
+                fecha_actualizacion = (now() at time zone 'EDT')
+            where estado = any(%s)
+              and coalesce(fecha_actualizacion, fecha_creacion)
+                  < (now() at time zone 'EDT') - make_interval(secs => %s)
+            returning exportacion_documento_id;
+            """
+
+    values = [estado_error, error, estados_activos, minutos_sin_actividad * 60]
+
+    results = execute_query(query, values, conn=conexion)
+
+    return [item['exportacionDocumentoId'] for item in results]
+
+
+def construir_filtros_exportacion(
+        estado_estudiante: str,
+        fecha_desde: date | None,
+        fecha_hasta: date | None
+) -> tuple[str, list]:
+    where_exprss = ["e.estado = %s", "ed.content_sha256 is not null or ed.content is not null"]
+    values = [estado_estudiante]
+
+    if fecha_desde is not None:
+        where_exprss.append("e.fecha_creacion >= %s")
+        values.append(fecha_desde)
+
+    if fecha_hasta is not None:
+        # fecha_hasta incluye todo ese día
+        where_exprss.append("e.fecha_creacion < %s + 1")
+        values.append(fecha_hasta)
+
+    return " where " + " and ".join(f"({expresion})" for expresion in where_exprss), values
+
+
+def contar_documentos_exportacion_pg(
+        estado_estudiante: str,
+        fecha_desde: date | None,
+        fecha_hasta: date | None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> int:
+    where_clause, values = construir_filtros_exportacion(estado_estudiante, fecha_desde, fecha_hasta)
+
+    sql = """
+          select count(*) as total
+          from estudiante e
+                   join estudiante_documento ed on ed.estudiante_id = e.estudiante_id
+          """ + where_clause
+
+    results = execute_query(sql, values, conn=conexion)
+
+    return results[0]['total'] if results else 0
+
+
+def obtener_documentos_exportacion_stream_pg(
+        estado_estudiante: str,
+        fecha_desde: date | None,
+        fecha_hasta: date | None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> Iterator[dict]:
+    """
+    Documentos de todos los estudiantes del filtro en una sola consulta con cursor del lado del servidor,
+    de a una fila porque las filas sin migrar traen el bytea
+    """
+    where_clause, values = construir_filtros_exportacion(estado_estudiante, fecha_desde, fecha_hasta)
+
+    sql = """
+          select e.estudiante_id,
+                 e.matricula,
+                 e.nombres,
+                 e.apellidos,
+                 ed.tipo_documento,
+                 ed.estado,
+                 ed.fecha_creacion,
+                 to_char(ed.fecha_creacion, 'DD-MM-YYYY HH24:MI:SS')          as fecha_creacion_texto,
+                 ed.content_sha256,
+                 coalesce(ed.content_tamano, octet_length(ed.content))        as content_tamano,
+                 ed.content_tipo,
+                 CASE WHEN ed.content_sha256 IS NULL THEN ed.content END      AS content
+          from estudiante e
+                   join estudiante_documento ed on ed.estudiante_id = e.estudiante_id
+          """ + where_clause + " order by e.estudiante_id, ed.tipo_documento"
+
+    yield from execute_query_stream(sql, values, conn=conexion, itersize=1)
@@ -1,16 +1,19 @@
 from datetime import datetime
 
+import asyncpg
 import psycopg2
 
 from models.libro import Libro
-from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from shared.utils import formartear_secuencia_insertar_sql, execute_query, execute_query_async
+from shared.mapeo import construir_modelos
+from shared.almacenamiento import BlobGuardado
 
 
 def registrar_libro_pg(
         editorial_id: int,
         titulo: str,
         estado: str,
-        content: bytes,
+        blob: BlobGuardado,
         imagen_url: str,
         usuario_creacion_id: int,
         cantidad_disponible: int,
@@ -24,7 +27,9 @@ def registrar_libro_pg(
         'editorial_id',
         'titulo',
         'estado',
-        'content',
+        'content_sha256',
+        'content_tamano',
+        'content_tipo',
         'usuario_creacion_id',
         'cantidad_disponible',
         'sipnosis',
@@ -38,7 +43,9 @@ def registrar_libro_pg(
         editorial_id,
         titulo,
         estado,
-        psycopg2.Binary(content),
+        blob.sha256,
+        blob.tamano,
+        blob.tipo,
         usuario_creacion_id,
         cantidad_disponible,
         sipnosis,
@@ -110,12 +117,11 @@ def query_seleccionar_datos_libro():
            '''
 
 
-def obtener_libros_pg(
+def construir_consulta_libros(
         libro_id: int | None = None,
         estado: str | None = None,
-        titulo: str | None = None,
-        conexion: psycopg2.extensions.connection | None = None
-):
+        titulo: str | None = None
+) -> tuple[str, list]:
     sql = query_seleccionar_datos_libro()
 
     where_exprss = []
@@ -139,22 +145,58 @@ def obtener_libros_pg(
 
     sql += " ORDER BY l.fecha_creacion DESC;"
 
-    results = execute_query(sql, values, conn=conexion)
+    return sql, values
+
+
+def obtener_libros_pg(
+        libro_id: int | None = None,
+        estado: str | None = None,
+        titulo: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql, values = construir_consulta_libros(libro_id, estado, titulo)
+
+    results = execute_query(sql, values, conn=conexion, nombre_sentencia='libro')
 
     if not results:
         return None
 
-    items = [Libro(**item) for item in results]
+    items = construir_modelos(Libro, results)
 
     return items
 
 
-def obtener_content_libro(
+async def obtener_libros_async_pg(
+        libro_id: int | None = None,
+        estado: str | None = None,
+        titulo: str | None = None,
+        conexion: asyncpg.Connection | None = None
+):
+    sql, values = construir_consulta_libros(libro_id, estado, titulo)
+
+    results = await execute_query_async(sql, values, conn=conexion)
+
+    if not results:
+        return None
+
+    return construir_modelos(Libro, results)
+
+
+def obtener_metadatos_archivo_libro_pg(
         libro_id: int,
         conexion: psycopg2.extensions.connection | None = None
 ):
+    """
+    Validadores de la descarga (sha256 y fecha de modificación) y título, sin leer la columna content:
+    octet_length del bytea sale del encabezado del valor, no lo descomprime
+    """
     sql = '''
-        SELECT content
+        SELECT titulo,
+               content_sha256,
+               coalesce(content_tamano, octet_length(content)) AS content_tamano,
+               content_tipo,
+               date_trunc('second', coalesce(fecha_actualizacion, fecha_creacion) AT TIME ZONE 'EDT')
+                   AS fecha_modificacion
         FROM libro
         WHERE libro_id = %s;
     '''
@@ -166,7 +208,7 @@ def obtener_content_libro(
     if not results:
         return None
 
-    return results[0]['content']
+    return results[0]
 
 
 def actualizar_libro_pg(
@@ -0,0 +1,48 @@
+import psycopg2
+
+from shared.utils import execute_query
+
+# Tokens del bucket recargados hasta ahora (en el UPDATE, l.* es la fila anterior)
+_TOKENS_RECARGADOS = """
+    least(%(capacidad)s,
+          l.tokens + extract(epoch from (now() at time zone 'EDT') - l.fecha_actualizacion) * %(recarga)s)
+"""
+
+
+def consumir_token_pg(
+        clave: str,
+        capacidad: float,
+        recarga_por_segundo: float,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    """
+    Recarga y consume un token del bucket en una sola sentencia atómica.
+    Devuelve si se permitió y los tokens que quedaron.
+    """
+    sql = f"""
+          insert into limite_intentos as l (clave, tokens, permitido, fecha_actualizacion)
+          values (%(clave)s, %(capacidad)s - 1, true, (now() at time zone 'EDT'))
+          on conflict (clave) do update
+              set tokens = {_TOKENS_RECARGADOS} - case when {_TOKENS_RECARGADOS} >= 1 then 1 else 0 end,
+                  permitido = {_TOKENS_RECARGADOS} >= 1,
+                  fecha_actualizacion = (now() at time zone 'EDT')
+          returning permitido, tokens;
+          """
+
+    values = {'clave': clave, 'capacidad': capacidad, 'recarga': recarga_por_segundo}
+
+    results = execute_query(sql, values, conn=conexion)
+
+    return next((item for item in results), None)
+
+
+def eliminar_limites_vencidos_pg(
+        antiguedad_segundos: float,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = """
+          delete from limite_intentos
+          where fecha_actualizacion < (now() at time zone 'EDT') - make_interval(secs => %s);
+          """
+
+    execute_query(sql, [antiguedad_segundos], conn=conexion)
@@ -0,0 +1,65 @@
+"""
+Borra del almacén los blobs sin referencias en blob_contenido (filas borradas o reemplazadas,
+uploads cuyo request se revirtió) y los temporales de escrituras interrumpidas, e informa
+el espacio liberado.
+
+Uso, desde la raíz del proyecto:
+
+    python -m database.limpiar_blobs [--gracia-minutos 60] [--simular]
+
+Solo se tocan archivos más viejos que el período de gracia: un upload en curso publica el
+blob antes de confirmar la fila que lo referencia.
+"""
+import argparse
+import logging
+import time
+
+from database.blob_contenido import obtener_hashes_referenciados_pg, eliminar_blob_sin_referencias_pg
+from shared.almacenamiento import almacen_blobs
+
+
+def limpiar_blobs(gracia_segundos: float, simular: bool = False) -> tuple[int, int]:
+    referenciados = obtener_hashes_referenciados_pg()
+    limite = time.time() - gracia_segundos
+
+    eliminados = 0
+    bytes_liberados = 0
+
+    for blob in almacen_blobs.listar():
+        if blob.sha256 in referenciados or blob.fecha_modificacion >= limite:
+            continue
+
+        if simular:
+            eliminados += 1
+            bytes_liberados += blob.tamano
+            continue
+
+        if almacen_blobs.eliminar(blob.sha256, modificado_antes_de=limite):
+            eliminar_blob_sin_referencias_pg(blob.sha256)
+            eliminados += 1
+            bytes_liberados += blob.tamano
+
+    if not simular:
+        bytes_liberados += almacen_blobs.limpiar_temporales(gracia_segundos)
+
+    return eliminados, bytes_liberados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Elimina los blobs sin referencias")
+    parser.add_argument('--gracia-minutos', type=float, default=60, help="Antigüedad mínima para borrar")
+    parser.add_argument('--simular', action='store_true', help="Solo informar lo que se borraría")
+    argumentos = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    eliminados, bytes_liberados = limpiar_blobs(argumentos.gracia_minutos * 60, argumentos.simular)
+
+    logging.info(
+        f"{'Se eliminarían' if argumentos.simular else 'Eliminados'} {eliminados} blobs sin referencias, "
+        f"{bytes_liberados / 1024 / 1024:.1f} MB liberados"
+    )
+
+
+if __name__ == "__main__":
+    main()
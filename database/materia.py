@@ -2,6 +2,7 @@ import psycopg2
 
 from models.materia import Materia
 from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from shared.mapeo import construir_modelos
 
 
 def registrar_materia_pg(
@@ -70,7 +71,7 @@ def obtener_materia_pg(
     if not results:
         return None
 
-    items = [Materia(**item) for item in results]
+    items = construir_modelos(Materia, results)
 
     return items
 
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import psycopg2.extensions
+
+from database.sentencias import registro_sentencias
+
+
+class ConfiguracionMetricas:
+    # Límite de formas de consulta distintas por proceso; el resto se agrupa en "otras"
+    MAX_CONSULTAS = int(os.getenv('METRICAS_MAX_CONSULTAS', '500'))
+    LARGO_MAXIMO_CONSULTA = int(os.getenv('METRICAS_LARGO_MAXIMO_CONSULTA', '200'))
+    BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+_espacios = re.compile(r'\s+')
+_numeros = re.compile(r'\b\d+\b')
+_textos = re.compile(r"'(?:[^']|'')*'")
+# Sentencias de control de ejecutar_sentencia: no son consultas del request
+_control = re.compile(r'^\s*(?:PREPARE|SAVEPOINT|RELEASE|ROLLBACK\s+TO)\b', re.IGNORECASE)
+_ejecutar = re.compile(r'^\s*EXECUTE\s+(\w+)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def forma_consulta(sql: str) -> tuple[str, str]:
+    """
+    Normaliza el SQL (espacios, literales numéricos y de texto) para agrupar por forma de consulta.
+    Devuelve (id corto, texto truncado para la etiqueta).
+    """
+    texto = _espacios.sub(' ', sql).strip().rstrip(';').strip()
+    texto = _textos.sub('?', texto)
+    texto = _numeros.sub('?', texto)
+
+    consulta_id = hashlib.sha1(texto.encode()).hexdigest()[:12]
+
+    return consulta_id, texto[:ConfiguracionMetricas.LARGO_MAXIMO_CONSULTA]
+
+
+class _MetricaConsulta:
+    __slots__ = ('texto', 'buckets', 'cantidad', 'suma', 'filas', 'errores')
+
+    def __init__(self, texto: str):
+        self.texto = texto
+        self.buckets = [0] * len(ConfiguracionMetricas.BUCKETS_SEGUNDOS)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.filas = 0
+        self.errores = 0
+
+
+class MetricasConsultas:
+    """
+    Histograma de latencia, filas y errores por forma de consulta (por proceso)
+    """
+
+    def __init__(self):
+        self._consultas: dict[str, _MetricaConsulta] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, sql, duracion: float, filas: int = 0, error: bool = False):
+        if isinstance(sql, bytes):
+            sql = sql.decode(errors='replace')
+
+        consulta_id, texto = forma_consulta(sql)
+
+        with self._lock:
+            metrica = self._consultas.get(consulta_id)
+
+            if metrica is None:
+                if len(self._consultas) >= ConfiguracionMetricas.MAX_CONSULTAS:
+                    consulta_id, texto = 'otras', 'otras'
+                    metrica = self._consultas.get(consulta_id)
+
+                if metrica is None:
+                    metrica = self._consultas[consulta_id] = _MetricaConsulta(texto)
+
+            for indice, limite in enumerate(ConfiguracionMetricas.BUCKETS_SEGUNDOS):
+                if duracion <= limite:
+                    metrica.buckets[indice] += 1
+                    break
+
+            metrica.cantidad += 1
+            metrica.suma += duracion
+            metrica.filas += filas
+            if error:
+                metrica.errores += 1
+
+    def instantanea(self) -> dict[str, tuple]:
+        with self._lock:
+            return {
+                consulta_id: (m.texto, list(m.buckets), m.cantidad, m.suma, m.filas, m.errores)
+                for consulta_id, m in self._consultas.items()
+            }
+
+    def reiniciar(self):
+        with self._lock:
+            self._consultas.clear()
+
+
+metricas_consultas = MetricasConsultas()
+
+
+class CursorInstrumentado(psycopg2.extensions.cursor):
+    """
+    Cursor de las conexiones del pool: mide cada execute, incluso en las funciones que usan
+    conexion.cursor() directamente en lugar de execute_query
+    """
+
+    def execute(self, query, vars=None):
+        texto = self._texto(query)
+
+        if texto is None:
+            return super().execute(query, vars)
+
+        inicio = time.perf_counter()
+
+        try:
+            resultado = super().execute(query, vars)
+        except Exception:
+            metricas_consultas.registrar(texto, time.perf_counter() - inicio, error=True)
+            raise
+
+        metricas_consultas.registrar(texto, time.perf_counter() - inicio, max(self.rowcount, 0))
+
+        return resultado
+
+    def executemany(self, query, vars_list):
+        texto = self._texto(query)
+
+        if texto is None:
+            return super().executemany(query, vars_list)
+
+        inicio = time.perf_counter()
+
+        try:
+            resultado = super().executemany(query, vars_list)
+        except Exception:
+            metricas_consultas.registrar(texto, time.perf_counter() - inicio, error=True)
+            raise
+
+        metricas_consultas.registrar(texto, time.perf_counter() - inicio, max(self.rowcount, 0))
+
+        return resultado
+
+    def _texto(self, query) -> str | None:
+        """
+        SQL con el que se agrupa la consulta: el de la sentencia original para EXECUTE,
+        None para PREPARE y los savepoints que no se miden
+        """
+        if isinstance(query, bytes):
+            query = query.decode(errors='replace')
+        elif not isinstance(query, str):
+            query = query.as_string(self)
+
+        if _control.match(query):
+            return None
+
+        ejecutar = _ejecutar.match(query)
+
+        if ejecutar:
+            sentencia = registro_sentencias.por_nombre(ejecutar.group(1))
+
+            if sentencia is not None:
+                return sentencia.query
+
+        return query
+
+
+def _escapar_etiqueta(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(consulta_id: str, texto: str) -> str:
+    return f'consulta_id="{consulta_id}",consulta="{_escapar_etiqueta(texto)}"'
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar_prometheus(estadisticas_pools: dict[str, dict] | None = None) -> str:
+    """
+    Formato de texto de Prometheus (version 0.0.4)
+    """
+    lineas = [
+        '# HELP db_consulta_duracion_segundos Latencia de las consultas SQL por forma de consulta',
+        '# TYPE db_consulta_duracion_segundos histogram',
+    ]
+
+    instantanea = metricas_consultas.instantanea()
+
+    for consulta_id, (texto, buckets, cantidad, suma, _, _) in instantanea.items():
+        etiquetas = _etiquetas(consulta_id, texto)
+
+        acumulado = 0
+        for limite, valor in zip(ConfiguracionMetricas.BUCKETS_SEGUNDOS, buckets):
+            acumulado += valor
+            lineas.append(f'db_consulta_duracion_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+
+        lineas.append(f'db_consulta_duracion_segundos_bucket{{{etiquetas},le="+Inf"}} {cantidad}')
+        lineas.append(f'db_consulta_duracion_segundos_sum{{{etiquetas}}} {_numero(suma)}')
+        lineas.append(f'db_consulta_duracion_segundos_count{{{etiquetas}}} {cantidad}')
+
+    lineas.append('# HELP db_consulta_filas_total Filas devueltas o afectadas por forma de consulta')
+    lineas.append('# TYPE db_consulta_filas_total counter')
+    for consulta_id, (texto, _, _, _, filas, _) in instantanea.items():
+        lineas.append(f'db_consulta_filas_total{{{_etiquetas(consulta_id, texto)}}} {filas}')
+
+    lineas.append('# HELP db_consulta_errores_total Consultas que terminaron en error por forma de consulta')
+    lineas.append('# TYPE db_consulta_errores_total counter')
+    for consulta_id, (texto, _, _, _, _, errores) in instantanea.items():
+        lineas.append(f'db_consulta_errores_total{{{_etiquetas(consulta_id, texto)}}} {errores}')
+
+    if estadisticas_pools:
+        for nombre, tipo, clave in (
+                ('db_pool_conexiones_total', 'gauge', 'total'),
+                ('db_pool_conexiones_en_uso', 'gauge', 'enUso'),
+                ('db_pool_conexiones_libres', 'gauge', 'libres'),
+                ('db_pool_esperando', 'gauge', 'esperando'),
+                ('db_pool_prestamos_total', 'counter', 'prestamos'),
+                ('db_pool_rechazos_total', 'counter', 'rechazos'),
+        ):
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for pool, estadisticas in estadisticas_pools.items():
+                lineas.append(f'{nombre}{{pool="{_escapar_etiqueta(pool)}"}} {estadisticas[clave]}')
+
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,131 @@
+"""
+Mueve el contenido bytea de libro y estudiante_documento al almacén de blobs, por lotes.
+
+Uso, desde la raíz del proyecto (después de aplicar resources/database/4-almacen-blobs.sql):
+
+    python -m database.migrar_blobs [--tabla libro|estudiante_documento] [--lote 5] [--maximo N]
+
+Cada lote se confirma por separado, así que se puede interrumpir y volver a correr:
+solo toma las filas que todavía no tienen content_sha256.
+"""
+import argparse
+import logging
+import time
+
+import psycopg2
+
+from database.connection import get_connection
+from database.contenido import TablaContenido, TABLAS_CONTENIDO, iterar_content_pg
+from shared.almacenamiento import almacen_blobs, TipoContenido
+from shared.utils import execute_query
+
+
+def obtener_lote_bytea_pg(
+        tabla: TablaContenido,
+        desde_id: int,
+        limite: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    # skip locked: otra corrida en paralelo toma filas distintas. Sin el bytea: cada contenido
+    # se lee después por bloques, así el lote no queda entero en memoria
+    sql = f"""
+          select {tabla.columna_id} as id, octet_length(content) as tamano
+          from {tabla.tabla}
+          where {tabla.columna_id} > %s
+            and content_sha256 is null
+            and content is not null
+          order by {tabla.columna_id}
+          limit %s
+          for update skip locked;
+          """
+
+    return execute_query(sql, [desde_id, limite], conn=conexion) or []
+
+
+def marcar_blob_migrado_pg(
+        tabla: TablaContenido,
+        registro_id: int,
+        sha256: str,
+        tamano: int,
+        tipo: str,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = f"""
+          update {tabla.tabla}
+          set content_sha256 = %s,
+              content_tamano = %s,
+              content_tipo = %s,
+              content = null
+          where {tabla.columna_id} = %s
+          returning {tabla.columna_id} as id;
+          """
+
+    results = execute_query(sql, [sha256, tamano, tipo, registro_id], conn=conexion)
+
+    return next((item['id'] for item in results), None)
+
+
+def migrar_tabla(tabla: TablaContenido, lote: int, maximo: int | None = None) -> tuple[int, int]:
+    migradas = 0
+    bytes_migrados = 0
+    ultimo_id = 0
+
+    while maximo is None or migradas < maximo:
+        conexion = get_connection()
+
+        try:
+            filas = obtener_lote_bytea_pg(tabla, ultimo_id, lote, conexion)
+
+            if not filas:
+                conexion.rollback()
+                break
+
+            for fila in filas:
+                # El blob queda escrito (y sincronizado) antes de quitar el bytea de la fila
+                blob = almacen_blobs.guardar_stream(
+                    iterar_content_pg(tabla, fila['id'], 0, fila['tamano'] - 1, conexion=conexion),
+                    TipoContenido.PDF
+                )
+                marcar_blob_migrado_pg(tabla, fila['id'], blob.sha256, blob.tamano, blob.tipo, conexion)
+
+                bytes_migrados += blob.tamano
+                ultimo_id = fila['id']
+
+            conexion.commit()
+            migradas += len(filas)
+
+        except Exception:
+            conexion.rollback()
+            raise
+
+        finally:
+            conexion.close()
+
+        logging.info(f"{tabla.tabla}: {migradas} filas migradas ({bytes_migrados / 1024 / 1024:.1f} MB)")
+
+    return migradas, bytes_migrados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra el contenido bytea al almacén de blobs")
+    parser.add_argument('--tabla', choices=sorted(TABLAS_CONTENIDO), help="Solo esta tabla (por defecto, todas)")
+    parser.add_argument('--lote', type=int, default=5, help="Filas por transacción")
+    parser.add_argument('--maximo', type=int, default=None, help="Máximo de filas por tabla en esta corrida")
+    argumentos = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    tablas = [TABLAS_CONTENIDO[argumentos.tabla]] if argumentos.tabla else list(TABLAS_CONTENIDO.values())
+
+    for tabla in tablas:
+        inicio = time.perf_counter()
+        migradas, bytes_migrados = migrar_tabla(tabla, argumentos.lote, argumentos.maximo)
+
+        logging.info(
+            f"{tabla.tabla}: terminado, {migradas} filas y {bytes_migrados / 1024 / 1024:.1f} MB "
+            f"en {time.perf_counter() - inicio:.1f}s. Ejecutar VACUUM para liberar el espacio del bytea."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import psycopg2
 from models.programa_academico import ProgramaAcademico
 from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from shared.mapeo import construir_modelos
 
 
 def registrar_programa_academico_pg(
@@ -62,7 +63,7 @@ def obtener_programa_academico_pg(
     if not results:
         return None
 
-    items = [ProgramaAcademico(**item) for item in results]
+    items = construir_modelos(ProgramaAcademico, results)
 
     return items
 
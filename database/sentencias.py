@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import psycopg2
+
+
+class ConfiguracionSentencias:
+    HABILITADAS = os.getenv('DB_SENTENCIAS_PREPARADAS', 'true').lower() == 'true'
+    # Tope por conexión para no acumular sentencias si alguna consulta lleva valores concatenados
+    MAX_POR_CONEXION = int(os.getenv('DB_SENTENCIAS_MAX_POR_CONEXION', '200'))
+
+
+_placeholder_pattern = re.compile(r'%[s%]')
+
+
+def convertir_placeholders(query: str) -> str:
+    """
+    Convierte los placeholders de psycopg2 (%s) al formato posicional de postgres y asyncpg ($1, $2...)
+    """
+    contador = 0
+
+    def reemplazar(match):
+        nonlocal contador
+        if match.group(0) == '%%':
+            return '%'
+        contador += 1
+        return f'${contador}'
+
+    return _placeholder_pattern.sub(reemplazar, query)
+
+
+class Sentencia:
+    """
+    Forma de consulta registrada: nombre estable, SQL para PREPARE y contadores de uso
+    """
+
+    def __init__(self, nombre: str, query: str):
+        self.nombre = nombre
+        self.query = query
+        self.sql_preparar = f"PREPARE {nombre} AS {convertir_placeholders(query)}"
+        parametros = len(re.findall(r'%s', query.replace('%%', '')))
+        self.sql_ejecutar = f"EXECUTE {nombre} ({', '.join(['%s'] * parametros)})" if parametros else f"EXECUTE {nombre}"
+        self.preparable = True
+
+        self.preparaciones = 0
+        self.tiempo_preparacion = 0.0
+        self.primeras_ejecuciones = 0
+        self.tiempo_primeras_ejecuciones = 0.0
+        self.reutilizaciones = 0
+        self.tiempo_reutilizaciones = 0.0
+
+    def estadisticas(self) -> dict:
+        preparacion = self.tiempo_preparacion / self.preparaciones if self.preparaciones else 0.0
+        primera = self.tiempo_primeras_ejecuciones / self.primeras_ejecuciones if self.primeras_ejecuciones else 0.0
+        reutilizada = self.tiempo_reutilizaciones / self.reutilizaciones if self.reutilizaciones else 0.0
+
+        return {
+            'nombre': self.nombre,
+            'consulta': re.sub(r'\s+', ' ', self.query).strip()[:200],
+            'preparable': self.preparable,
+            'preparaciones': self.preparaciones,
+            'reutilizaciones': self.reutilizaciones,
+            'tiempoPreparacionPromedioMs': round(preparacion * 1000, 3),
+            'tiempoPrimeraEjecucionPromedioMs': round(primera * 1000, 3),
+            'tiempoEjecucionReutilizadaPromedioMs': round(reutilizada * 1000, 3),
+            # Cada reutilización evita el parseo/análisis de PREPARE y, con plan genérico, la planificación
+            'tiempoAhorradoEstimadoMs': round(
+                max(preparacion + primera - reutilizada, 0.0) * self.reutilizaciones * 1000, 3
+            )
+        }
+
+
+class RegistroSentencias:
+    """
+    Nombra las formas de consulta (cada combinación de filtros es una forma distinta)
+    para preparar cada una una sola vez por conexión del pool
+    """
+
+    def __init__(self):
+        self._sentencias: dict[str, Sentencia] = {}
+        self._por_nombre: dict[str, Sentencia] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, nombre_base: str, query: str) -> Sentencia:
+        sentencia = self._sentencias.get(query)
+
+        if sentencia is None:
+            nombre = f"{nombre_base}_{hashlib.sha1(query.encode()).hexdigest()[:10]}"
+
+            with self._lock:
+                sentencia = self._sentencias.setdefault(query, Sentencia(nombre, query))
+                self._por_nombre[sentencia.nombre] = sentencia
+
+        return sentencia
+
+    def por_nombre(self, nombre: str) -> Sentencia | None:
+        return self._por_nombre.get(nombre)
+
+    def estadisticas(self) -> list[dict]:
+        with self._lock:
+            sentencias = list(self._sentencias.values())
+
+        return [sentencia.estadisticas() for sentencia in sentencias]
+
+
+registro_sentencias = RegistroSentencias()
+
+
+def _preparar(cursor, sentencia: Sentencia) -> bool:
+    # El savepoint evita que una sentencia que no se puede preparar aborte la transacción del request
+    inicio = time.perf_counter()
+    cursor.execute("SAVEPOINT preparar_sentencia")
+
+    try:
+        cursor.execute(sentencia.sql_preparar)
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT preparar_sentencia")
+        sentencia.preparable = False
+        logging.warning(f"No se pudo preparar la sentencia {sentencia.nombre}, se ejecutará sin preparar: {str(e)}")
+        return False
+
+    cursor.execute("RELEASE SAVEPOINT preparar_sentencia")
+
+    sentencia.preparaciones += 1
+    sentencia.tiempo_preparacion += time.perf_counter() - inicio
+
+    return True
+
+
+def ejecutar_sentencia(cursor, query: str, values, nombre_base: str):
+    """
+    Ejecuta la consulta como sentencia preparada (PREPARE la primera vez en la conexión, luego EXECUTE)
+    """
+    preparadas = getattr(cursor.connection, 'sentencias_preparadas', None)
+
+    if not ConfiguracionSentencias.HABILITADAS or preparadas is None:
+        cursor.execute(query, values)
+        return
+
+    sentencia = registro_sentencias.obtener(nombre_base, query)
+
+    if not sentencia.preparable:
+        cursor.execute(query, values)
+        return
+
+    nueva = sentencia.nombre not in preparadas
+
+    if nueva:
+        if len(preparadas) >= ConfiguracionSentencias.MAX_POR_CONEXION or not _preparar(cursor, sentencia):
+            cursor.execute(query, values)
+            return
+
+        preparadas.add(sentencia.nombre)
+
+    inicio = time.perf_counter()
+    cursor.execute(sentencia.sql_ejecutar, values)
+    duracion = time.perf_counter() - inicio
+
+    if nueva:
+        sentencia.primeras_ejecuciones += 1
+        sentencia.tiempo_primeras_ejecuciones += duracion
+    else:
+        sentencia.reutilizaciones += 1
+        sentencia.tiempo_reutilizaciones += duracion
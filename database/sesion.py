@@ -0,0 +1,93 @@
+import psycopg2
+
+from shared.utils import execute_query
+
+
+def registrar_sesion_pg(
+        usuario_id: int,
+        refresh_hash: str,
+        token_version: int,
+        estado: str,
+        duracion_dias: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    query = """
+            insert into sesion (usuario_id, refresh_hash, token_version, estado, fecha_expiracion)
+            values (%s, %s, %s, %s, (now() at time zone 'EDT') + make_interval(days => %s))
+            returning sesion_id;
+            """
+
+    values = [usuario_id, refresh_hash, token_version, estado, duracion_dias]
+
+    results = execute_query(query, values, conn=conexion)
+
+    return next((item['sesionId'] for item in results), None)
+
+
+def obtener_sesion_refresco_pg(
+        sesion_id: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    """
+    Sesión con los datos del usuario para emitir el nuevo token; bloquea la fila para que
+    dos refresh simultáneos del mismo token no roten la sesión dos veces
+    """
+    sql = """
+          select s.sesion_id,
+                 s.refresh_hash,
+                 s.estado                                             as estado_sesion,
+                 s.token_version                                      as version_sesion,
+                 s.fecha_expiracion > (now() at time zone 'EDT')      as vigente,
+                 u.usuario_id,
+                 u.nombre,
+                 u.correo,
+                 u.estado,
+                 u.rol_id,
+                 coalesce(tv.version, 0)                              as token_version
+          from sesion s
+                   join usuario u on u.usuario_id = s.usuario_id
+                   left join usuario_token_version tv on tv.usuario_id = u.usuario_id
+          where s.sesion_id = %s
+              for update of s;
+          """
+
+    results = execute_query(sql, [sesion_id], conn=conexion)
+
+    return next((item for item in results), None)
+
+
+def rotar_sesion_pg(
+        sesion_id: int,
+        refresh_hash: str,
+        duracion_dias: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = """
+          update sesion
+          set refresh_hash = %s,
+              fecha_expiracion = (now() at time zone 'EDT') + make_interval(days => %s),
+              fecha_actualizacion = (now() at time zone 'EDT')
+          where sesion_id = %s
+          returning sesion_id;
+          """
+
+    results = execute_query(sql, [refresh_hash, duracion_dias, sesion_id], conn=conexion)
+
+    return next((item['sesionId'] for item in results), None)
+
+
+def revocar_sesion_pg(
+        sesion_id: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = """
+          update sesion
+          set estado = 'IN',
+              fecha_actualizacion = (now() at time zone 'EDT')
+          where sesion_id = %s
+          returning sesion_id;
+          """
+
+    results = execute_query(sql, [sesion_id], conn=conexion)
+
+    return next((item['sesionId'] for item in results), None)
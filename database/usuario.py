@@ -1,7 +1,8 @@
+import asyncpg
 import psycopg2
 from pydantic import EmailStr
 
-from shared.utils import formartear_secuencia_insertar_sql, execute_query
+from shared.utils import formartear_secuencia_insertar_sql, execute_query, execute_query_async
 
 
 def registrar_usuario_pg(
@@ -40,19 +41,21 @@ def obtener_usuario_pg(
         conexion: psycopg2.extensions.connection | None = None
 ):
 
-    query = "select * from usuario where correo = %s;"
+    query = """
+            select u.*,
+                   coalesce(tv.version, 0) as token_version
+            from usuario u
+            left join usuario_token_version tv on tv.usuario_id = u.usuario_id
+            where u.correo = %s;
+    """
 
     results = execute_query(query, [correo], conn=conexion)
 
     return next((item for item in results), None)
 
 
-def buscar_rol_usuario_pg(
-        usuario_id: int,
-        rol_id: int,
-        conexion: psycopg2.extensions.connection | None = None
-):
-    query = """
+def query_buscar_rol_usuario():
+    return """
             select 
                 u.usuario_id,
                 u.nombre,
@@ -64,13 +67,92 @@ def buscar_rol_usuario_pg(
                 and u.usuario_id = %s and r.rol_id = %s;
     """
 
+
+def buscar_rol_usuario_pg(
+        usuario_id: int,
+        rol_id: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
     values = [usuario_id, rol_id]
 
-    results = execute_query(query, values, conn=conexion)
+    results = execute_query(query_buscar_rol_usuario(), values, conn=conexion, nombre_sentencia='rol_usuario')
+
+    return next((item for item in results), None)
+
+
+async def buscar_rol_usuario_async_pg(
+        usuario_id: int,
+        rol_id: int,
+        conexion: asyncpg.Connection | None = None
+):
+    values = [usuario_id, rol_id]
+
+    results = await execute_query_async(query_buscar_rol_usuario(), values, conn=conexion)
 
     return next((item for item in results), None)
 
 
+def actualizar_estado_usuario_pg(
+        usuario_id: int,
+        estado: str,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = """
+          update usuario
+          set estado = %s,
+              fecha_actualizacion = (now() at time zone 'EDT')
+          where usuario_id = %s
+          returning usuario_id;
+          """
+
+    results = execute_query(sql, [estado, usuario_id], conn=conexion)
+
+    return next((item['usuarioId'] for item in results), None)
+
+
+def actualizar_estado_rol_pg(
+        rol_id: int,
+        estado: str,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = """
+          update rol
+          set estado = %s,
+              fecha_actualizacion = (now() at time zone 'EDT')
+          where rol_id = %s
+          returning rol_id;
+          """
+
+    results = execute_query(sql, [estado, rol_id], conn=conexion)
+
+    return next((item['rolId'] for item in results), None)
+
+
+def incrementar_version_token_pg(
+        usuario_id: int,
+        conexion: psycopg2.extensions.connection | None = None
+):
+    sql = """
+          insert into usuario_token_version (usuario_id, version)
+          values (%s, 1)
+          on conflict (usuario_id) do update
+              set version = usuario_token_version.version + 1,
+                  fecha_actualizacion = (now() at time zone 'EDT')
+          returning version;
+          """
+
+    results = execute_query(sql, [usuario_id], conn=conexion)
+
+    return next((item['version'] for item in results), None)
+
+
+def obtener_versiones_token_pg(conexion: psycopg2.extensions.connection | None = None):
+    results = execute_query("select usuario_id, version from usuario_token_version;", conn=conexion)
+
+    return {item['usuarioId']: item['version'] for item in results}
 
 
+def obtener_roles_inactivos_pg(conexion: psycopg2.extensions.connection | None = None):
+    results = execute_query("select rol_id from rol where estado <> 'AC';", conn=conexion)
 
+    return {item['rolId'] for item in results}
@@ -1,13 +1,28 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from routers.internal import auth, categoria_evento, evento, libro, editorial, programa_academico, materia, estudiante, \
-    estudiante_documento, cuatrimestre, estudiante_materia, unicda
+    estudiante_documento, cuatrimestre, estudiante_materia, unicda, monitoreo, metricas
+from shared.exportacion import gestor_exportaciones
+from shared.pool_claves import pool_claves
+from shared.revocacion import registro_revocaciones
 import logging
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    registro_revocaciones.iniciar()
+    gestor_exportaciones.recuperar_abandonadas()
+    yield
+    registro_revocaciones.detener()
+    pool_claves.cerrar()
+    gestor_exportaciones.cerrar()
+
+
+app = FastAPI(lifespan=lifespan)
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -32,6 +47,8 @@ app.include_router(estudiante_documento.router, prefix='/internal')
 app.include_router(cuatrimestre.router, prefix='/internal')
 app.include_router(estudiante_materia.router, prefix='/internal')
 app.include_router(unicda.router, prefix='/internal')
+app.include_router(monitoreo.router, prefix='/internal')
+app.include_router(metricas.router, prefix='/internal')
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class ExportacionDocumento(BaseModel):
+    exportacionDocumentoId: int
+    estado: str
+    estadoEstudiante: str
+    fechaDesde: Optional[str] = None
+    fechaHasta: Optional[str] = None
+    totalDocumentos: Optional[int] = None
+    documentosProcesados: int
+    porcentaje: float
+    tamano: Optional[int] = None
+    error: Optional[str] = None
+    fechaCreacion: str
+    fechaFinalizacion: Optional[str] = None
+    fechaExpiracion: Optional[str] = None
@@ -0,0 +1,84 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class EstadisticasPool(BaseModel):
+    nombre: str
+    soloLectura: bool
+    minimo: int
+    maximo: int
+    total: int
+    enUso: int
+    libres: int
+    esperando: int
+    prestamos: int
+    rechazos: int
+    conexionesCreadas: int
+    conexionesDescartadas: int
+    tiempoEsperaPromedioMs: float
+    tiempoEsperaMaximoMs: float
+
+
+class EstadisticasPoolConexiones(EstadisticasPool):
+    balanceo: str
+    replicas: List[EstadisticasPool]
+
+
+class EstadisticasSentencia(BaseModel):
+    nombre: str
+    consulta: str
+    preparable: bool
+    preparaciones: int
+    reutilizaciones: int
+    tiempoPreparacionPromedioMs: float
+    tiempoPrimeraEjecucionPromedioMs: float
+    tiempoEjecucionReutilizadaPromedioMs: float
+    tiempoAhorradoEstimadoMs: float
+
+
+class EstadisticasCache(BaseModel):
+    maximo: int
+    ttlSegundos: float
+    entradas: int
+    aciertos: int
+    fallos: int
+    expirados: int
+    desalojos: int
+    invalidaciones: int
+    tasaAciertos: float
+
+
+class EstadisticasPoolClaves(BaseModel):
+    procesos: int
+    maxEnCola: int
+    pendientes: int
+    completadas: int
+    rechazos: int
+
+
+class EstadisticasCacheBytes(BaseModel):
+    maximoBytes: int
+    maximoBytesEntrada: int
+    bytes: int
+    entradas: int
+    aciertos: int
+    fallos: int
+    desalojos: int
+    invalidaciones: int
+    bytesServidos: int
+    llenadosEnCurso: int
+    tasaAciertos: float
+
+
+class EstadisticasAlmacenBlobs(BaseModel):
+    blobs: int
+    blobsCompartidos: int
+    referencias: int
+    bytesAlmacenados: int
+    bytesReferenciados: int
+    bytesAhorrados: int
+    porcentajeAhorro: float
+    filasPendientesMigrar: int
+    bytesPendientesMigrar: int
+    bytesTablas: int
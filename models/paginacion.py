@@ -19,4 +19,13 @@ class PaginacionUNICDA(BaseModel):
     records: int
     currentPage: int
     prevPage: int
-    nextPage: int
\ No newline at end of file
+    nextPage: int
+
+class PaginacionCursor(BaseModel):
+    limite: int
+    siguienteCursor: str | None = None
+
+
+class ResponseCursor(BaseModel, Generic[T]):
+    items: List[T]
+    paginacion: PaginacionCursor
@@ -0,0 +1,5 @@
+from pydantic import BaseModel, Field
+
+class ActualizarEstadoRolRequest(BaseModel):
+    rolId: int = Field(ge=1)
+    estado: str = Field(min_length=2, max_length=2, pattern="^(AC|IN)$")
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class RefrescarSesionRequest(BaseModel):
+    refreshToken: str = Field(
+        min_length=1,
+        max_length=250
+    )
@@ -0,0 +1,13 @@
+from datetime import date
+
+from pydantic import BaseModel, Field
+
+
+class RegistrarExportacionDocumentoRequest(BaseModel):
+    estadoEstudiante: str = Field(
+        pattern="^(REGISTRADO|PENDIENTE_DOCUMENTO|PENDIENTE_RESPUESTA|ACEPTADO|RECHAZADO|GRADUADO)$"
+    )
+
+    fechaDesde: date | None = None
+
+    fechaHasta: date | None = None
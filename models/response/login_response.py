@@ -4,3 +4,5 @@ from pydantic import BaseModel
 class LoginResponseModel(BaseModel):
     accessToken: str
     tokenType: str
+    refreshToken: str
+    expiresIn: int
@@ -1,3 +1,9 @@
+drop table if exists blob_contenido;
+drop function if exists ajustar_referencias_blob cascade;
+drop table if exists exportacion_documento;
+drop table if exists limite_intentos;
+drop table if exists sesion;
+drop table if exists usuario_token_version;
 drop table if exists usuario;
 drop table if exists categoria_evento;
 drop table if exists evento;
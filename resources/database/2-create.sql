@@ -133,7 +133,11 @@ create table if not exists libro(
     year_publicacion smallint null,
     archivo_url varchar(250) null,
     imagen_url varchar null,
-    content bytea NOT NULL,
+    -- Solo filas anteriores al almacén de blobs; las nuevas guardan el archivo por su sha256
+    content bytea null,
+    content_sha256 varchar(64) null,
+    content_tamano bigint null,
+    content_tipo varchar(100) null,
     estado varchar(2) not null,
     fecha_creacion timestamp not null default (now() at time zone 'EDT'),
     fecha_actualizacion timestamp null,
@@ -246,7 +250,10 @@ create table if not exists estudiante_documento(
     estudiante_documento_id bigserial primary key not null,
     estudiante_id bigint not null,
     tipo_documento varchar(20) not null,
-    content bytea NOT NULL,
+    content bytea null,
+    content_sha256 varchar(64) null,
+    content_tamano bigint null,
+    content_tipo varchar(100) null,
     estado varchar(20) not null,
     fecha_creacion timestamp not null default (now() at time zone 'EDT'),
     fecha_actualizacion timestamp null,
@@ -341,4 +348,130 @@ create table if not exists estudiante_materia(
 CREATE INDEX IF NOT EXISTS idx_cuatrimestre_anio_periodo ON cuatrimestre(anio DESC, periodo);
 CREATE INDEX IF NOT EXISTS idx_estudiante_materia_estudiante_id ON estudiante_materia(estudiante_id);
 CREATE INDEX IF NOT EXISTS idx_estudiante_materia_cuatrimestre_id ON estudiante_materia(cuatrimestre_id);
-CREATE INDEX IF NOT EXISTS idx_estudiante_materia_materia_id ON estudiante_materia(materia_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_estudiante_materia_materia_id ON estudiante_materia(materia_id);
+
+-- Paginación por cursor (keyset) de los listados
+CREATE INDEX IF NOT EXISTS idx_estudiante_fecha_creacion_id ON estudiante(fecha_creacion DESC, estudiante_id DESC);
+CREATE INDEX IF NOT EXISTS idx_evento_fecha_creacion_id ON evento(fecha_creacion DESC, evento_id DESC);
+
+
+-- Versión de los tokens por usuario: al desactivar o reactivar un usuario se incrementa
+-- y los JWT emitidos con una versión anterior dejan de ser válidos
+create table if not exists usuario_token_version(
+    usuario_id bigint primary key,
+    version integer not null default 0,
+    fecha_actualizacion timestamp not null default (now() at time zone 'EDT'),
+
+    constraint usuario_token_version_usuario_id_fk
+        foreign key(usuario_id)
+        references usuario(usuario_id)
+        on delete cascade
+);
+
+
+-- Sesiones de refresco: se guarda solo el HMAC del secreto, que rota en cada /auth/refresh
+create table if not exists sesion(
+    sesion_id bigserial primary key,
+    usuario_id bigint not null,
+    refresh_hash varchar(64) not null,
+    token_version integer not null,
+    estado varchar(2) not null,
+    fecha_creacion timestamp not null default (now() at time zone 'EDT'),
+    fecha_expiracion timestamp not null,
+    fecha_actualizacion timestamp null,
+
+    constraint sesion_usuario_id_fk
+        foreign key(usuario_id)
+        references usuario(usuario_id)
+        on delete cascade,
+
+    constraint sesion_estado_ck
+        check(estado in ('AC', 'IN'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_sesion_usuario_id ON sesion(usuario_id);
+
+
+-- Buckets del limitador de intentos de login compartido entre workers (AUTH_LIMITE_BACKEND=postgres).
+-- Unlogged: es estado efímero, no hace falta que sobreviva a un reinicio ni que se replique
+create unlogged table if not exists limite_intentos(
+    clave varchar(300) primary key,
+    tokens double precision not null,
+    permitido boolean not null,
+    fecha_actualizacion timestamp not null
+);
+
+
+-- Exportaciones masivas de documentos de admisión: el ZIP se arma en segundo plano y queda en disco
+-- (EXPORTACION_DIRECTORIO) hasta fecha_expiracion
+create table if not exists exportacion_documento(
+    exportacion_documento_id bigserial primary key,
+    estado varchar(20) not null,
+    estado_estudiante varchar(30) not null,
+    fecha_desde date null,
+    fecha_hasta date null,
+    total_documentos integer null,
+    documentos_procesados integer not null default 0,
+    tamano bigint null,
+    error varchar(500) null,
+    usuario_creacion_id bigint not null,
+    fecha_creacion timestamp not null default (now() at time zone 'EDT'),
+    fecha_actualizacion timestamp null,
+    fecha_finalizacion timestamp null,
+    fecha_expiracion timestamp null,
+
+    constraint exportacion_documento_usuario_creacion_id_fk
+        foreign key(usuario_creacion_id)
+        references usuario(usuario_id)
+        on delete restrict,
+
+    constraint exportacion_documento_estado_ck
+        check(estado in ('PENDIENTE', 'EN_PROCESO', 'COMPLETADA', 'ERROR', 'EXPIRADA'))
+);
+
+
+-- Un registro por archivo del almacén de blobs (direccionado por sha256); referencias cuenta las filas
+-- de libro y estudiante_documento que lo usan, así el mismo PDF se guarda una sola vez
+create table if not exists blob_contenido(
+    content_sha256 varchar(64) primary key,
+    tamano bigint not null,
+    tipo varchar(100) not null,
+    referencias integer not null default 0,
+    fecha_creacion timestamp not null default (now() at time zone 'EDT'),
+    fecha_actualizacion timestamp null
+);
+
+-- referencias se mantiene en la base: cada alta, cambio de content_sha256 o baja (también en cascada)
+-- de una fila de libro o estudiante_documento suma o resta la referencia del blob
+create or replace function ajustar_referencias_blob() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.content_sha256 is not null
+        and (tg_op = 'DELETE' or new.content_sha256 is distinct from old.content_sha256) then
+        update blob_contenido
+        set referencias = referencias - 1,
+            fecha_actualizacion = (now() at time zone 'EDT')
+        where content_sha256 = old.content_sha256;
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE') and new.content_sha256 is not null
+        and (tg_op = 'INSERT' or new.content_sha256 is distinct from old.content_sha256) then
+        insert into blob_contenido (content_sha256, tamano, tipo, referencias)
+        values (new.content_sha256, coalesce(new.content_tamano, 0), coalesce(new.content_tipo, 'application/pdf'), 1)
+        on conflict (content_sha256) do update
+            set referencias = blob_contenido.referencias + 1,
+                fecha_actualizacion = (now() at time zone 'EDT');
+    end if;
+
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists libro_referencias_blob_tg on libro;
+create trigger libro_referencias_blob_tg
+    after insert or delete or update of content_sha256 on libro
+    for each row execute function ajustar_referencias_blob();
+
+drop trigger if exists estudiante_documento_referencias_blob_tg on estudiante_documento;
+create trigger estudiante_documento_referencias_blob_tg
+    after insert or delete or update of content_sha256 on estudiante_documento
+    for each row execute function ajustar_referencias_blob();
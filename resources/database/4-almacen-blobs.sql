@@ -0,0 +1,13 @@
+-- Bases existentes: el contenido de libro y estudiante_documento pasa al almacén de blobs.
+-- Después de aplicar este script, mover el bytea existente con:
+--     python -m database.migrar_blobs
+
+alter table libro alter column content drop not null;
+alter table libro add column if not exists content_sha256 varchar(64) null;
+alter table libro add column if not exists content_tamano bigint null;
+alter table libro add column if not exists content_tipo varchar(100) null;
+
+alter table estudiante_documento alter column content drop not null;
+alter table estudiante_documento add column if not exists content_sha256 varchar(64) null;
+alter table estudiante_documento add column if not exists content_tamano bigint null;
+alter table estudiante_documento add column if not exists content_tipo varchar(100) null;
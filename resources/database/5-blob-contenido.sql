@@ -0,0 +1,66 @@
+-- Bases existentes: conteo de referencias de los blobs ya guardados (después de 4-almacen-blobs.sql;
+-- python -m database.migrar_blobs puede correr antes o después, los triggers cuentan lo que migre).
+-- Se puede volver a correr: recalcula las referencias.
+
+create table if not exists blob_contenido(
+    content_sha256 varchar(64) primary key,
+    tamano bigint not null,
+    tipo varchar(100) not null,
+    referencias integer not null default 0,
+    fecha_creacion timestamp not null default (now() at time zone 'EDT'),
+    fecha_actualizacion timestamp null
+);
+
+-- referencias se mantiene en la base: cada alta, cambio de content_sha256 o baja (también en cascada)
+-- de una fila de libro o estudiante_documento suma o resta la referencia del blob
+create or replace function ajustar_referencias_blob() returns trigger as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.content_sha256 is not null
+        and (tg_op = 'DELETE' or new.content_sha256 is distinct from old.content_sha256) then
+        update blob_contenido
+        set referencias = referencias - 1,
+            fecha_actualizacion = (now() at time zone 'EDT')
+        where content_sha256 = old.content_sha256;
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE') and new.content_sha256 is not null
+        and (tg_op = 'INSERT' or new.content_sha256 is distinct from old.content_sha256) then
+        insert into blob_contenido (content_sha256, tamano, tipo, referencias)
+        values (new.content_sha256, coalesce(new.content_tamano, 0), coalesce(new.content_tipo, 'application/pdf'), 1)
+        on conflict (content_sha256) do update
+            set referencias = blob_contenido.referencias + 1,
+                fecha_actualizacion = (now() at time zone 'EDT');
+    end if;
+
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists libro_referencias_blob_tg on libro;
+create trigger libro_referencias_blob_tg
+    after insert or delete or update of content_sha256 on libro
+    for each row execute function ajustar_referencias_blob();
+
+drop trigger if exists estudiante_documento_referencias_blob_tg on estudiante_documento;
+create trigger estudiante_documento_referencias_blob_tg
+    after insert or delete or update of content_sha256 on estudiante_documento
+    for each row execute function ajustar_referencias_blob();
+
+insert into blob_contenido (content_sha256, tamano, tipo, referencias)
+select content_sha256, max(content_tamano), max(content_tipo), count(*)
+from (
+    select content_sha256, content_tamano, content_tipo from libro where content_sha256 is not null
+    union all
+    select content_sha256, content_tamano, content_tipo from estudiante_documento where content_sha256 is not null
+) referencias
+group by content_sha256
+on conflict (content_sha256) do update
+    set referencias = excluded.referencias,
+        fecha_actualizacion = (now() at time zone 'EDT');
+
+update blob_contenido b
+set referencias = 0,
+    fecha_actualizacion = (now() at time zone 'EDT')
+where referencias <> 0
+  and not exists (select 1 from libro l where l.content_sha256 = b.content_sha256)
+  and not exists (select 1 from estudiante_documento ed where ed.content_sha256 = b.content_sha256);
@@ -1,141 +1,241 @@
 import logging
 from http import HTTPStatus
 
-from fastapi import APIRouter, Body, HTTPException, status
-
-from database.connection import get_connection
-from database.usuario import registrar_usuario_pg, obtener_usuario_pg
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from psycopg2.extensions import connection
+
+from database.connection import get_conexion, RutaTransaccional, ejecutar_en_transaccion
+from database.sesion import registrar_sesion_pg, obtener_sesion_refresco_pg, rotar_sesion_pg, revocar_sesion_pg
+from database.usuario import registrar_usuario_pg, obtener_usuario_pg, actualizar_estado_usuario_pg, \
+    actualizar_estado_rol_pg, incrementar_version_token_pg
 from models.generico import ResponseData
+from models.requests.actualizar_estado_rol import ActualizarEstadoRolRequest
+from models.requests.actualizar_estado_usuario import ActualizarEstadoUsuarioRequest
 from models.requests.login import LoginUsuario
+from models.requests.refrescar_sesion import RefrescarSesionRequest
 from models.requests.registrar_usuario import RegistrarUsuarioModel
 from models.response.login_response import LoginResponseModel
-from shared.constante import Estado
-from shared.utils import hash_password, verify_password, create_access_token
+from shared.cache import invalidar_autorizacion_usuario, invalidar_autorizacion_rol
+from shared.constante import Estado, Rol
+from shared.limitador import ConfiguracionLimitador, limitar_intentos
+from shared.permission import get_current_user, claims_usuario
+from shared.pool_claves import pool_claves
+from shared.revocacion import registro_revocaciones
+from shared.sesion import ConfiguracionSesion, generar_secreto, firmar_secreto, secreto_valido, \
+    armar_refresh_token, leer_refresh_token
+from shared.utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 
-router = APIRouter(prefix="/auth", tags=["auth"])
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=RutaTransaccional)
 
 
 @router.post("/registrar",
              responses={status.HTTP_201_CREATED: {"model": ResponseData[int]}},
              summary='registrarUsuario', status_code=status.HTTP_201_CREATED)
-def registrar(request: RegistrarUsuarioModel = Body()):
-    conexion = get_connection()
-
-    try:
+async def registrar(request: RegistrarUsuarioModel = Body(),
+                    # Antes de cualquier consulta y de cualquier trabajo de bcrypt
+                    _: None = Depends(limitar_intentos(ConfiguracionLimitador.REGISTRO_IP,
+                                                       ConfiguracionLimitador.REGISTRO_CORREO))):
+    # Sin get_conexion: cada consulta usa una conexión que se devuelve antes de esperar a bcrypt
+    logging.info('Buscando usuario con ese correo')
 
-        logging.info('Buscando usuario con ese correo')
+    usuario_con_correo = await run_in_threadpool(ejecutar_en_transaccion, obtener_usuario_pg, request.correo)
 
-        usuario_con_correo = obtener_usuario_pg(request.correo, conexion)
+    if usuario_con_correo:
+        raise _correo_registrado()
 
-        if usuario_con_correo:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El correo ya se encuentra registrado"
-            )
+    # bcrypt corre en el pool de procesos de claves, fuera del threadpool
+    hashed_clave = await pool_claves.hashear(request.clave)
 
-        hashed_clave = hash_password(request.clave)
+    usuario_id = await run_in_threadpool(ejecutar_en_transaccion, _registrar_usuario, request, hashed_clave)
 
-        usuario_id = registrar_usuario_pg(
-            nombre=request.nombre,
-            correo=request.correo,
-            clave=hashed_clave,
-            estado=Estado.ACTIVO,
-            rol_id=request.rolId,
-            conexion=conexion
+    if not usuario_id:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail="No se pudo registrar el usuario"
         )
 
-        if not usuario_id:
-            raise HTTPException(
-                status_code=HTTPStatus.BAD_REQUEST,
-                detail="No se pudo registrar el usuario"
-            )
+    return ResponseData[int](data=usuario_id)
+
 
-        conexion.commit()
+def _correo_registrado() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="El correo ya se encuentra registrado"
+    )
 
-        return ResponseData[int](data=usuario_id)
 
+def _registrar_usuario(request: RegistrarUsuarioModel, hashed_clave: str, conexion: connection) -> int | None:
+    # Se vuelve a verificar: otro registro con el mismo correo pudo entrar mientras corría bcrypt
+    if obtener_usuario_pg(request.correo, conexion):
+        raise _correo_registrado()
 
-    except HTTPException as e:
+    return registrar_usuario_pg(
+        nombre=request.nombre,
+        correo=request.correo,
+        clave=hashed_clave,
+        estado=Estado.ACTIVO,
+        rol_id=request.rolId,
+        conexion=conexion
+    )
 
-        logging.exception("Ocurrió un error inesperado")
 
-        conexion.rollback()
+@router.post("/login",
+             responses={status.HTTP_200_OK: {"model": ResponseData[LoginResponseModel]}},
+             summary='logearUsuario', status_code=status.HTTP_200_OK)
+async def login(request: LoginUsuario = Body(),
+                # Antes de cualquier consulta y de cualquier trabajo de bcrypt
+                _: None = Depends(limitar_intentos(ConfiguracionLimitador.LOGIN_IP,
+                                                   ConfiguracionLimitador.LOGIN_CORREO))):
+    # Sin get_conexion: cada consulta usa una conexión que se devuelve antes de esperar a bcrypt
+    logging.info('Buscando usuario con ese correo')
+
+    usuario = await run_in_threadpool(ejecutar_en_transaccion, obtener_usuario_pg, request.correo)
+
+    if not usuario:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No existe un usuario con ese correo"
+        )
 
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    hashed_clave_usuario = usuario['clave']
 
+    usuario_id = usuario['usuarioId']
 
-    except Exception as e:
+    password_vertified = await pool_claves.verificar(request.clave, hashed_clave_usuario)
 
-        logging.exception("Ocurrió un error inesperado")
+    if not password_vertified:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Credenciales inválidas"
+        )
 
-        conexion.rollback()
+    secreto = generar_secreto()
 
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e)
+    sesion_id = await run_in_threadpool(
+        ejecutar_en_transaccion,
+        registrar_sesion_pg,
+        usuario_id=usuario_id,
+        refresh_hash=firmar_secreto(secreto),
+        token_version=usuario['tokenVersion'],
+        estado=Estado.ACTIVO,
+        duracion_dias=ConfiguracionSesion.DURACION_DIAS
+    )
 
+    login_response = LoginResponseModel(
+        accessToken=create_access_token(claims_usuario(usuario)),
+        tokenType="bearer",
+        refreshToken=armar_refresh_token(sesion_id, secreto),
+        expiresIn=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
 
-    finally:
-        conexion.close()
+    return ResponseData[LoginResponseModel](data=login_response)
 
 
-@router.post("/login",
+@router.post("/refresh",
              responses={status.HTTP_200_OK: {"model": ResponseData[LoginResponseModel]}},
-             summary='logearUsuario', status_code=status.HTTP_200_OK)
-def login(request: LoginUsuario = Body()):
+             summary='refrescarSesion', status_code=status.HTTP_200_OK)
+def refrescar(request: RefrescarSesionRequest = Body(), conexion: connection = Depends(get_conexion)):
+    refresh_invalido = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token de refresco inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
 
-    conexion = get_connection()
+    token = leer_refresh_token(request.refreshToken)
 
-    try:
+    if token is None:
+        raise refresh_invalido
 
-        logging.info('Buscando usuario con ese correo')
+    sesion_id, secreto = token
 
-        usuario = obtener_usuario_pg(request.correo, conexion)
+    sesion = obtener_sesion_refresco_pg(sesion_id, conexion)
 
-        if not usuario:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No existe un usuario con ese correo"
-            )
+    if not sesion or sesion['estadoSesion'] != Estado.ACTIVO or not sesion['vigente']:
+        raise refresh_invalido
 
-        hashed_clave_usuario = usuario['clave']
+    if not secreto_valido(secreto, sesion['refreshHash']):
+        # Un token ya rotado se volvió a usar: se asume robado y se cierra la sesión.
+        # Se responde sin lanzar la excepción para que la revocación se confirme.
+        logging.warning(f"Reutilización del token de refresco de la sesión {sesion_id}, se revoca")
+        revocar_sesion_pg(sesion_id, conexion)
 
-        usuario_id = usuario['usuarioId']
+        return JSONResponse(
+            status_code=refresh_invalido.status_code,
+            content={"detail": refresh_invalido.detail},
+            headers=refresh_invalido.headers
+        )
 
-        password_vertified = verify_password(request.clave, hashed_clave_usuario)
+    # Un cambio de estado del usuario (versión nueva) invalida también sus sesiones
+    if sesion['estado'] != Estado.ACTIVO or sesion['tokenVersion'] != sesion['versionSesion']:
+        raise refresh_invalido
 
-        if not password_vertified:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Credenciales inválidas"
-            )
+    nuevo_secreto = generar_secreto()
 
-        token = create_access_token({"sub": str(usuario_id)})
+    rotar_sesion_pg(sesion_id, firmar_secreto(nuevo_secreto), ConfiguracionSesion.DURACION_DIAS, conexion)
 
-        login_response = LoginResponseModel(
-            accessToken=token,
-            tokenType="bearer"
-        )
+    login_response = LoginResponseModel(
+        accessToken=create_access_token(claims_usuario(sesion)),
+        tokenType="bearer",
+        refreshToken=armar_refresh_token(sesion_id, nuevo_secreto),
+        expiresIn=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+
+    return ResponseData[LoginResponseModel](data=login_response)
+
+
+@router.post("/logout",
+             summary='cerrarSesion', status_code=status.HTTP_204_NO_CONTENT)
+def cerrar_sesion(request: RefrescarSesionRequest = Body(), conexion: connection = Depends(get_conexion)):
+    token = leer_refresh_token(request.refreshToken)
+
+    if token is None:
+        return
+
+    sesion_id, secreto = token
+
+    sesion = obtener_sesion_refresco_pg(sesion_id, conexion)
+
+    if sesion and secreto_valido(secreto, sesion['refreshHash']):
+        revocar_sesion_pg(sesion_id, conexion)
 
-        conexion.commit()
 
-        return ResponseData[LoginResponseModel](data=login_response)
+@router.patch("/usuario/estado",
+              summary="actualizarEstadoUsuario", status_code=status.HTTP_204_NO_CONTENT)
+def actualizar_estado_usuario(request: ActualizarEstadoUsuarioRequest = Body(),
+                              _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+                              conexion: connection = Depends(get_conexion)):
+    usuario_id = actualizar_estado_usuario_pg(request.usuarioId, request.estado, conexion)
 
-    except HTTPException as e:
+    if not usuario_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No se encontró el usuario para actualizar")
 
-        logging.exception("Ocurrió un error inesperado")
+    # Los tokens emitidos antes del cambio quedan revocados
+    version = incrementar_version_token_pg(usuario_id, conexion)
 
-        conexion.rollback()
+    def aplicar_revocacion():
+        registro_revocaciones.registrar_version(usuario_id, version)
+        invalidar_autorizacion_usuario(usuario_id)
 
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    # En memoria solo si el cambio quedó confirmado
+    conexion.al_confirmar(aplicar_revocacion)
 
-    except Exception as e:
 
-        logging.exception("Ocurrió un error inesperado")
+@router.patch("/rol/estado",
+              summary="actualizarEstadoRol", status_code=status.HTTP_204_NO_CONTENT)
+def actualizar_estado_rol(request: ActualizarEstadoRolRequest = Body(),
+                          _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+                          conexion: connection = Depends(get_conexion)):
+    rol_id = actualizar_estado_rol_pg(request.rolId, request.estado, conexion)
 
-        logging.warning(e)
+    if not rol_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No se encontró el rol para actualizar")
 
-        conexion.rollback()
+    activo = request.estado == Estado.ACTIVO
 
-        raise e
+    def aplicar_estado_rol():
+        registro_revocaciones.registrar_estado_rol(rol_id, activo)
+        invalidar_autorizacion_rol(rol_id)
 
-    finally:
-        conexion.close()
+    conexion.al_confirmar(aplicar_estado_rol)
@@ -1,164 +1,151 @@
 import logging
-from io import BytesIO
+import os
 from typing import List
 
-from fastapi import APIRouter, status, Depends, HTTPException, UploadFile, File, Form, Path, Query, Body
-from starlette.responses import StreamingResponse
+from fastapi import APIRouter, status, Depends, HTTPException, UploadFile, File, Form, Path, Query, Body, \
+    Request
+from starlette.responses import Response, StreamingResponse
+from psycopg2.extensions import connection
 
-from database.connection import get_connection
+from database.connection import get_conexion, RutaTransaccional
+from database.contenido import lector_archivo, TABLA_ESTUDIANTE_DOCUMENTO
 from database.estudiante import obtener_estudiante_pg, actualizar_estudiante_pg
 from database.estudiante_documento import (
     registrar_estudiante_documento_pg,
     obtener_estudiante_documento_pg,
     verificar_documento_existente_pg,
     verificar_documentos_completos_pg,
-    obtener_content_estudiante_documento_pg,
+    obtener_metadatos_archivo_estudiante_documento_pg,
+    obtener_archivos_estudiante_stream_pg,
     actualizar_estudiante_documento_pg, verificar_documentos_validos_completos_pg
 )
+from database.exportacion import registrar_exportacion_pg, obtener_exportacion_pg
 from models.estudiante_documento import EstudianteDocumento
+from models.exportacion_documento import ExportacionDocumento
 from models.generico import ResponseData, ResponseList
 from models.requests.actualizar_estudiante_documento import ActualizarDocumentoRequest
-from shared.constante import EstadoEstudiante, Rol, EstadoDocumento, SizeDocumento
+from models.requests.registrar_exportacion_documento import RegistrarExportacionDocumentoRequest
+from shared.almacenamiento import TipoContenido, archivo_disponible, guardar_upload_pdf, etag_archivo
+from shared.constante import EstadoEstudiante, Rol, EstadoDocumento, SizeDocumento, EstadoExportacion
+from shared.descargas import respuesta_descarga, respuesta_no_modificado, leer_rango_ruta
 from shared.email_service import email_service
+from shared.exportacion import gestor_exportaciones, entradas_zip_documentos, porcentaje_exportacion
 from shared.permission import get_current_user
+from shared.streaming import respuesta_zip
 
-router = APIRouter(prefix="/estudiante-documento", tags=["Estudiante Documento"])
+router = APIRouter(prefix="/estudiante-documento", tags=["Estudiante Documento"], route_class=RutaTransaccional)
 
 
 @router.post("/subir",
              responses={status.HTTP_201_CREATED: {"model": ResponseData[int]}},
              summary='subirDocumentoEstudiante', status_code=status.HTTP_201_CREATED)
-async def subir_documento_estudiante(
+def subir_documento_estudiante(
         estudianteId: int = Form(...),
         tipoDocumento: str = Form(..., regex="^(CEDULA|ACTA_NACIMIENTO|RECORD_ESCUELA)$"),
         file: UploadFile = File(...),
-        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
 ):
-    conexion = get_connection()
-
-    try:
-        # Validar que el estudiante existe
-        estudiantes = obtener_estudiante_pg(
-            estudiante_id=estudianteId,
-            conexion=conexion
+    # Validar que el estudiante existe
+    estudiantes = obtener_estudiante_pg(
+        estudiante_id=estudianteId,
+        conexion=conexion
+    )
+
+    if not estudiantes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No se encontró el estudiante especificado"
         )
 
-        if not estudiantes:
+    # El resultado puede ser lista o dict (paginado), manejamos ambos casos
+    if isinstance(estudiantes, list):
+        estudiante = estudiantes[0]
+    else:
+        estudiante = estudiantes['estudiantes'][0] if estudiantes['estudiantes'] else None
+        if not estudiante:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No se encontró el estudiante especificado"
             )
 
-        # El resultado puede ser lista o dict (paginado), manejamos ambos casos
-        if isinstance(estudiantes, list):
-            estudiante = estudiantes[0]
-        else:
-            estudiante = estudiantes['estudiantes'][0] if estudiantes['estudiantes'] else None
-            if not estudiante:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="No se encontró el estudiante especificado"
-                )
-
-        # Validar que el estudiante esté en estado REGISTRADO
-        if estudiante.estado != EstadoEstudiante.REGISTRADO:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El estado del estudiante no permite subir documentos. El estudiante debe estar en estado REGISTRADO"
-            )
-
-        # Verificar si ya existe un documento del mismo tipo en estado VALIDO o PENDIENTE
-        documento_existente = verificar_documento_existente_pg(
-            estudiante_id=estudianteId,
-            tipo_documento=tipoDocumento,
-            conexion=conexion
+    # Validar que el estudiante esté en estado REGISTRADO
+    if estudiante.estado != EstadoEstudiante.REGISTRADO:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El estado del estudiante no permite subir documentos. El estudiante debe estar en estado REGISTRADO"
         )
 
-        if documento_existente:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"No puede subir un documento de tipo {tipoDocumento} debido a que ya lo ha cargado anteriormente"
-            )
-
-        # Validar el archivo
-        if not file.filename:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Debe proporcionar un archivo"
-            )
-
-        # Validar tipo de archivo (opcional - puedes agregar más validaciones)
-        allowed_extensions = ['.pdf']
-        file_extension = file.filename.lower().split('.')[-1]
-        if f'.{file_extension}' not in allowed_extensions:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Tipo de archivo no permitido. Solo se permiten PDF"
-            )
-
-        # Leer el contenido del archivo
-        content = await file.read()
-
-        # Validar tamaño del archivo
-        if len(content) > SizeDocumento.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="El archivo excede los 10MB permitidos"
-            )
-
-        # Registrar el documento
-        documento_id = registrar_estudiante_documento_pg(
-            estudiante_id=estudianteId,
-            tipo_documento=tipoDocumento,
-            content=content,
-            estado=EstadoDocumento.PENDIENTE,
-            conexion=conexion
+    # Verificar si ya existe un documento del mismo tipo en estado VALIDO o PENDIENTE
+    documento_existente = verificar_documento_existente_pg(
+        estudiante_id=estudianteId,
+        tipo_documento=tipoDocumento,
+        conexion=conexion
+    )
+
+    if documento_existente:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No puede subir un documento de tipo {tipoDocumento} debido a que ya lo ha cargado anteriormente"
         )
 
-        if not documento_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No se pudo registrar el documento"
-            )
-
-        # Verificar si ahora el estudiante tiene todos los documentos requeridos
-        documentos_status = verificar_documentos_completos_pg(
-            estudiante_id=estudianteId,
-            conexion=conexion
+    # Validar el archivo
+    if not file.filename:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe proporcionar un archivo"
         )
 
-        if documentos_status['tiene_todos']:
-            try:
-                email_enviado = email_service.enviar_email_documentos_completos(
-                    destinatario=estudiante.correo,
-                    nombres=estudiante.nombres,
-                    apellidos=estudiante.apellidos
-                )
-
-                if email_enviado:
-                    logging.info(f"Email de documentos completos enviado exitosamente a {estudiante.correo}")
-                else:
-                    logging.warning(f"No se pudo enviar el email de documentos completos a {estudiante.correo}")
-
-            except Exception as e:
-                logging.error(f"Error al enviar email de documentos completos: {str(e)}")
+    # Validar tipo de archivo (opcional - puedes agregar más validaciones)
+    allowed_extensions = ['.pdf']
+    file_extension = file.filename.lower().split('.')[-1]
+    if f'.{file_extension}' not in allowed_extensions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tipo de archivo no permitido. Solo se permiten PDF"
+        )
 
-        conexion.commit()
+    # Pasar el archivo al almacén por bloques, validando tamaño y firma PDF mientras se lee
+    blob = guardar_upload_pdf(file, SizeDocumento.MAX_FILE_SIZE, "El archivo excede los 10MB permitidos")
+
+    # Registrar el documento
+    documento_id = registrar_estudiante_documento_pg(
+        estudiante_id=estudianteId,
+        tipo_documento=tipoDocumento,
+        blob=blob,
+        estado=EstadoDocumento.PENDIENTE,
+        conexion=conexion
+    )
+
+    if not documento_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se pudo registrar el documento"
+        )
 
-        return ResponseData[int](data=documento_id)
+    # Verificar si ahora el estudiante tiene todos los documentos requeridos
+    documentos_status = verificar_documentos_completos_pg(
+        estudiante_id=estudianteId,
+        conexion=conexion
+    )
+
+    if documentos_status['tiene_todos']:
+        try:
+            email_enviado = email_service.enviar_email_documentos_completos(
+                destinatario=estudiante.correo,
+                nombres=estudiante.nombres,
+                apellidos=estudiante.apellidos
+            )
 
-    except HTTPException as e:
-        logging.exception("Error controlado al subir documento")
-        conexion.rollback()
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+            if email_enviado:
+                logging.info(f"Email de documentos completos enviado exitosamente a {estudiante.correo}")
+            else:
+                logging.warning(f"No se pudo enviar el email de documentos completos a {estudiante.correo}")
 
-    except Exception as e:
-        logging.exception("Ocurrió un error inesperado al subir documento")
-        conexion.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        except Exception as e:
+            logging.error(f"Error al enviar email de documentos completos: {str(e)}")
 
-    finally:
-        conexion.close()
+    return ResponseData[int](data=documento_id)
 
 
 @router.get("/estudiante/{estudianteId}",
@@ -171,232 +158,193 @@ def obtener_documentos_estudiante(
             None,
             description="Estado del documento",
             regex="^(PENDIENTE|VALIDO|RECHAZADO)$"
-        )
+        ),
+        conexion: connection = Depends(get_conexion)
 ):
-    conexion = get_connection()
-
-    try:
-        # Validar que el estudiante existe
-        estudiantes = obtener_estudiante_pg(
-            estudiante_id=estudiante_id,
-            conexion=conexion
+    # Validar que el estudiante existe
+    estudiantes = obtener_estudiante_pg(
+        estudiante_id=estudiante_id,
+        conexion=conexion
+    )
+
+    if not estudiantes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No se encontró el estudiante especificado"
         )
 
-        if not estudiantes:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No se encontró el estudiante especificado"
-            )
-
-        # Obtener documentos del estudiante
-        documentos = obtener_estudiante_documento_pg(
-            estudiante_id=estudiante_id,
-            estado=estado,
-            conexion=conexion
+    # Obtener documentos del estudiante
+    documentos = obtener_estudiante_documento_pg(
+        estudiante_id=estudiante_id,
+        estado=estado,
+        conexion=conexion
+    )
+
+    if not documentos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No se encontraron documentos para el estudiante'
         )
 
-        if not documentos:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail='No se encontraron documentos para el estudiante'
-            )
-
-        conexion.commit()
-
-        return ResponseList(data=documentos)
-
-    except HTTPException as e:
-        logging.exception("Error controlado")
-        conexion.rollback()
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-
-    except Exception as e:
-        logging.exception("Ocurrió un error inesperado")
-        conexion.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-
-    finally:
-        conexion.close()
+    return ResponseList(data=documentos)
 
 
 @router.get("/{documentoId}/descargar",
             summary="Descargar documento del estudiante por ID",
             status_code=status.HTTP_200_OK)
 def descargar_documento_estudiante(
+        request: Request,
         documentoId: int = Path(..., description="ID del documento"),
-        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
-) -> StreamingResponse:
-    conexion = get_connection()
-
-    try:
-        # Verificar que el documento existe
-        documentos = obtener_estudiante_documento_pg(
-            estudiante_documento_id=documentoId,
-            conexion=conexion
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
+) -> Response:
+    # Solo metadatos: si el cliente ya tiene esta versión no se lee el contenido
+    metadatos = obtener_metadatos_archivo_estudiante_documento_pg(
+        estudiante_documento_id=documentoId,
+        conexion=conexion
+    )
+
+    if not metadatos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Documento no encontrado"
         )
 
-        if not documentos:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Documento no encontrado"
-            )
-
-        documento = documentos[0]
-
-        # Obtener el contenido del documento
-        content = obtener_content_estudiante_documento_pg(
-            estudiante_documento_id=documentoId,
-            conexion=conexion
+    if not archivo_disponible(metadatos):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contenido del documento no disponible"
         )
 
-        if content is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Contenido del documento no disponible"
-            )
-
-        file_like = BytesIO(content)
-
-        # Generar nombre del archivo basado en el tipo de documento y estudiante
-        estudiante_nombres = documento.estudiante['nombres'].replace(' ', '_')
-        estudiante_apellidos = documento.estudiante['apellidos'].replace(' ', '_')
-        tipo_doc = documento.tipoDocumento.lower()
-        filename = f"{estudiante_nombres}_{estudiante_apellidos}_{tipo_doc}.pdf"
+    etag = etag_archivo(metadatos, f"estudiante_documento:{documentoId}")
+    ultima_modificacion = metadatos['fechaModificacion']
 
-        return StreamingResponse(
-            file_like,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+    no_modificado = respuesta_no_modificado(request, etag, ultima_modificacion)
+    if no_modificado is not None:
+        return no_modificado
 
-    except HTTPException as e:
-        logging.exception("Error esperado al descargar documento")
-        raise e
+    documento = obtener_estudiante_documento_pg(
+        estudiante_documento_id=documentoId,
+        conexion=conexion
+    )[0]
 
-    except Exception as e:
-        logging.exception("Error inesperado al descargar documento")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    # Generar nombre del archivo basado en el tipo de documento y estudiante
+    estudiante_nombres = documento.estudiante['nombres'].replace(' ', '_')
+    estudiante_apellidos = documento.estudiante['apellidos'].replace(' ', '_')
+    tipo_doc = documento.tipoDocumento.lower()
+    filename = f"{estudiante_nombres}_{estudiante_apellidos}_{tipo_doc}.pdf"
 
-    finally:
-        conexion.close()
+    return respuesta_descarga(
+        request,
+        metadatos['contentTamano'],
+        # Desde el almacén de blobs, o por bloques desde la tabla si la fila aún no se migró
+        lector_archivo(TABLA_ESTUDIANTE_DOCUMENTO, documentoId, metadatos),
+        metadatos['contentTipo'] or TipoContenido.PDF,
+        filename,
+        etag=etag,
+        ultima_modificacion=ultima_modificacion
+    )
 
 
 @router.patch("/actualizar-estado",
               summary='actualizarEstadoDocumento', status_code=status.HTTP_204_NO_CONTENT)
 def actualizar_estado_documento(
         request: ActualizarDocumentoRequest = Body(),
-        current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+        current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
 ):
-    conexion = get_connection()
+    usuario_id = current_user['usuarioId']
+    documento_id = request.documentoId
+    estudiante_id = request.estudianteId
+    estado = request.estado
+
+    # Verificar que el documento existe
+    documentos = obtener_estudiante_documento_pg(
+        estudiante_documento_id=documento_id,
+        conexion=conexion
+    )
+
+    if not documentos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No se encontró el documento para actualizar'
+        )
 
-    try:
-        usuario_id = current_user['usuarioId']
-        documento_id = request.documentoId
-        estudiante_id = request.estudianteId
-        estado = request.estado
+    documento = documentos[0]
 
-        # Verificar que el documento existe
-        documentos = obtener_estudiante_documento_pg(
-            estudiante_documento_id=documento_id,
-            conexion=conexion
+    # Validar que el documento pertenece al estudiante especificado
+    if documento.estudianteId != estudiante_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='El documento no pertenece al estudiante especificado'
         )
 
-        if not documentos:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail='No se encontró el documento para actualizar'
-            )
+    # Verificar que el estudiante existe
+    estudiantes = obtener_estudiante_pg(
+        estudiante_id=estudiante_id,
+        conexion=conexion
+    )
 
-        documento = documentos[0]
+    if not estudiantes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No se encontró el estudiante especificado'
+        )
 
-        # Validar que el documento pertenece al estudiante especificado
-        if documento.estudianteId != estudiante_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='El documento no pertenece al estudiante especificado'
-            )
+    # Actualizar el estado del documento
+    documento_actualizado = actualizar_estudiante_documento_pg(
+        estudiante_documento_id=documento_id,
+        estado=estado,
+        conexion=conexion
+    )
+
+    if not documento_actualizado:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No se pudo actualizar el estado del documento'
+        )
 
-        # Verificar que el estudiante existe
-        estudiantes = obtener_estudiante_pg(
+    if estado == EstadoDocumento.VALIDO:
+        documentos_validos_status = verificar_documentos_validos_completos_pg(
             estudiante_id=estudiante_id,
             conexion=conexion
         )
 
-        if not estudiantes:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail='No se encontró el estudiante especificado'
+        if documentos_validos_status['tiene_todos_validos']:
+            estudiantes_actualizados = obtener_estudiante_pg(
+                estudiante_id=estudiante_id,
+                conexion=conexion
             )
 
-        # Actualizar el estado del documento
-        documento_actualizado = actualizar_estudiante_documento_pg(
-            estudiante_documento_id=documento_id,
-            estado=estado,
-            conexion=conexion
-        )
+            estudiante = estudiantes_actualizados[0] if estudiantes_actualizados else None
 
-        if not documento_actualizado:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='No se pudo actualizar el estado del documento'
-            )
+            correo_estudiante = estudiante.correo
 
-        if estado == EstadoDocumento.VALIDO:
-            documentos_validos_status = verificar_documentos_validos_completos_pg(
-                estudiante_id=estudiante_id,
-                conexion=conexion
-            )
+            if estudiante and estudiante.estado in [EstadoEstudiante.REGISTRADO,
+                                                    EstadoEstudiante.PENDIENTE_DOCUMENTO]:
 
-            if documentos_validos_status['tiene_todos_validos']:
-                estudiantes_actualizados = obtener_estudiante_pg(
+                estudiante_actualizado = actualizar_estudiante_pg(
                     estudiante_id=estudiante_id,
+                    usuario_actualizacion_id=usuario_id,
+                    estado=EstadoEstudiante.PENDIENTE_RESPUESTA,
                     conexion=conexion
                 )
 
-                estudiante = estudiantes_actualizados[0] if estudiantes_actualizados else None
-
-                correo_estudiante = estudiante.correo
+                if estudiante_actualizado:
+                    logging.info(
+                        f"Estudiante {estudiante_id} actualizado a estado PENDIENTE_RESPUESTA - todos los documentos están válidos")
 
-                if estudiante and estudiante.estado in [EstadoEstudiante.REGISTRADO,
-                                                        EstadoEstudiante.PENDIENTE_DOCUMENTO]:
-
-                    estudiante_actualizado = actualizar_estudiante_pg(
-                        estudiante_id=estudiante_id,
-                        usuario_actualizacion_id=usuario_id,
-                        estado=EstadoEstudiante.PENDIENTE_RESPUESTA,
-                        conexion=conexion
+                    email_service.enviar_email_documentos_validados(
+                        destinatario=correo_estudiante,
+                        nombres=estudiante.nombres,
+                        apellidos=estudiante.apellidos
                     )
 
-                    if estudiante_actualizado:
-                        logging.info(
-                            f"Estudiante {estudiante_id} actualizado a estado PENDIENTE_RESPUESTA - todos los documentos están válidos")
-
-                        email_service.enviar_email_documentos_validados(
-                            destinatario=correo_estudiante,
-                            nombres=estudiante.nombres,
-                            apellidos=estudiante.apellidos
-                        )
-
-                    else:
-                        logging.warning(f"No se pudo actualizar el estado del estudiante {estudiante_id}")
-                        raise Exception("No se pudo actualizar el estado del estudiante")
-
-        conexion.commit()
-
-        return
-
-    except HTTPException as e:
-        logging.exception("Error controlado al actualizar estado del documento")
-        conexion.rollback()
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-
-    except Exception as e:
-        logging.exception("Ocurrió un error inesperado al actualizar estado del documento")
-        conexion.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+                else:
+                    logging.warning(f"No se pudo actualizar el estado del estudiante {estudiante_id}")
+                    raise Exception("No se pudo actualizar el estado del estudiante")
 
-    finally:
-        conexion.close()
+    return
 
 
 @router.get("/estudiante/{matricula}/descargar",
@@ -404,92 +352,159 @@ def actualizar_estado_documento(
             status_code=status.HTTP_200_OK)
 def descargar_documentos_estudiante(
         matricula: str = Path(alias='matricula', description='Matricula del estudiante'),
-        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
 ) -> StreamingResponse:
-    import zipfile
-
-    conexion = get_connection()
-
-    try:
-        # Verificar que el estudiante existe
-        estudiantes = obtener_estudiante_pg(
-            matricula=matricula,
-            conexion=conexion
+    # Verificar que el estudiante existe
+    estudiantes = obtener_estudiante_pg(
+        matricula=matricula,
+        conexion=conexion
+    )
+
+    if not estudiantes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No se encontró el estudiante especificado"
         )
 
-        if not estudiantes:
+    # El resultado puede ser lista o dict (paginado), manejamos ambos casos
+    if isinstance(estudiantes, list):
+        estudiante = estudiantes[0]
+    else:
+        estudiante = estudiantes['estudiantes'][0] if estudiantes['estudiantes'] else None
+        if not estudiante:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No se encontró el estudiante especificado"
             )
 
-        # El resultado puede ser lista o dict (paginado), manejamos ambos casos
-        if isinstance(estudiantes, list):
-            estudiante = estudiantes[0]
-        else:
-            estudiante = estudiantes['estudiantes'][0] if estudiantes['estudiantes'] else None
-            if not estudiante:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="No se encontró el estudiante especificado"
-                )
+    estudiante_id = estudiante.estudianteId
 
-        estudiante_id = estudiante.estudianteId
+    # Obtener todos los documentos del estudiante
+    documentos = obtener_estudiante_documento_pg(
+        estudiante_id=estudiante_id,
+        conexion=conexion
+    )
 
-        # Obtener todos los documentos del estudiante
-        documentos = obtener_estudiante_documento_pg(
-            estudiante_id=estudiante_id,
-            conexion=conexion
+    if not documentos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="El estudiante no tiene documentos registrados"
         )
 
-        if not documentos:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="El estudiante no tiene documentos registrados"
-            )
+    # Generar nombre del archivo ZIP
+    estudiante_nombres = estudiante.nombres.replace(' ', '_')
+    estudiante_apellidos = estudiante.apellidos.replace(' ', '_')
+    zip_filename = f"documentos_{estudiante_nombres}_{estudiante_apellidos}.zip"
 
-        # Crear el ZIP directamente en memoria
-        zip_buffer = BytesIO()
+    # El generador toma su propia conexión del pool: la del request se devuelve antes de enviar el cuerpo
+    archivos = obtener_archivos_estudiante_stream_pg(estudiante_id=estudiante_id)
+
+    return respuesta_zip(entradas_zip_documentos(archivos), zip_filename)
+
+
+@router.post("/exportaciones",
+             responses={status.HTTP_202_ACCEPTED: {"model": ResponseData[int]}},
+             summary='registrarExportacionDocumentos', status_code=status.HTTP_202_ACCEPTED)
+def registrar_exportacion_documentos(
+        request: RegistrarExportacionDocumentoRequest = Body(),
+        current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
+):
+    """
+    Registra la exportación de los documentos de todos los estudiantes del filtro; el ZIP se arma
+    en segundo plano y el progreso se consulta en /exportaciones/{exportacionId}
+    """
+    if request.fechaDesde is not None and request.fechaHasta is not None and request.fechaDesde > request.fechaHasta:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fechaDesde debe ser menor o igual que la fechaHasta"
+        )
+
+    exportacion_id = registrar_exportacion_pg(
+        estado=EstadoExportacion.PENDIENTE,
+        estado_estudiante=request.estadoEstudiante,
+        fecha_desde=request.fechaDesde,
+        fecha_hasta=request.fechaHasta,
+        usuario_creacion_id=current_user['usuarioId'],
+        conexion=conexion
+    )
+
+    if not exportacion_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se pudo registrar la exportación"
+        )
+
+    gestor_exportaciones.reservar(conexion)
+
+    # Se programa recién con la exportación confirmada; si el commit falla el lugar reservado se libera
+    conexion.al_confirmar(lambda: gestor_exportaciones.programar(
+        exportacion_id,
+        request.estadoEstudiante,
+        request.fechaDesde,
+        request.fechaHasta
+    ))
+
+    return ResponseData(data=exportacion_id)
 
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for documento in documentos:
-                # Obtener el contenido del documento
-                content = obtener_content_estudiante_documento_pg(
-                    estudiante_documento_id=documento.estudianteDocumentoId,
-                    conexion=conexion
-                )
 
-                if content is not None:
-                    # Generar nombre del archivo
-                    tipo_doc = documento.tipoDocumento.lower()
-                    estado_doc = documento.estado.lower()
-                    fecha_creacion = documento.fechaCreacion.replace(':', '-').replace(' ', '_')
-                    filename = f"{tipo_doc}_{estado_doc}_{fecha_creacion}.pdf"
+@router.get("/exportaciones/{exportacionId}",
+            responses={status.HTTP_200_OK: {"model": ResponseData[ExportacionDocumento]}},
+            summary='obtenerExportacionDocumentos', status_code=status.HTTP_200_OK)
+def obtener_exportacion_documentos(
+        exportacionId: int = Path(..., description="ID de la exportación"),
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
+):
+    exportacion = obtener_exportacion_pg(exportacionId, conexion)
+
+    if not exportacion:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exportación no encontrada"
+        )
 
-                    # Agregar el archivo al ZIP
-                    zip_file.writestr(filename, content)
+    return ResponseData(data=ExportacionDocumento(**exportacion, porcentaje=porcentaje_exportacion(exportacion)))
 
-        # Posicionar el cursor al inicio del buffer
-        zip_buffer.seek(0)
 
-        # Generar nombre del archivo ZIP
-        estudiante_nombres = estudiante.nombres.replace(' ', '_')
-        estudiante_apellidos = estudiante.apellidos.replace(' ', '_')
-        zip_filename = f"documentos_{estudiante_nombres}_{estudiante_apellidos}.zip"
+@router.get("/exportaciones/{exportacionId}/descargar",
+            summary="Descargar el ZIP de una exportación completada",
+            status_code=status.HTTP_200_OK)
+def descargar_exportacion_documentos(
+        request: Request,
+        exportacionId: int = Path(..., description="ID de la exportación"),
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
+) -> Response:
+    exportacion = obtener_exportacion_pg(exportacionId, conexion)
+
+    if not exportacion:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exportación no encontrada"
+        )
 
-        return StreamingResponse(
-            zip_buffer,
-            media_type="application/zip",
-            headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+    if exportacion['estado'] != EstadoExportacion.COMPLETADA:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La exportación no está disponible para descargar (estado {exportacion['estado']})"
         )
 
-    except HTTPException as e:
-        logging.exception("Error esperado al descargar documentos del estudiante")
-        raise e
+    ruta = gestor_exportaciones.ruta(exportacionId)
 
-    except Exception as e:
-        logging.exception("Error inesperado al descargar documentos del estudiante")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    if not os.path.exists(ruta):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="El archivo de la exportación no está disponible"
+        )
 
-    finally:
-        conexion.close()
+    # El contenido de una exportación no cambia: el id sirve como validador fuerte
+    return respuesta_descarga(
+        request,
+        exportacion['tamano'],
+        leer_rango_ruta(ruta),
+        "application/zip",
+        f"exportacion_documentos_{exportacionId}.zip",
+        etag=f'"exportacion-{exportacionId}"'
+    )
@@ -1,90 +1,67 @@
 import logging
 from datetime import datetime
 
+import asyncpg
 from fastapi import APIRouter, status, Body, Depends, HTTPException, Path, Query
+from psycopg2.extensions import connection
 
 from database.categoria_evento import obtener_categoria_evento_pg
-from database.connection import get_connection
-from database.evento import registrar_evento_pg, obtener_evento_pg, actualizar_evento_pg
+from database.connection import get_conexion, RutaTransaccional, get_conexion_async
+from database.evento import registrar_evento_pg, obtener_evento_pg, obtener_evento_async_pg, \
+    obtener_evento_keyset_async_pg, actualizar_evento_pg
 from models.evento import Evento
 from models.generico import ResponseData, ResponseList
-from models.paginacion import ResponsePaginado
+from models.paginacion import ResponseCursor
 from models.requests.actualizar_evento import ActualizarEventoRequest
 from models.requests.registrar_evento import RegistrarEventoRequest
-from shared.constante import Estado, Rol
-from shared.permission import get_current_user
+from shared.constante import Estado, Rol, LimitePaginacion
+from shared.permission import get_current_user, get_current_user_async
 from shared.utils import validar_fechas
 
-router = APIRouter(prefix="/evento", tags=["Evento"])
+router = APIRouter(prefix="/evento", tags=["Evento"], route_class=RutaTransaccional)
 
 
 @router.post("/registrar",
              responses={status.HTTP_201_CREATED: {"model": ResponseData[int]}},
              summary='registrarEvento', status_code=status.HTTP_201_CREATED)
 def registrar_evento(request: RegistrarEventoRequest = Body(),
-                     current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR))):
-    conexion = get_connection()
+                     current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+                     conexion: connection = Depends(get_conexion)):
+    usuario_id = current_user['usuarioId']
 
-    try:
+    fechas_validas_dict = validar_fechas(fecha_inicio=request.fechaInicio, fecha_fin=request.fechaFin)
 
-        usuario_id = current_user['usuarioId']
+    if not fechas_validas_dict['valido']:
+        logging.exception("Las fechas inicio y fin del evento son invalidas")
 
-        fechas_validas_dict = validar_fechas(fecha_inicio=request.fechaInicio, fecha_fin=request.fechaFin)
-
-        if not fechas_validas_dict['valido']:
-            logging.exception("Las fechas inicio y fin del evento son invalidas")
-
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='Las fechas inicio y fin del evento son invalidas'
-            )
-
-        evento_id = registrar_evento_pg(
-            nombre=request.nombre,
-            usuario_creacion_id=usuario_id,
-            estado=Estado.ACTIVO,
-            categoria_evento_id=request.categoriaEventoId,
-            descripcion=request.descripcion,
-            fecha_inicio=request.fechaInicio,
-            fecha_fin=request.fechaFin,
-            conexion=conexion
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Las fechas inicio y fin del evento son invalidas'
         )
 
-        conexion.commit()
-
-        return ResponseData[int](data=evento_id)
-
-    except HTTPException as e:
-
-        logging.exception("Ocurrió un error inesperado")
-
-        conexion.rollback()
+    evento_id = registrar_evento_pg(
+        nombre=request.nombre,
+        usuario_creacion_id=usuario_id,
+        estado=Estado.ACTIVO,
+        categoria_evento_id=request.categoriaEventoId,
+        descripcion=request.descripcion,
+        fecha_inicio=request.fechaInicio,
+        fecha_fin=request.fechaFin,
+        conexion=conexion
+    )
 
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-
-
-    except Exception as e:
-
-        logging.exception("Ocurrió un error inesperado")
-
-        conexion.rollback()
-
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e)
-
-
-    finally:
-        conexion.close()
+    return ResponseData[int](data=evento_id)
 
 
 @router.get("/",
             responses={
                 status.HTTP_200_OK: {
-                    "model": ResponsePaginado[Evento]
+                    "model": ResponseCursor[Evento]
                 }
             },
             summary='obtenerEvento', status_code=status.HTTP_200_OK)
-def buscar_evento(
-        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+async def buscar_evento(
+        _: dict = Depends(get_current_user_async(Rol.ADMINISTRADOR)),
         estado: str | None = Query(
             None,
             description="Estado del evento",
@@ -102,62 +79,74 @@ def buscar_evento(
         fechaFin: datetime | None = Query(
             None,
             description="Fecha de fin para filtrar eventos (requiere fechaInicio)"
-        )
+        ),
+        limite: int | None = Query(
+            None,
+            description="Registros por página, activa la paginación por cursor",
+            ge=1,
+            le=LimitePaginacion.MAXIMO
+        ),
+        cursor: str | None = Query(
+            None,
+            description="Valor de paginacion.siguienteCursor de la página anterior"
+        ),
+        conexion: asyncpg.Connection = Depends(get_conexion_async)
 ):
-    conexion = get_connection()
+    # Validar que si se proporciona fechaInicio, también se proporcione fechaFin
+    if fechaInicio is not None and fechaFin is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Si proporciona fechaInicio, también debe proporcionar fechaFin"
+        )
 
-    try:
-        # Validar que si se proporciona fechaInicio, también se proporcione fechaFin
-        if fechaInicio is not None and fechaFin is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Si proporciona fechaInicio, también debe proporcionar fechaFin"
-            )
+    if fechaFin is not None and fechaInicio is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Si proporciona fechaFin, también debe proporcionar fechaInicio"
+        )
 
-        if fechaFin is not None and fechaInicio is None:
+    # Validar que fechaInicio sea menor que fechaFin
+    if fechaInicio is not None and fechaFin is not None:
+        if fechaInicio >= fechaFin:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Si proporciona fechaFin, también debe proporcionar fechaInicio"
+                detail="La fechaInicio debe ser menor que la fechaFin"
             )
 
-        # Validar que fechaInicio sea menor que fechaFin
-        if fechaInicio is not None and fechaFin is not None:
-            if fechaInicio >= fechaFin:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="La fechaInicio debe ser menor que la fechaFin"
-                )
-
-        resultado = obtener_evento_pg(
+    if limite is not None or cursor is not None:
+        pagina = await obtener_evento_keyset_async_pg(
             estado=estado,
             categoria_evento_id=categoriaEventoId,
             fecha_inicio=fechaInicio,
             fecha_fin=fechaFin,
+            limite=limite or LimitePaginacion.DEFECTO,
+            cursor=cursor,
             conexion=conexion
         )
 
-        if not resultado:
+        if not pagina["eventos"]:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='No se encontraron eventos'
             )
 
-        conexion.commit()
-
-        return ResponseList(data=resultado)
+        return ResponseCursor(items=pagina["eventos"], paginacion=pagina["paginacion"])
 
-    except HTTPException as e:
-        logging.exception("Error controlado")
-        conexion.rollback()
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    resultado = await obtener_evento_async_pg(
+        estado=estado,
+        categoria_evento_id=categoriaEventoId,
+        fecha_inicio=fechaInicio,
+        fecha_fin=fechaFin,
+        conexion=conexion
+    )
 
-    except Exception as e:
-        logging.exception("Ocurrió un error inesperado")
-        conexion.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    if not resultado:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No se encontraron eventos'
+        )
 
-    finally:
-        conexion.close()
+    return ResponseList(data=resultado)
 
 
 @router.get("/{eventoId}",
@@ -165,153 +154,101 @@ def buscar_evento(
             summary='obtenerEventoPorId', status_code=status.HTTP_200_OK)
 def buscar_evento_id(evento_id: int = Path(alias='eventoId', description='Id del evento'),
                      _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
-                     estado: str | None = Query(None, min_length=2, max_length=2, pattern="^(IN|AC)$")):
-    conexion = get_connection()
-
-    try:
-
-        eventos = obtener_evento_pg(
-            evento_id=evento_id,
-            estado=estado,
-            conexion=conexion
+                     estado: str | None = Query(None, min_length=2, max_length=2, pattern="^(IN|AC)$"),
+                     conexion: connection = Depends(get_conexion)):
+    eventos = obtener_evento_pg(
+        evento_id=evento_id,
+        estado=estado,
+        conexion=conexion
+    )
+
+    if not eventos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No se encontró el evento'
         )
 
-        if not eventos:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail='No se encontró el evento'
-            )
-
-        categoria_evento = eventos[0]
-
-        conexion.commit()
-
-        return ResponseData(data=categoria_evento)
-
-    except HTTPException as e:
+    categoria_evento = eventos[0]
 
-        logging.exception("Ocurrió un error inesperado")
-
-        conexion.rollback()
-
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-
-
-    except Exception as e:
-
-        logging.exception("Ocurrió un error inesperado")
-
-        conexion.rollback()
-
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e)
-
-
-    finally:
-        conexion.close()
+    return ResponseData(data=categoria_evento)
 
 
 @router.patch("/actualizar",
               summary='actualizarEvento', status_code=status.HTTP_204_NO_CONTENT)
 def actualizar_evento(request: ActualizarEventoRequest = Body(),
-                      current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR))):
-    conexion = get_connection()
+                      current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+                      conexion: connection = Depends(get_conexion)):
+    categoria_evento_id = request.categoriaEventoId
 
-    try:
+    usuario_id = current_user['usuarioId']
 
-        categoria_evento_id = request.categoriaEventoId
+    evento_id = request.eventoId
 
-        usuario_id = current_user['usuarioId']
+    eventos = obtener_evento_pg(
+        evento_id=evento_id,
+        conexion=conexion
+    )
 
-        evento_id = request.eventoId
-
-        eventos = obtener_evento_pg(
-            evento_id=evento_id,
-            conexion=conexion
+    if not eventos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No se encontró el evento para actualizar'
         )
 
-        if not eventos:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail='No se encontró el evento para actualizar'
-            )
+    evento = eventos[0]
 
-        evento = eventos[0]
+    categorias_eventos = obtener_categoria_evento_pg(
+        categoria_evento_id=categoria_evento_id,
+        estado=Estado.ACTIVO,
+        conexion=conexion
+    )
 
-        categorias_eventos = obtener_categoria_evento_pg(
-            categoria_evento_id=categoria_evento_id,
-            estado=Estado.ACTIVO,
-            conexion=conexion
+    if not categorias_eventos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No se encontró la categoria del evento activo para actualizar'
         )
 
-        if not categorias_eventos:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='No se encontró la categoria del evento activo para actualizar'
-            )
-
-        fecha_inicio_validar = request.fechaInicio if request.fechaInicio else evento.fechaInicio
+    fecha_inicio_validar = request.fechaInicio if request.fechaInicio else evento.fechaInicio
 
-        fecha_fin_validar = request.fechaFin if request.fechaFin else evento.fechaFin
+    fecha_fin_validar = request.fechaFin if request.fechaFin else evento.fechaFin
 
-        fechas_validas_dict = validar_fechas(fecha_inicio_validar, fecha_fin_validar)
+    fechas_validas_dict = validar_fechas(fecha_inicio_validar, fecha_fin_validar)
 
-        if not fechas_validas_dict['valido']:
-            logging.exception("Las fechas inicio y fin del evento son invalidas")
-
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='Las fechas inicio y fin del evento son invalidas'
-            )
-
-        params = {
-            'nombre': request.nombre,
-            'descripcion': request.descripcion,
-            'fecha_inicio': request.fechaInicio,
-            'fecha_fin': request.fechaFin,
-            'categoria_evento_id': categoria_evento_id,
-            'usuario_actualizacion_id': usuario_id,
-            'estado': request.estado
-        }
-
-        if not params:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='No se encontró ningún campo para actualizar'
-            )
-
-        params['conexion'] = conexion
-
-        params['evento_id'] = evento_id
-
-        evento_actualizado = actualizar_evento_pg(**params)
-
-        if not evento_actualizado:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='No se pudo actualizar la categoria del evento'
-            )
-
-        conexion.commit()
-
-        return
-
-    except HTTPException as e:
-
-        logging.exception("Ocurrió un error inesperado")
-
-        conexion.rollback()
-
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not fechas_validas_dict['valido']:
+        logging.exception("Las fechas inicio y fin del evento son invalidas")
 
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Las fechas inicio y fin del evento son invalidas'
+        )
 
-    except Exception as e:
+    params = {
+        'nombre': request.nombre,
+        'descripcion': request.descripcion,
+        'fecha_inicio': request.fechaInicio,
+        'fecha_fin': request.fechaFin,
+        'categoria_evento_id': categoria_evento_id,
+        'usuario_actualizacion_id': usuario_id,
+        'estado': request.estado
+    }
+
+    if not params:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No se encontró ningún campo para actualizar'
+        )
 
-        logging.exception("Ocurrió un error inesperado")
+    params['conexion'] = conexion
 
-        conexion.rollback()
+    params['evento_id'] = evento_id
 
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e)
+    evento_actualizado = actualizar_evento_pg(**params)
 
+    if not evento_actualizado:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No se pudo actualizar la categoria del evento'
+        )
 
-    finally:
-        conexion.close()
+    return
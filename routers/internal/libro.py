@@ -1,26 +1,32 @@
-import logging
-from io import BytesIO
-from typing import List
+from typing import Iterator, List
 
-from fastapi import APIRouter, status, Depends, HTTPException, UploadFile, File, Form, Query, Path, Body
-from starlette.responses import StreamingResponse
+import asyncpg
+from fastapi import APIRouter, status, Depends, HTTPException, UploadFile, File, Form, Query, Path, Body, \
+    Request
+from starlette.responses import Response
+from psycopg2.extensions import connection
 
-from database.connection import get_connection
+from database.connection import get_conexion, RutaTransaccional, get_conexion_async
+from database.contenido import lector_archivo, TABLA_LIBRO
 from database.editorial import obtener_editorial_pg
-from database.libro import registrar_libro_pg, obtener_libros_pg, obtener_content_libro, actualizar_libro_pg
+from database.libro import registrar_libro_pg, obtener_libros_pg, obtener_libros_async_pg, \
+    obtener_metadatos_archivo_libro_pg, actualizar_libro_pg
 from models.generico import ResponseData, ResponseList
 from models.libro import Libro
 from models.requests.actualizar_libro import ActualizarLibroRequest
+from shared.almacenamiento import TipoContenido, archivo_disponible, guardar_upload_pdf, etag_archivo
+from shared.cache import cache_libros, invalidar_cache_libro
 from shared.constante import Estado, Rol, SizeLibro
-from shared.permission import get_current_user
+from shared.descargas import respuesta_descarga, respuesta_no_modificado, leer_rango_bytes, LectorRango
+from shared.permission import get_current_user, get_current_user_async
 
-router = APIRouter(prefix="/libro", tags=["Libro"])
+router = APIRouter(prefix="/libro", tags=["Libro"], route_class=RutaTransaccional)
 
 
 @router.post("/registrar",
              responses={status.HTTP_201_CREATED: {"model": ResponseData[int]}},
              summary='registrarLibro', status_code=status.HTTP_201_CREATED)
-async def registrar_libro(
+def registrar_libro(
         editorialId: int = Form(...),
         titulo: str = Form(...),
         file: UploadFile = File(...),
@@ -29,69 +35,40 @@ async def registrar_libro(
         sipnosis: str = Form(None),
         yearPublicacion: int = Form(None),
         archivoUrl: str = Form(None),
-        current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR))):
-    conexion = get_connection()
-
-    try:
-
-        content = await file.read()
-
-        usuario_id = current_user['usuarioId']
-
-        if len(content) > SizeLibro.MAX_FILE_SIZE:
-            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                                detail="Archivo excede los 20MB permitidos")
-
-        editorial = obtener_editorial_pg(
-            editorial_id=editorialId,
-            estado=Estado.ACTIVO,
-            conexion=conexion
+        current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)):
+    usuario_id = current_user['usuarioId']
+
+    editorial = obtener_editorial_pg(
+        editorial_id=editorialId,
+        estado=Estado.ACTIVO,
+        conexion=conexion
+    )
+
+    if not editorial:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se encontró la editorial especificada o no esta activa"
         )
 
-        if not editorial:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No se encontró la editorial especificada o no esta activa"
-            )
-
-        libro_id = registrar_libro_pg(
-            editorial_id=editorialId,
-            titulo=titulo,
-            estado=Estado.ACTIVO,
-            content=content,
-            usuario_creacion_id=usuario_id,
-            cantidad_disponible=cantidadDisponible,
-            sipnosis=sipnosis,
-            year_publicacion=yearPublicacion,
-            archivo_url=archivoUrl,
-            imagen_url=imagenUrl,
-            conexion=conexion
-        )
-
-        conexion.commit()
-
-        return ResponseData[int](data=libro_id)
-
-    except HTTPException as e:
-
-        logging.exception("Ocurrió un error inesperado")
+    # El archivo pasa al almacén por bloques, validando tamaño y firma PDF mientras se lee
+    blob = guardar_upload_pdf(file, SizeLibro.MAX_FILE_SIZE, "Archivo excede los 20MB permitidos")
 
-        conexion.rollback()
+    libro_id = registrar_libro_pg(
+        editorial_id=editorialId,
+        titulo=titulo,
+        estado=Estado.ACTIVO,
+        blob=blob,
+        usuario_creacion_id=usuario_id,
+        cantidad_disponible=cantidadDisponible,
+        sipnosis=sipnosis,
+        year_publicacion=yearPublicacion,
+        archivo_url=archivoUrl,
+        imagen_url=imagenUrl,
+        conexion=conexion
+    )
 
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
-
-
-    except Exception as e:
-
-        logging.exception("Ocurrió un error inesperado")
-
-        conexion.rollback()
-
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e)
-
-
-    finally:
-        conexion.close()
+    return ResponseData[int](data=libro_id)
 
 
 @router.get(
@@ -100,187 +77,195 @@ async def registrar_libro(
     summary="obtenerLibros",
     status_code=status.HTTP_200_OK
 )
-def buscar_libros(
-        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+async def buscar_libros(
+        _: dict = Depends(get_current_user_async(Rol.ADMINISTRADOR)),
         estado: str | None = Query(None, min_length=2, max_length=2, regex="^(AC|IN)$"),
-        titulo: str | None = Query(default=None, min_length=1, max_length=250)
+        titulo: str | None = Query(default=None, min_length=1, max_length=250),
+        conexion: asyncpg.Connection = Depends(get_conexion_async)
 ):
-    conexion = get_connection()
-
-    try:
-        libros = obtener_libros_pg(
-            estado=estado,
-            titulo=titulo,
-            conexion=conexion
+    libros = await obtener_libros_async_pg(
+        estado=estado,
+        titulo=titulo,
+        conexion=conexion
+    )
+
+    if not libros:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No se encontraron libros"
         )
 
-        if not libros:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No se encontraron libros"
-            )
+    return ResponseList(data=libros)
 
-        conexion.commit()
-        return ResponseList(data=libros)
 
-    except HTTPException as e:
-        logging.exception("Error controlado al obtener libros")
+@router.get("/{libroId}/descargar",
+            summary="Descargar contenido del libro por ID",
+            status_code=status.HTTP_200_OK)
+def descargar_libro(
+        request: Request,
+        libroId: int = Path(..., description="ID del libro"),
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
+) -> Response:
+    # Solo metadatos: si el cliente ya tiene esta versión no se lee el contenido
+    metadatos = obtener_metadatos_archivo_libro_pg(libro_id=libroId, conexion=conexion)
+
+    if not metadatos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Libro no encontrado"
+        )
 
-        conexion.rollback()
+    if not archivo_disponible(metadatos):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contenido del libro no disponible"
+        )
 
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    etag = etag_archivo(metadatos, f"libro:{libroId}")
+    ultima_modificacion = metadatos['fechaModificacion']
 
-    except Exception as e:
-        logging.exception("Ocurrió un error inesperado al obtener libros")
-        conexion.rollback()
+    no_modificado = respuesta_no_modificado(request, etag, ultima_modificacion)
+    if no_modificado is not None:
+        return no_modificado
 
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e)
+    titulo = metadatos['titulo']
 
+    filename = f"{titulo.replace(' ', '_')}.pdf"
 
-    finally:
-        conexion.close()
+    return respuesta_descarga(
+        request,
+        metadatos['contentTamano'],
+        _lector_libro(libroId, metadatos),
+        metadatos['contentTipo'] or TipoContenido.PDF,
+        filename,
+        etag=etag,
+        ultima_modificacion=ultima_modificacion
+    )
 
 
-@router.get("/{libroId}/descargar",
-            summary="Descargar contenido del libro por ID",
-            status_code=status.HTTP_200_OK)
-def descargar_libro(
-        libroId: int = Path(..., description="ID del libro"),
-        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
-) -> StreamingResponse:
-    conexion = get_connection()
+def _lector_libro(libro_id: int, metadatos: dict) -> LectorRango:
+    """
+    Los libros que entran en la cache se sirven desde memoria; el resto desde el almacén de blobs,
+    o por bloques desde la tabla si la fila aún no se migró
+    """
+    lector = lector_archivo(TABLA_LIBRO, libro_id, metadatos)
+    tamano = metadatos['contentTamano']
 
-    try:
-        libros = obtener_libros_pg(libro_id=libroId, conexion=conexion)
+    if not cache_libros.admite(tamano):
+        return lector
 
-        if not libros:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Libro no encontrado"
-            )
+    # El sha256 cambia con el contenido; las filas sin migrar se identifican por su fecha de modificación
+    clave = (libro_id, metadatos['contentSha256'] or metadatos['fechaModificacion'])
+    contenido = cache_libros.obtener(clave)
 
-        libro = libros[0]
-        titulo = libro.titulo
-        content = obtener_content_libro(libro_id=libroId)
+    if contenido is not None:
+        return leer_rango_bytes(contenido)
 
-        if content is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Contenido del libro no disponible"
-            )
+    # Sin cache se lee recién al enviar la respuesta, con la conexión del request ya devuelta
+    return lambda inicio, fin: _leer_y_guardar(clave, lector, tamano, inicio, fin)
 
-        file_like = BytesIO(content)
-        filename = f"{titulo.replace(' ', '_')}.pdf"
 
-        return StreamingResponse(
-            file_like,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+def _leer_y_guardar(clave: tuple, lector: LectorRango, tamano: int, inicio: int, fin: int) -> Iterator[bytes]:
+    """
+    Copia a la cache los bloques a medida que se envían. Solo lo hace una descarga completa
+    y una por clave a la vez; las demás se sirven directo sin guardar nada.
+    """
+    llenado = cache_libros.iniciar_llenado(clave) if (inicio, fin) == (0, tamano - 1) else None
 
-    except HTTPException as e:
-        logging.exception("Error esperado al descargar libro")
-        raise e
+    if llenado is None:
+        yield from lector(inicio, fin)
+        return
 
-    except Exception as e:
-        logging.exception("Error inesperado al descargar libro")
+    bloques = []
+    completo = False
 
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e)
+    try:
+        for bloque in lector(inicio, fin):
+            bloques.append(bloque)
+            yield bloque
 
+        completo = True
     finally:
-        conexion.close()
+        cache_libros.terminar_llenado(clave, llenado, b''.join(bloques) if completo else None)
 
 
 @router.patch("/actualizar",
               summary='actualizarLibro', status_code=status.HTTP_204_NO_CONTENT)
 def actualizar_libro(
         request: ActualizarLibroRequest = Body(),
-        current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+        current_user: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
 ):
-    conexion = get_connection()
-
-    try:
-        libro_id = request.libroId
-        usuario_id = current_user['usuarioId']
-
-        # Verificar que el libro existe
-        libros = obtener_libros_pg(
-            libro_id=libro_id,
-            conexion=conexion
+    libro_id = request.libroId
+    usuario_id = current_user['usuarioId']
+
+    # Verificar que el libro existe
+    libros = obtener_libros_pg(
+        libro_id=libro_id,
+        conexion=conexion
+    )
+
+    if not libros:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No se encontró el libro para actualizar'
         )
 
-        if not libros:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail='No se encontró el libro para actualizar'
-            )
-
-        # Validar que al menos un campo se va a actualizar (excluyendo libroId)
-        campos_actualizacion = [
-            request.editorialId,
-            request.titulo,
-            request.estado,
-            request.cantidadDisponible,
-            request.sipnosis,
-            request.yearPublicacion,
-            request.archivoUrl,
-            request.imagenUrl
-        ]
-
-        if all(campo is None for campo in campos_actualizacion):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='Debe enviar al menos un campo para actualizar el libro'
-            )
-
-        # Si se proporciona editorialId, verificar que la editorial existe y está activa
-        if request.editorialId is not None:
-            from database.editorial import obtener_editorial_pg
-            editoriales = obtener_editorial_pg(
-                editorial_id=request.editorialId,
-                estado=Estado.ACTIVO,
-                conexion=conexion
-            )
-
-            if not editoriales:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail='No se encontró la editorial activa especificada'
-                )
+    # Validar que al menos un campo se va a actualizar (excluyendo libroId)
+    campos_actualizacion = [
+        request.editorialId,
+        request.titulo,
+        request.estado,
+        request.cantidadDisponible,
+        request.sipnosis,
+        request.yearPublicacion,
+        request.archivoUrl,
+        request.imagenUrl
+    ]
+
+    if all(campo is None for campo in campos_actualizacion):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Debe enviar al menos un campo para actualizar el libro'
+        )
 
-        libro_actualizado = actualizar_libro_pg(
-            libro_id=libro_id,
-            usuario_actualizacion_id=usuario_id,
+    # Si se proporciona editorialId, verificar que la editorial existe y está activa
+    if request.editorialId is not None:
+        from database.editorial import obtener_editorial_pg
+        editoriales = obtener_editorial_pg(
             editorial_id=request.editorialId,
-            titulo=request.titulo,
-            estado=request.estado,
-            cantidad_disponible=request.cantidadDisponible,
-            sipnosis=request.sipnosis,
-            year_publicacion=request.yearPublicacion,
-            archivo_url=request.archivoUrl,
-            imagen_url=request.imagenUrl,
+            estado=Estado.ACTIVO,
             conexion=conexion
         )
 
-        if not libro_actualizado:
+        if not editoriales:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail='No se pudo actualizar el libro'
+                detail='No se encontró la editorial activa especificada'
             )
 
-        conexion.commit()
-
-        return
-
-    except HTTPException as e:
-        logging.exception("Error controlado al actualizar libro")
-        conexion.rollback()
-        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    libro_actualizado = actualizar_libro_pg(
+        libro_id=libro_id,
+        usuario_actualizacion_id=usuario_id,
+        editorial_id=request.editorialId,
+        titulo=request.titulo,
+        estado=request.estado,
+        cantidad_disponible=request.cantidadDisponible,
+        sipnosis=request.sipnosis,
+        year_publicacion=request.yearPublicacion,
+        archivo_url=request.archivoUrl,
+        imagen_url=request.imagenUrl,
+        conexion=conexion
+    )
+
+    if not libro_actualizado:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='No se pudo actualizar el libro'
+        )
 
-    except Exception as e:
-        logging.exception("Ocurrió un error inesperado al actualizar libro")
-        conexion.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    # Después del commit: antes, otra descarga podría volver a llenar la cache con la versión anterior
+    conexion.al_confirmar(lambda: invalidar_cache_libro(libro_id))
 
-    finally:
-        conexion.close()
\ No newline at end of file
+    return
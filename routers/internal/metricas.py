@@ -0,0 +1,39 @@
+import hmac
+import os
+
+from fastapi import APIRouter, status, Depends, HTTPException, Header
+from starlette.responses import PlainTextResponse
+
+from database.connection import estadisticas_pools, RutaTransaccional
+from database.metricas import exportar_prometheus
+from shared.constante import Rol
+from shared.permission import get_current_user
+
+router = APIRouter(prefix="/metrics", tags=["Monitoreo"], route_class=RutaTransaccional)
+
+# Token estático para el scraper de Prometheus (bearer_token en la configuración del job)
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN')
+
+
+def verificar_token_metricas(authorization: str | None = Header(default=None)):
+    esperado = f"Bearer {METRICAS_TOKEN}"
+
+    if authorization is None or not hmac.compare_digest(authorization.encode(), esperado.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de métricas inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+# Sin token configurado el endpoint queda, como el resto de /internal, solo para administradores
+verificar_acceso_metricas = verificar_token_metricas if METRICAS_TOKEN else get_current_user(Rol.ADMINISTRADOR)
+
+
+@router.get("",
+            response_class=PlainTextResponse,
+            summary='obtenerMetricas', status_code=status.HTTP_200_OK)
+def obtener_metricas(_=Depends(verificar_acceso_metricas)):
+    contenido = exportar_prometheus(estadisticas_pools())
+
+    return PlainTextResponse(contenido, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,117 @@
+from typing import List
+
+from fastapi import APIRouter, status, Depends
+from psycopg2.extensions import connection
+
+from database.blob_contenido import obtener_resumen_blobs_pg
+from database.connection import obtener_pool, obtener_pools_replica, ConfiguracionReplicas, \
+    RutaTransaccional, get_conexion
+from database.sentencias import registro_sentencias
+from models.generico import ResponseData, ResponseList
+from models.monitoreo import EstadisticasPool, EstadisticasPoolConexiones, EstadisticasSentencia, EstadisticasCache, \
+    EstadisticasPoolClaves, EstadisticasAlmacenBlobs, EstadisticasCacheBytes
+from shared.cache import cache_autorizacion, cache_tokens, cache_libros
+from shared.constante import Rol
+from shared.permission import get_current_user
+from shared.pool_claves import pool_claves
+
+router = APIRouter(prefix="/monitoreo", tags=["Monitoreo"], route_class=RutaTransaccional)
+
+
+@router.get("/pool-conexiones",
+            responses={status.HTTP_200_OK: {"model": ResponseData[EstadisticasPoolConexiones]}},
+            summary='obtenerEstadisticasPoolConexiones', status_code=status.HTTP_200_OK)
+def obtener_estadisticas_pool_conexiones(
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+):
+    """
+    Pool del primario y, con DB_REPLICAS, el de cada réplica: enUso y esperando por réplica
+    muestran cómo reparte el balanceo y cuál se está agotando
+    """
+    estadisticas = EstadisticasPoolConexiones(
+        **obtener_pool().estadisticas(),
+        balanceo=ConfiguracionReplicas.BALANCEO,
+        replicas=[EstadisticasPool(**pool.estadisticas()) for pool in obtener_pools_replica()]
+    )
+
+    return ResponseData[EstadisticasPoolConexiones](data=estadisticas)
+
+
+@router.get("/sentencias-preparadas",
+            responses={status.HTTP_200_OK: {"model": ResponseList[List[EstadisticasSentencia]]}},
+            summary='obtenerEstadisticasSentenciasPreparadas', status_code=status.HTTP_200_OK)
+def obtener_estadisticas_sentencias_preparadas(
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+):
+    estadisticas = [EstadisticasSentencia(**sentencia) for sentencia in registro_sentencias.estadisticas()]
+    estadisticas.sort(key=lambda sentencia: sentencia.tiempoAhorradoEstimadoMs, reverse=True)
+
+    return ResponseList[EstadisticasSentencia](data=estadisticas)
+
+
+@router.get("/cache-autorizacion",
+            responses={status.HTTP_200_OK: {"model": ResponseData[EstadisticasCache]}},
+            summary='obtenerEstadisticasCacheAutorizacion', status_code=status.HTTP_200_OK)
+def obtener_estadisticas_cache_autorizacion(
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+):
+    estadisticas = EstadisticasCache(**cache_autorizacion.estadisticas())
+
+    return ResponseData[EstadisticasCache](data=estadisticas)
+
+
+@router.get("/pool-claves",
+            responses={status.HTTP_200_OK: {"model": ResponseData[EstadisticasPoolClaves]}},
+            summary='obtenerEstadisticasPoolClaves', status_code=status.HTTP_200_OK)
+def obtener_estadisticas_pool_claves(
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+):
+    estadisticas = EstadisticasPoolClaves(**pool_claves.estadisticas())
+
+    return ResponseData[EstadisticasPoolClaves](data=estadisticas)
+
+
+@router.get("/cache-tokens",
+            responses={status.HTTP_200_OK: {"model": ResponseData[EstadisticasCache]}},
+            summary='obtenerEstadisticasCacheTokens', status_code=status.HTTP_200_OK)
+def obtener_estadisticas_cache_tokens(
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+):
+    estadisticas = EstadisticasCache(**cache_tokens.estadisticas())
+
+    return ResponseData[EstadisticasCache](data=estadisticas)
+
+
+@router.get("/cache-libros",
+            responses={status.HTTP_200_OK: {"model": ResponseData[EstadisticasCacheBytes]}},
+            summary='obtenerEstadisticasCacheLibros', status_code=status.HTTP_200_OK)
+def obtener_estadisticas_cache_libros(
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
+):
+    estadisticas = EstadisticasCacheBytes(**cache_libros.estadisticas())
+
+    return ResponseData[EstadisticasCacheBytes](data=estadisticas)
+
+
+@router.get("/almacen-blobs",
+            responses={status.HTTP_200_OK: {"model": ResponseData[EstadisticasAlmacenBlobs]}},
+            summary='obtenerEstadisticasAlmacenBlobs', status_code=status.HTTP_200_OK)
+def obtener_estadisticas_almacen_blobs(
+        _: dict = Depends(get_current_user(Rol.ADMINISTRADOR)),
+        conexion: connection = Depends(get_conexion)
+):
+    """
+    Espacio que ahorra la deduplicación: bytesReferenciados es lo que ocuparían los archivos
+    guardados una vez por fila, bytesAlmacenados lo que ocupan en el almacén
+    """
+    resumen = obtener_resumen_blobs_pg(conexion)
+    referenciados = resumen['bytesReferenciados']
+    ahorrados = referenciados - resumen['bytesAlmacenados']
+
+    estadisticas = EstadisticasAlmacenBlobs(
+        **resumen,
+        bytesAhorrados=ahorrados,
+        porcentajeAhorro=round(ahorrados * 100 / referenciados, 2) if referenciados else 0.0
+    )
+
+    return ResponseData[EstadisticasAlmacenBlobs](data=estadisticas)
@@ -3,19 +3,21 @@ from datetime import datetime
 from io import BytesIO
 from typing import Optional
 
-from fastapi import APIRouter, status, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, status, Depends, HTTPException, Query, Path, Request
 from starlette.responses import StreamingResponse
 
+from database.connection import RutaTransaccional
 from models.generico import ResponseData, ResponseList
 from models.unicda.estudiante_unicda import EstudiantesUNICDAPaginadoResponse, EstudianteUNICDA
 from models.unicda.evento_unicda import EventosUNICDAPaginadoResponse, EventoUNICDA
 from models.unicda.libro_unicda import LibrosUNICDAPaginadoResponse, LibroUNICDA
 from models.unicda_token_response import UNICDATokenResponse
 from shared.constante import Rol, UNICDAEndpoints, UnicdaPaginacion, InstitucionExternaUnicda
+from shared.descargas import respuesta_descarga, leer_rango_bytes
 from shared.permission import get_current_user
 from shared.unicda_service import unicda_service
 
-router = APIRouter(prefix="/unicda", tags=["UNICDA"])
+router = APIRouter(prefix="/unicda", tags=["UNICDA"], route_class=RutaTransaccional)
 
 
 @router.post("/generar-token",
@@ -203,6 +205,7 @@ def obtener_libros_unicda(
             summary="Descargar PDF desde UNICDA",
             status_code=status.HTTP_200_OK)
 def descargar_pdf_unicda(
+        request: Request,
         fileUrl: str = Path(..., description="URL del archivo PDF en UNICDA"),
         _: dict = Depends(get_current_user(Rol.ADMINISTRADOR))
 ) -> StreamingResponse:
@@ -233,10 +236,13 @@ def descargar_pdf_unicda(
 
         filename = f"unicda_documento_{filename_base}"
 
-        return StreamingResponse(
-            BytesIO(pdf_content),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        # UNICDA entrega el archivo completo; los rangos se sirven desde esa copia
+        return respuesta_descarga(
+            request,
+            len(pdf_content),
+            leer_rango_bytes(pdf_content),
+            "application/pdf",
+            filename
         )
 
     except HTTPException as e:
@@ -0,0 +1,295 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, NamedTuple, BinaryIO
+
+from fastapi import HTTPException, UploadFile, status
+
+
+class BackendAlmacenamiento:
+    FILESYSTEM = 'filesystem'
+
+
+class ConfiguracionAlmacenamiento:
+    BACKEND = os.getenv('BLOB_BACKEND', BackendAlmacenamiento.FILESYSTEM)
+    DIRECTORIO = os.getenv('BLOB_DIRECTORIO', os.path.join(os.getcwd(), 'almacenamiento'))
+    # Tamaño de los bloques al leer o escribir archivos
+    TAMANO_BLOQUE = int(os.getenv('BLOB_TAMANO_BLOQUE', str(64 * 1024)))
+
+
+class TipoContenido:
+    PDF = 'application/pdf'
+
+
+FIRMA_PDF = b'%PDF'
+
+
+class BlobGuardado(NamedTuple):
+    sha256: str
+    tamano: int
+    tipo: str
+
+
+class BlobListado(NamedTuple):
+    sha256: str
+    tamano: int
+    fecha_modificacion: float
+
+
+_sha256_valido = re.compile(r'^[0-9a-f]{64}$')
+
+
+class AlmacenBlobs(ABC):
+    """
+    Almacén de archivos direccionado por contenido: la clave de cada blob es su sha256,
+    así que guardar dos veces el mismo archivo no lo duplica
+    """
+
+    @abstractmethod
+    def guardar_stream(self, bloques: Iterable[bytes], tipo: str) -> BlobGuardado:
+        ...
+
+    def guardar(self, contenido: bytes, tipo: str) -> BlobGuardado:
+        return self.guardar_stream([contenido], tipo)
+
+    @abstractmethod
+    def abrir(self, sha256: str) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def existe(self, sha256: str) -> bool:
+        ...
+
+    @abstractmethod
+    def eliminar(self, sha256: str, modificado_antes_de: float | None = None) -> bool:
+        """
+        Con modificado_antes_de no se borra el blob si su fecha de modificación es posterior:
+        un upload con el mismo contenido lo volvió a publicar
+        """
+        ...
+
+    @abstractmethod
+    def listar(self) -> Iterator[BlobListado]:
+        ...
+
+    @abstractmethod
+    def limpiar_temporales(self, antiguedad_segundos: float) -> int:
+        ...
+
+    def leer(self, sha256: str) -> bytes:
+        with self.abrir(sha256) as archivo:
+            return archivo.read()
+
+    def iterar(self, sha256: str, tamano_bloque: int | None = None) -> Iterator[bytes]:
+        tamano_bloque = tamano_bloque or ConfiguracionAlmacenamiento.TAMANO_BLOQUE
+
+        with self.abrir(sha256) as archivo:
+            while bloque := archivo.read(tamano_bloque):
+                yield bloque
+
+    def iterar_rango(self, sha256: str, inicio: int, fin: int, tamano_bloque: int | None = None) -> Iterator[bytes]:
+        """
+        Bytes inicio..fin (inclusive) del blob, leídos con seek sin cargar el resto del archivo
+        """
+        tamano_bloque = tamano_bloque or ConfiguracionAlmacenamiento.TAMANO_BLOQUE
+        pendientes = fin - inicio + 1
+
+        with self.abrir(sha256) as archivo:
+            archivo.seek(inicio)
+
+            while pendientes > 0 and (bloque := archivo.read(min(tamano_bloque, pendientes))):
+                pendientes -= len(bloque)
+                yield bloque
+
+
+class AlmacenBlobsFilesystem(AlmacenBlobs):
+    """
+    Blobs en el sistema de archivos, repartidos en <directorio>/ab/cd/<sha256>.
+    La escritura va a un temporal en el mismo disco y se publica con os.replace (atómico).
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self.directorio_temporal = os.path.join(directorio, 'tmp')
+
+    def ruta(self, sha256: str) -> str:
+        if not _sha256_valido.match(sha256):
+            raise ValueError(f"Hash de blob inválido: {sha256}")
+
+        return os.path.join(self.directorio, sha256[:2], sha256[2:4], sha256)
+
+    def _publicar(self, ruta_temporal: str, sha256: str):
+        ruta = self.ruta(sha256)
+
+        if os.path.exists(ruta):
+            # Mismo contenido ya guardado; se renueva la fecha para que limpiar_blobs respete
+            # el período de gracia mientras se confirma la fila que lo vuelve a referenciar
+            os.unlink(ruta_temporal)
+            os.utime(ruta)
+            return
+
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        os.replace(ruta_temporal, ruta)
+
+        # Persistir también la entrada del directorio
+        descriptor = os.open(os.path.dirname(ruta), os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def guardar_stream(self, bloques: Iterable[bytes], tipo: str) -> BlobGuardado:
+        """
+        Escribe los bloques a medida que llegan calculando el sha256 al vuelo; si el iterador
+        lanza una excepción (archivo rechazado) el temporal se borra y no se publica nada
+        """
+        hash_contenido = hashlib.sha256()
+        tamano = 0
+
+        os.makedirs(self.directorio_temporal, exist_ok=True)
+        descriptor, ruta_temporal = tempfile.mkstemp(dir=self.directorio_temporal)
+
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                for bloque in bloques:
+                    hash_contenido.update(bloque)
+                    tamano += len(bloque)
+                    archivo.write(bloque)
+
+                archivo.flush()
+                os.fsync(archivo.fileno())
+
+            sha256 = hash_contenido.hexdigest()
+            self._publicar(ruta_temporal, sha256)
+        except BaseException:
+            if os.path.exists(ruta_temporal):
+                os.unlink(ruta_temporal)
+            raise
+
+        return BlobGuardado(sha256, tamano, tipo)
+
+    def abrir(self, sha256: str) -> BinaryIO:
+        return open(self.ruta(sha256), 'rb')
+
+    def existe(self, sha256: str) -> bool:
+        return os.path.exists(self.ruta(sha256))
+
+    def eliminar(self, sha256: str, modificado_antes_de: float | None = None) -> bool:
+        ruta = self.ruta(sha256)
+
+        try:
+            # Se vuelve a leer la fecha justo antes de borrar: _publicar la renueva al reutilizar el blob
+            if modificado_antes_de is not None and os.stat(ruta).st_mtime >= modificado_antes_de:
+                return False
+
+            os.unlink(ruta)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def listar(self) -> Iterator[BlobListado]:
+        for directorio, _, archivos in os.walk(self.directorio):
+            if directorio.startswith(self.directorio_temporal):
+                continue
+
+            for nombre in archivos:
+                if not _sha256_valido.match(nombre):
+                    continue
+
+                estado = os.stat(os.path.join(directorio, nombre))
+                yield BlobListado(nombre, estado.st_size, estado.st_mtime)
+
+    def limpiar_temporales(self, antiguedad_segundos: float) -> int:
+        """
+        Borra temporales de escrituras interrumpidas (proceso terminado a mitad de un upload)
+        """
+        if not os.path.isdir(self.directorio_temporal):
+            return 0
+
+        liberados = 0
+        limite = time.time() - antiguedad_segundos
+
+        for nombre in os.listdir(self.directorio_temporal):
+            ruta = os.path.join(self.directorio_temporal, nombre)
+            estado = os.stat(ruta)
+
+            if estado.st_mtime < limite:
+                os.unlink(ruta)
+                liberados += estado.st_size
+
+        return liberados
+
+
+def _crear_almacen() -> AlmacenBlobs:
+    if ConfiguracionAlmacenamiento.BACKEND != BackendAlmacenamiento.FILESYSTEM:
+        logging.warning(f"Backend de blobs desconocido {ConfiguracionAlmacenamiento.BACKEND}, se usa filesystem")
+
+    return AlmacenBlobsFilesystem(ConfiguracionAlmacenamiento.DIRECTORIO)
+
+
+almacen_blobs = _crear_almacen()
+
+
+def etag_archivo(archivo: dict, identificador: str) -> str | None:
+    """
+    El sha256 identifica el contenido exacto: sirve como validador fuerte. Las filas sin migrar no lo
+    tienen; su bytea no se vuelve a escribir (los uploads nuevos van al almacén y la migración le pone
+    sha256), así que fila + fecha de modificación + tamaño también identifican ese contenido
+    """
+    if archivo.get('contentSha256'):
+        return f'"{archivo["contentSha256"]}"'
+
+    fecha = archivo.get('fechaModificacion')
+    if fecha is None:
+        return None
+
+    huella = hashlib.sha256(f"{identificador}:{fecha.isoformat()}:{archivo.get('contentTamano')}".encode())
+
+    return f'"bytea-{huella.hexdigest()[:32]}"'
+
+
+def archivo_disponible(archivo: dict | None) -> bool:
+    return bool(archivo) and any(
+        archivo.get(columna) is not None for columna in ('contentSha256', 'contentTamano', 'content')
+    )
+
+
+def _bloques_upload(upload: UploadFile, tamano_maximo: int, detalle_tamano: str) -> Iterator[bytes]:
+    leidos = 0
+    primero = True
+
+    while bloque := upload.file.read(ConfiguracionAlmacenamiento.TAMANO_BLOQUE):
+        if primero:
+            primero = False
+            if not bloque.startswith(FIRMA_PDF):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="El archivo no es un PDF válido"
+                )
+
+        leidos += len(bloque)
+        if leidos > tamano_maximo:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detalle_tamano)
+
+        yield bloque
+
+    if primero:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El archivo está vacío")
+
+
+def guardar_upload_pdf(upload: UploadFile, tamano_maximo: int, detalle_tamano: str) -> BlobGuardado:
+    """
+    Pasa el upload al almacén por bloques: memoria O(bloque), tamaño verificado a medida que se lee,
+    firma %PDF en el primer bloque y sha256 calculado al vuelo
+    """
+    # Starlette ya conoce el tamaño de la parte: un archivo demasiado grande se rechaza sin leerlo
+    if upload.size is not None and upload.size > tamano_maximo:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detalle_tamano)
+
+    upload.file.seek(0)
+
+    return almacen_blobs.guardar_stream(_bloques_upload(upload, tamano_maximo, detalle_tamano), TipoContenido.PDF)
@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class ConfiguracionCacheAutorizacion:
+    MAXIMO = int(os.getenv('AUTH_CACHE_MAXIMO', '10000'))
+    TTL_SEGUNDOS = float(os.getenv('AUTH_CACHE_TTL_SEGUNDOS', '60'))
+
+
+class ConfiguracionCacheTokens:
+    MAXIMO = int(os.getenv('AUTH_TOKEN_CACHE_MAXIMO', '10000'))
+    TTL_SEGUNDOS = float(os.getenv('AUTH_TOKEN_CACHE_TTL_SEGUNDOS', '300'))
+
+
+class ConfiguracionCacheLibros:
+    # Por worker: cada proceso de uvicorn tiene su propia cache
+    MAXIMO_BYTES = int(float(os.getenv('LIBRO_CACHE_MAXIMO_MB', '128')) * 1024 * 1024)
+    MAXIMO_BYTES_ENTRADA = int(float(os.getenv('LIBRO_CACHE_MAXIMO_ENTRADA_MB', '20')) * 1024 * 1024)
+    # Una descarga que llena la cache y no termina en este tiempo (cliente lento o colgado) deja de bloquear la clave
+    LLENADO_MAXIMO_SEGUNDOS = float(os.getenv('LIBRO_CACHE_LLENADO_MAXIMO_SEGUNDOS', '300'))
+
+
+class CacheTTL:
+    """
+    Cache LRU en memoria con expiración por entrada, segura entre los hilos del threadpool
+    """
+
+    def __init__(self, maximo: int, ttl_segundos: float):
+        self.maximo = maximo
+        self.ttl_segundos = ttl_segundos
+        self._entradas: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave: Hashable) -> Any | None:
+        ahora = time.monotonic()
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+
+            if entrada is None:
+                self.fallos += 1
+                return None
+
+            valor, expira = entrada
+
+            if expira <= ahora:
+                del self._entradas[clave]
+                self.expirados += 1
+                self.fallos += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+
+            return valor
+
+    def guardar(self, clave: Hashable, valor: Any, ttl_segundos: float | None = None):
+        if ttl_segundos is None or ttl_segundos > self.ttl_segundos:
+            ttl_segundos = self.ttl_segundos
+
+        if ttl_segundos <= 0:
+            return
+
+        expira = time.monotonic() + ttl_segundos
+
+        with self._lock:
+            self._entradas[clave] = (valor, expira)
+            self._entradas.move_to_end(clave)
+
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, clave: Hashable):
+        with self._lock:
+            if self._entradas.pop(clave, None) is not None:
+                self.invalidaciones += 1
+
+    def invalidar_si(self, predicado: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            claves = [clave for clave in self._entradas if predicado(clave)]
+
+            for clave in claves:
+                del self._entradas[clave]
+
+            self.invalidaciones += len(claves)
+
+        return len(claves)
+
+    def limpiar(self):
+        with self._lock:
+            self.invalidaciones += len(self._entradas)
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+
+            return {
+                'maximo': self.maximo,
+                'ttlSegundos': self.ttl_segundos,
+                'entradas': len(self._entradas),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expirados': self.expirados,
+                'desalojos': self.desalojos,
+                'invalidaciones': self.invalidaciones,
+                'tasaAciertos': round(self.aciertos / consultas, 4) if consultas else 0.0
+            }
+
+
+class _Llenado:
+    __slots__ = ('inicio', 'vigente')
+
+    def __init__(self, inicio: float):
+        self.inicio = inicio
+        self.vigente = True
+
+
+class CacheBytes:
+    """
+    Cache LRU de contenidos binarios limitada por la suma de bytes guardados, no por cantidad de entradas
+    """
+
+    def __init__(self, maximo_bytes: int, maximo_bytes_entrada: int, llenado_maximo_segundos: float = 300):
+        self.maximo_bytes = maximo_bytes
+        self.maximo_bytes_entrada = min(maximo_bytes_entrada, maximo_bytes)
+        self.llenado_maximo_segundos = llenado_maximo_segundos
+        self._entradas: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._bytes = 0
+        # clave -> llenado en curso; una sola descarga por clave copia su contenido a la cache
+        self._llenados: dict[Hashable, _Llenado] = {}
+        self._lock = threading.Lock()
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+        self.bytes_servidos = 0
+
+    def admite(self, tamano: int) -> bool:
+        return 0 < tamano <= self.maximo_bytes_entrada
+
+    def obtener(self, clave: Hashable) -> bytes | None:
+        with self._lock:
+            contenido = self._entradas.get(clave)
+
+            if contenido is None:
+                self.fallos += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            self.bytes_servidos += len(contenido)
+
+            return contenido
+
+    def guardar(self, clave: Hashable, contenido: bytes):
+        if not self.admite(len(contenido)):
+            return
+
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+
+            self._entradas[clave] = contenido
+            self._bytes += len(contenido)
+
+            while self._bytes > self.maximo_bytes:
+                _, desalojado = self._entradas.popitem(last=False)
+                self._bytes -= len(desalojado)
+                self.desalojos += 1
+
+    def iniciar_llenado(self, clave: Hashable) -> '_Llenado | None':
+        """
+        Reserva la clave para que una sola descarga guarde el contenido; None si ya está en la cache
+        o si otra descarga la está llenando
+        """
+        ahora = time.monotonic()
+
+        with self._lock:
+            if clave in self._entradas:
+                return None
+
+            en_curso = self._llenados.get(clave)
+            if en_curso is not None and ahora - en_curso.inicio < self.llenado_maximo_segundos:
+                return None
+
+            llenado = self._llenados[clave] = _Llenado(ahora)
+
+            return llenado
+
+    def terminar_llenado(self, clave: Hashable, llenado: '_Llenado', contenido: bytes | None):
+        """
+        Libera la clave y guarda el contenido, salvo que la descarga no haya terminado
+        o que la clave se haya invalidado mientras se leía
+        """
+        with self._lock:
+            if self._llenados.get(clave) is llenado:
+                del self._llenados[clave]
+
+        if contenido is not None and llenado.vigente:
+            self.guardar(clave, contenido)
+
+    def invalidar_si(self, predicado: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            claves = [clave for clave in self._entradas if predicado(clave)]
+
+            for clave in claves:
+                self._bytes -= len(self._entradas.pop(clave))
+
+            for clave, llenado in self._llenados.items():
+                if predicado(clave):
+                    llenado.vigente = False
+
+            self.invalidaciones += len(claves)
+
+        return len(claves)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+
+            return {
+                'maximoBytes': self.maximo_bytes,
+                'maximoBytesEntrada': self.maximo_bytes_entrada,
+                'bytes': self._bytes,
+                'entradas': len(self._entradas),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'invalidaciones': self.invalidaciones,
+                'bytesServidos': self.bytes_servidos,
+                'llenadosEnCurso': len(self._llenados),
+                'tasaAciertos': round(self.aciertos / consultas, 4) if consultas else 0.0
+            }
+
+
+# (usuario_id, rol_id) -> usuario activo con ese rol activo
+cache_autorizacion = CacheTTL(ConfiguracionCacheAutorizacion.MAXIMO, ConfiguracionCacheAutorizacion.TTL_SEGUNDOS)
+
+# sha256 del JWT -> payload ya verificado (firma y claims), hasta su exp como máximo
+cache_tokens = CacheTTL(ConfiguracionCacheTokens.MAXIMO, ConfiguracionCacheTokens.TTL_SEGUNDOS)
+
+
+def invalidar_autorizacion_usuario(usuario_id: int) -> int:
+    return cache_autorizacion.invalidar_si(lambda clave: clave[0] == usuario_id)
+
+
+def invalidar_autorizacion_rol(rol_id: int) -> int:
+    return cache_autorizacion.invalidar_si(lambda clave: clave[1] == rol_id)
+
+
+# (libro_id, sha256 del contenido o fecha de modificación si la fila no se migró) -> PDF completo
+cache_libros = CacheBytes(
+    ConfiguracionCacheLibros.MAXIMO_BYTES,
+    ConfiguracionCacheLibros.MAXIMO_BYTES_ENTRADA,
+    ConfiguracionCacheLibros.LLENADO_MAXIMO_SEGUNDOS
+)
+
+
+def invalidar_cache_libro(libro_id: int) -> int:
+    return cache_libros.invalidar_si(lambda clave: clave[0] == libro_id)
@@ -33,6 +33,13 @@ class EstadoDocumento:
 class SizeDocumento:
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB por documento
 
+class EstadoExportacion:
+    PENDIENTE = 'PENDIENTE'
+    EN_PROCESO = 'EN_PROCESO'
+    COMPLETADA = 'COMPLETADA'
+    ERROR = 'ERROR'
+    EXPIRADA = 'EXPIRADA'
+
 class EstadoEstudianteMateria:
     RETIRADA = 'RETIRADA'
     APROBADA = 'APROBADA'
@@ -58,4 +65,8 @@ class UnicdaPaginacion:
     PAGESIZE = 10
 
 class InstitucionExternaUnicda:
-    ITLA = 1
\ No newline at end of file
+    ITLA = 1
+
+class LimitePaginacion:
+    DEFECTO = 20
+    MAXIMO = 500
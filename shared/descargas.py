@@ -0,0 +1,282 @@
+import os
+import secrets
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Iterator
+
+from fastapi import HTTPException, Request, status
+from starlette.responses import Response, StreamingResponse
+
+
+class ConfiguracionDescargas:
+    # Más rangos que esto en un mismo Range se responde con el archivo completo
+    MAX_RANGOS = int(os.getenv('DESCARGA_MAX_RANGOS', '16'))
+
+
+# (inicio, fin) -> bytes de ese tramo, ambos inclusive
+LectorRango = Callable[[int, int], Iterator[bytes]]
+
+
+def parsear_range(encabezado: str | None, tamano: int) -> list[tuple[int, int]] | None:
+    """
+    Rangos pedidos en un encabezado Range (RFC 9110), recortados al tamaño y ordenados,
+    con los solapados o contiguos unidos. None si el encabezado no aplica o no es válido
+    (se responde el archivo completo); 416 si ningún rango cae dentro del archivo.
+    """
+    if not encabezado:
+        return None
+
+    unidad, _, especificacion = encabezado.partition('=')
+
+    if unidad.strip().lower() != 'bytes' or not especificacion.strip():
+        return None
+
+    rangos = []
+
+    for parte in especificacion.split(','):
+        parte = parte.strip()
+        inicio_texto, separador, fin_texto = parte.partition('-')
+
+        if not separador:
+            return None
+
+        inicio_texto, fin_texto = inicio_texto.strip(), fin_texto.strip()
+
+        if (inicio_texto and not inicio_texto.isdigit()) or (fin_texto and not fin_texto.isdigit()):
+            return None
+
+        if not inicio_texto:
+            # bytes=-500: los últimos 500 bytes
+            if not fin_texto:
+                return None
+
+            sufijo = int(fin_texto)
+            if sufijo > 0 and tamano > 0:
+                rangos.append((max(0, tamano - sufijo), tamano - 1))
+            continue
+
+        inicio = int(inicio_texto)
+
+        if fin_texto and int(fin_texto) < inicio:
+            return None
+
+        fin = int(fin_texto) if fin_texto else tamano - 1
+
+        if inicio < tamano:
+            rangos.append((inicio, min(fin, tamano - 1)))
+
+    if not rangos:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Rango no satisfacible",
+            headers={"Content-Range": f"bytes */{tamano}"}
+        )
+
+    rangos.sort()
+    unidos = [rangos[0]]
+
+    for inicio, fin in rangos[1:]:
+        inicio_anterior, fin_anterior = unidos[-1]
+
+        if inicio <= fin_anterior + 1:
+            unidos[-1] = (inicio_anterior, max(fin, fin_anterior))
+        else:
+            unidos.append((inicio, fin))
+
+    if len(unidos) > ConfiguracionDescargas.MAX_RANGOS:
+        return None
+
+    return unidos
+
+
+def fecha_http(fecha: datetime) -> str:
+    return format_datetime(fecha.astimezone(timezone.utc), usegmt=True)
+
+
+def _leer_fecha_http(valor: str) -> datetime | None:
+    try:
+        fecha = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+
+    return fecha if fecha.tzinfo is not None else None
+
+
+def _validadores(etag: str | None, ultima_modificacion: datetime | None) -> dict:
+    headers = {"Cache-Control": "private, no-cache"}
+
+    if etag is not None:
+        headers["ETag"] = etag
+
+    if ultima_modificacion is not None:
+        headers["Last-Modified"] = fecha_http(ultima_modificacion)
+
+    return headers
+
+
+def _etag_coincide(if_none_match: str, etag: str) -> bool:
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    if if_none_match.strip() == '*':
+        return True
+
+    etiquetas = [etiqueta.strip().removeprefix('W/') for etiqueta in if_none_match.split(',')]
+
+    return etag.removeprefix('W/') in etiquetas
+
+
+def respuesta_no_modificado(
+        request: Request,
+        etag: str | None,
+        ultima_modificacion: datetime | None
+) -> Response | None:
+    """
+    304 si la copia del cliente sigue vigente según If-None-Match (o If-Modified-Since si no
+    mandó el primero); None si hay que enviar el archivo
+    """
+    if_none_match = request.headers.get('if-none-match')
+
+    if if_none_match is not None:
+        vigente = etag is not None and _etag_coincide(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get('if-modified-since')
+        fecha_cliente = _leer_fecha_http(if_modified_since) if if_modified_since else None
+
+        vigente = (
+            fecha_cliente is not None
+            and ultima_modificacion is not None
+            and ultima_modificacion <= fecha_cliente
+        )
+
+    if not vigente:
+        return None
+
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_validadores(etag, ultima_modificacion))
+
+
+def _if_range_vigente(request: Request, etag: str | None, ultima_modificacion: datetime | None) -> bool:
+    """
+    If-Range solo deja pasar el Range si el validador coincide (comparación fuerte);
+    si no, el cliente tiene otra versión y se le manda el archivo completo
+    """
+    validador = request.headers.get('if-range')
+
+    if validador is None:
+        return True
+
+    validador = validador.strip()
+
+    if validador.startswith('W/'):
+        return False
+
+    if validador.startswith('"'):
+        return etag is not None and validador == etag
+
+    return ultima_modificacion is not None and validador == fecha_http(ultima_modificacion)
+
+
+def _partes_multirango(
+        rangos: list[tuple[int, int]],
+        tamano: int,
+        media_type: str,
+        separador: str
+) -> tuple[list[bytes], bytes, int]:
+    encabezados = [
+        (
+            f"--{separador}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {inicio}-{fin}/{tamano}\r\n\r\n"
+        ).encode()
+        for inicio, fin in rangos
+    ]
+    cierre = f"--{separador}--\r\n".encode()
+
+    longitud = sum(len(encabezado) + (fin - inicio + 1) + 2 for encabezado, (inicio, fin) in zip(encabezados, rangos))
+
+    return encabezados, cierre, longitud + len(cierre)
+
+
+def _iterar_multirango(
+        rangos: list[tuple[int, int]],
+        encabezados: list[bytes],
+        cierre: bytes,
+        leer_rango: LectorRango
+) -> Iterator[bytes]:
+    for encabezado, (inicio, fin) in zip(encabezados, rangos):
+        yield encabezado
+        yield from leer_rango(inicio, fin)
+        yield b'\r\n'
+
+    yield cierre
+
+
+def respuesta_descarga(
+        request: Request,
+        tamano: int,
+        leer_rango: LectorRango,
+        media_type: str,
+        filename: str,
+        etag: str | None = None,
+        ultima_modificacion: datetime | None = None
+) -> StreamingResponse:
+    """
+    Descarga con soporte de Range/If-Range: 200 con el archivo completo, 206 con un rango
+    o multipart/byteranges con varios. Solo se leen los tramos pedidos.
+    """
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Accept-Ranges": "bytes",
+        **_validadores(etag, ultima_modificacion)
+    }
+
+    rangos = None
+    if _if_range_vigente(request, etag, ultima_modificacion):
+        rangos = parsear_range(request.headers.get('range'), tamano)
+
+    if not rangos or rangos == [(0, tamano - 1)]:
+        headers["Content-Length"] = str(tamano)
+        contenido = leer_rango(0, tamano - 1) if tamano else iter([b''])
+
+        return StreamingResponse(contenido, media_type=media_type, headers=headers)
+
+    if len(rangos) == 1:
+        inicio, fin = rangos[0]
+        headers["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+        headers["Content-Length"] = str(fin - inicio + 1)
+
+        return StreamingResponse(
+            leer_rango(inicio, fin),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers
+        )
+
+    separador = secrets.token_hex(16)
+    encabezados, cierre, longitud = _partes_multirango(rangos, tamano, media_type, separador)
+    headers["Content-Length"] = str(longitud)
+
+    return StreamingResponse(
+        _iterar_multirango(rangos, encabezados, cierre, leer_rango),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={separador}",
+        headers=headers
+    )
+
+
+def leer_rango_bytes(contenido: bytes) -> LectorRango:
+    vista = memoryview(contenido)
+
+    return lambda inicio, fin: iter([bytes(vista[inicio:fin + 1])])
+
+
+def leer_rango_ruta(ruta: str, tamano_bloque: int = 64 * 1024) -> LectorRango:
+    def leer(inicio: int, fin: int) -> Iterator[bytes]:
+        pendientes = fin - inicio + 1
+
+        with open(ruta, 'rb') as archivo:
+            archivo.seek(inicio)
+
+            while pendientes > 0 and (bloque := archivo.read(min(tamano_bloque, pendientes))):
+                pendientes -= len(bloque)
+                yield bloque
+
+    return leer
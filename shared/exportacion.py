@@ -0,0 +1,275 @@
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException, status
+
+from database.connection import get_connection
+from database.exportacion import iniciar_exportacion_pg, actualizar_progreso_exportacion_pg, \
+    finalizar_exportacion_pg, expirar_exportaciones_pg, contar_documentos_exportacion_pg, \
+    obtener_documentos_exportacion_stream_pg, marcar_exportaciones_abandonadas_pg
+from shared.almacenamiento import almacen_blobs, archivo_disponible
+from shared.constante import EstadoExportacion
+from shared.streaming import EntradaZip, serializar_zip
+
+
+class ConfiguracionExportacion:
+    DIRECTORIO = os.getenv('EXPORTACION_DIRECTORIO', os.path.join(os.getcwd(), 'exportaciones'))
+    # Exportaciones que se arman a la vez en este proceso; el resto espera en cola
+    TRABAJADORES = int(os.getenv('EXPORTACION_TRABAJADORES', '2'))
+    MAX_EN_COLA = int(os.getenv('EXPORTACION_MAX_EN_COLA', '10'))
+    DURACION_HORAS = float(os.getenv('EXPORTACION_DURACION_HORAS', '24'))
+    INTERVALO_PROGRESO_SEGUNDOS = float(os.getenv('EXPORTACION_INTERVALO_PROGRESO', '2'))
+    REINTENTAR_SEGUNDOS = 60
+    # Sin avance durante este tiempo, una exportación pendiente o en proceso se da por perdida (reinicio del worker)
+    ABANDONADA_MINUTOS = float(os.getenv('EXPORTACION_ABANDONADA_MINUTOS', '60'))
+
+
+def entrada_zip_documento(archivo: dict, carpeta: str = '') -> EntradaZip | None:
+    """
+    Entrada del ZIP para una fila de estudiante_documento (blob o bytea sin migrar)
+    """
+    if not archivo_disponible(archivo):
+        return None
+
+    tipo_doc = archivo['tipoDocumento'].lower()
+    estado_doc = archivo['estado'].lower()
+    fecha_creacion = archivo['fechaCreacionTexto'].replace(':', '-').replace(' ', '_')
+    filename = f"{carpeta}{tipo_doc}_{estado_doc}_{fecha_creacion}.pdf"
+
+    if archivo['contentSha256']:
+        bloques = almacen_blobs.iterar(archivo['contentSha256'])
+    else:
+        bloques = [archivo['content']]
+
+    return EntradaZip(filename, archivo['contentTamano'], archivo['fechaCreacion'], bloques)
+
+
+def entradas_zip_documentos(archivos: Iterable[dict], agrupar_por_estudiante: bool = False) -> Iterator[EntradaZip]:
+    for archivo in archivos:
+        carpeta = ''
+
+        if agrupar_por_estudiante:
+            identificador = archivo['matricula'] or archivo['estudianteId']
+            carpeta = f"{identificador}_{archivo['apellidos']}_{archivo['nombres']}/".replace(' ', '_')
+
+        entrada = entrada_zip_documento(archivo, carpeta)
+
+        if entrada is not None:
+            yield entrada
+
+
+def porcentaje_exportacion(exportacion: dict) -> float:
+    if exportacion['estado'] == EstadoExportacion.COMPLETADA:
+        return 100.0
+
+    total = exportacion['totalDocumentos']
+
+    if not total:
+        return 0.0
+
+    return math.floor(exportacion['documentosProcesados'] * 1000 / total) / 10
+
+
+class GestorExportaciones:
+    """
+    Arma los ZIP de exportación en un pool de hilos acotado, fuera de los hilos de los requests.
+    El estado y el progreso quedan en exportacion_documento, así que cualquier worker puede responder
+    la consulta; el archivo queda en el directorio de exportaciones.
+    """
+
+    def __init__(self, directorio: str, trabajadores: int, max_en_cola: int):
+        self.directorio = directorio
+        self.trabajadores = trabajadores
+        self.max_en_cola = max_en_cola
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._reservadas = 0
+
+    def ruta(self, exportacion_id: int) -> str:
+        return os.path.join(self.directorio, f"exportacion_{exportacion_id}.zip")
+
+    def reservar(self, conexion):
+        """
+        Aparta un lugar en la cola; 503 si está llena (y el rollback del request descarta la exportación).
+        El lugar se devuelve si la transacción del request no llega a confirmarse.
+        """
+        with self._lock:
+            if self._reservadas >= self.trabajadores + self.max_en_cola:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Hay demasiadas exportaciones en curso, intente nuevamente más tarde",
+                    headers={"Retry-After": str(ConfiguracionExportacion.REINTENTAR_SEGUNDOS)}
+                )
+
+            self._reservadas += 1
+
+        conexion.al_revertir(self.liberar)
+
+    def liberar(self):
+        with self._lock:
+            self._reservadas -= 1
+
+    def programar(self, exportacion_id: int, estado_estudiante: str, fecha_desde: date | None,
+                  fecha_hasta: date | None):
+        """
+        Se llama después del commit que registró la exportación, con el lugar ya reservado
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.trabajadores, thread_name_prefix='exportacion')
+
+            executor = self._executor
+
+        try:
+            executor.submit(self._ejecutar, exportacion_id, estado_estudiante, fecha_desde, fecha_hasta)
+        except RuntimeError:
+            # El executor se cerró (apagado del worker): la exportación queda para recuperar_abandonadas
+            logging.warning(f"No se pudo programar la exportación {exportacion_id}, el worker se está cerrando")
+            self.liberar()
+
+    def _ejecutar(self, exportacion_id: int, estado_estudiante: str, fecha_desde: date | None,
+                  fecha_hasta: date | None):
+        # Conexión propia para el estado y el progreso; los documentos se leen con otra (cursor)
+        conexion = get_connection()
+        ruta = self.ruta(exportacion_id)
+        ruta_temporal = f"{ruta}.tmp"
+        procesados = 0
+
+        try:
+            self._expirar_vencidas(conexion)
+
+            total = contar_documentos_exportacion_pg(estado_estudiante, fecha_desde, fecha_hasta, conexion)
+            if not iniciar_exportacion_pg(exportacion_id, EstadoExportacion.EN_PROCESO, EstadoExportacion.PENDIENTE,
+                                          total, conexion):
+                logging.warning(f"La exportación {exportacion_id} ya no está pendiente, no se arma")
+                conexion.rollback()
+                return
+
+            conexion.commit()
+
+            archivos = obtener_documentos_exportacion_stream_pg(estado_estudiante, fecha_desde, fecha_hasta)
+            ultimo_reporte = time.monotonic()
+
+            def contar(entradas: Iterator[EntradaZip]) -> Iterator[EntradaZip]:
+                nonlocal procesados
+                for entrada in entradas:
+                    yield entrada
+                    procesados += 1
+
+            os.makedirs(self.directorio, exist_ok=True)
+
+            with open(ruta_temporal, 'wb') as destino:
+                for bloque in serializar_zip(contar(entradas_zip_documentos(archivos, agrupar_por_estudiante=True))):
+                    destino.write(bloque)
+
+                    if time.monotonic() - ultimo_reporte >= ConfiguracionExportacion.INTERVALO_PROGRESO_SEGUNDOS:
+                        ultimo_reporte = time.monotonic()
+                        actualizar_progreso_exportacion_pg(exportacion_id, procesados, conexion)
+                        conexion.commit()
+
+            os.replace(ruta_temporal, ruta)
+
+            finalizar_exportacion_pg(
+                exportacion_id,
+                EstadoExportacion.COMPLETADA,
+                procesados,
+                tamano=os.path.getsize(ruta),
+                duracion_horas=ConfiguracionExportacion.DURACION_HORAS,
+                conexion=conexion
+            )
+            conexion.commit()
+
+            logging.info(f"Exportación {exportacion_id} completada: {procesados} documentos")
+
+        except Exception as e:
+            logging.exception(f"Error al generar la exportación {exportacion_id}")
+            conexion.rollback()
+
+            if os.path.exists(ruta_temporal):
+                os.unlink(ruta_temporal)
+
+            try:
+                finalizar_exportacion_pg(
+                    exportacion_id,
+                    EstadoExportacion.ERROR,
+                    procesados,
+                    error=str(e)[:500],
+                    conexion=conexion
+                )
+                conexion.commit()
+            except Exception:
+                logging.exception(f"No se pudo registrar el error de la exportación {exportacion_id}")
+                conexion.rollback()
+
+        finally:
+            conexion.close()
+            self.liberar()
+
+    def _expirar_vencidas(self, conexion):
+        # Las pendientes pueden estar esperando en la cola de un worker vivo: solo se revisan al iniciar
+        self._marcar_abandonadas(conexion, [EstadoExportacion.EN_PROCESO])
+
+        for exportacion_id in expirar_exportaciones_pg(EstadoExportacion.COMPLETADA, EstadoExportacion.EXPIRADA,
+                                                       conexion):
+            try:
+                os.unlink(self.ruta(exportacion_id))
+            except FileNotFoundError:
+                pass
+
+        conexion.commit()
+
+    def _marcar_abandonadas(self, conexion, estados: list[str]):
+        for exportacion_id in marcar_exportaciones_abandonadas_pg(
+                estados,
+                EstadoExportacion.ERROR,
+                ConfiguracionExportacion.ABANDONADA_MINUTOS,
+                "La exportación se interrumpió, vuelva a solicitarla",
+                conexion
+        ):
+            logging.warning(f"Exportación {exportacion_id} sin avance, se marca con error")
+
+            try:
+                os.unlink(f"{self.ruta(exportacion_id)}.tmp")
+            except FileNotFoundError:
+                pass
+
+    def recuperar_abandonadas(self):
+        """
+        Al iniciar el worker: las exportaciones que otro proceso dejó a medias o en su cola (reinicio)
+        pasan a ERROR. Solo las que llevan ABANDONADA_MINUTOS sin avance, para no tocar las que arma
+        otro worker vivo; si alguna igual estaba en una cola, iniciar_exportacion_pg ya no la toma.
+        """
+        try:
+            conexion = get_connection()
+        except Exception as e:
+            logging.warning(f"No se pudieron revisar las exportaciones abandonadas: {e}")
+            return
+
+        try:
+            self._marcar_abandonadas(conexion, [EstadoExportacion.PENDIENTE, EstadoExportacion.EN_PROCESO])
+            conexion.commit()
+        except Exception:
+            logging.exception("No se pudieron revisar las exportaciones abandonadas")
+            conexion.rollback()
+        finally:
+            conexion.close()
+
+    def cerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+gestor_exportaciones = GestorExportaciones(
+    ConfiguracionExportacion.DIRECTORIO,
+    ConfiguracionExportacion.TRABAJADORES,
+    ConfiguracionExportacion.MAX_EN_COLA
+)
@@ -0,0 +1,210 @@
+import logging
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from database.connection import get_connection
+from database.limite_intentos import consumir_token_pg, eliminar_limites_vencidos_pg
+
+
+class ReglaLimite(NamedTuple):
+    nombre: str
+    capacidad: float
+    recarga_por_segundo: float
+
+
+class BackendLimite:
+    MEMORIA = 'memoria'
+    POSTGRES = 'postgres'
+
+
+def _regla(nombre: str, capacidad: str, periodo_segundos: str) -> ReglaLimite:
+    # capacidad intentos seguidos, recuperando capacidad intentos cada periodo_segundos
+    capacidad_regla = float(os.getenv(f'AUTH_LIMITE_{nombre.upper()}_CAPACIDAD', capacidad))
+    periodo = float(os.getenv(f'AUTH_LIMITE_{nombre.upper()}_PERIODO_SEGUNDOS', periodo_segundos))
+
+    return ReglaLimite(nombre, capacidad_regla, capacidad_regla / periodo)
+
+
+class ConfiguracionLimitador:
+    HABILITADO = os.getenv('AUTH_LIMITE_HABILITADO', 'true').lower() == 'true'
+    BACKEND = os.getenv('AUTH_LIMITE_BACKEND', BackendLimite.MEMORIA)
+    # Solo detrás de un proxy de confianza: toma la IP del cliente de X-Forwarded-For
+    CONFIAR_PROXY = os.getenv('AUTH_LIMITE_CONFIAR_PROXY', 'false').lower() == 'true'
+    MAX_CLAVES_MEMORIA = int(os.getenv('AUTH_LIMITE_MAX_CLAVES', '100000'))
+
+    LOGIN_IP = _regla('login_ip', '20', '60')
+    LOGIN_CORREO = _regla('login_correo', '5', '300')
+    REGISTRO_IP = _regla('registro_ip', '5', '600')
+    REGISTRO_CORREO = _regla('registro_correo', '3', '3600')
+
+
+class AlmacenLimites(ABC):
+    """
+    Almacén de los buckets. consumir devuelve 0 si se permitió el intento,
+    o los segundos que faltan para el próximo token.
+    """
+
+    @abstractmethod
+    def consumir(self, clave: str, regla: ReglaLimite) -> float:
+        ...
+
+
+class AlmacenLimitesMemoria(AlmacenLimites):
+    """
+    Buckets por proceso: con varios workers cada uno tiene los suyos (el límite efectivo se multiplica)
+    """
+
+    def __init__(self, max_claves: int):
+        self.max_claves = max_claves
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, clave: str, regla: ReglaLimite) -> float:
+        ahora = time.monotonic()
+
+        with self._lock:
+            tokens, ultima = self._buckets.get(clave, (regla.capacidad, ahora))
+            tokens = min(regla.capacidad, tokens + (ahora - ultima) * regla.recarga_por_segundo)
+
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+
+            self._buckets[clave] = (tokens, ahora)
+            self._buckets.move_to_end(clave)
+
+            # Las claves menos usadas se descartan (vuelven con el bucket lleno)
+            while len(self._buckets) > self.max_claves:
+                self._buckets.popitem(last=False)
+
+        return 0.0 if permitido else (1 - tokens) / regla.recarga_por_segundo
+
+
+class AlmacenLimitesPostgres(AlmacenLimites):
+    """
+    Buckets compartidos entre workers en la tabla unlogged limite_intentos
+    """
+
+    INTERVALO_LIMPIEZA_SEGUNDOS = 600
+
+    def __init__(self):
+        self._ultima_limpieza = time.monotonic()
+
+    def consumir(self, clave: str, regla: ReglaLimite) -> float:
+        # Conexión propia: el intento cuenta aunque el request termine en error y se revierta
+        conexion = get_connection()
+
+        try:
+            bucket = consumir_token_pg(clave, regla.capacidad, regla.recarga_por_segundo, conexion)
+            self._limpiar(conexion)
+            conexion.commit()
+        finally:
+            conexion.close()
+
+        if bucket['permitido']:
+            return 0.0
+
+        return (1 - bucket['tokens']) / regla.recarga_por_segundo
+
+    def _limpiar(self, conexion):
+        ahora = time.monotonic()
+
+        if ahora - self._ultima_limpieza < self.INTERVALO_LIMPIEZA_SEGUNDOS:
+            return
+
+        self._ultima_limpieza = ahora
+        # Un bucket sin uso durante el tiempo de recarga completa está lleno: la fila sobra
+        eliminar_limites_vencidos_pg(
+            max(r.capacidad / r.recarga_por_segundo for r in (
+                ConfiguracionLimitador.LOGIN_IP, ConfiguracionLimitador.LOGIN_CORREO,
+                ConfiguracionLimitador.REGISTRO_IP, ConfiguracionLimitador.REGISTRO_CORREO
+            )),
+            conexion
+        )
+
+
+def _crear_almacen() -> AlmacenLimites:
+    if ConfiguracionLimitador.BACKEND == BackendLimite.POSTGRES:
+        return AlmacenLimitesPostgres()
+
+    return AlmacenLimitesMemoria(ConfiguracionLimitador.MAX_CLAVES_MEMORIA)
+
+
+class LimitadorIntentos:
+
+    def __init__(self, almacen: AlmacenLimites):
+        self.almacen = almacen
+        self.rechazos = 0
+
+    def verificar(self, reglas: list[tuple[ReglaLimite, str]]):
+        """
+        Consume un intento de cada bucket (regla, valor); si alguno está vacío responde 429
+        """
+        if not ConfiguracionLimitador.HABILITADO:
+            return
+
+        for regla, valor in reglas:
+            try:
+                espera = self.almacen.consumir(f"{regla.nombre}:{valor}", regla)
+            except Exception as e:
+                # Si el almacén compartido no responde no se bloquea el login
+                logging.error(f"No se pudo consultar el limitador de intentos: {str(e)}")
+                return
+
+            if espera > 0:
+                self.rechazos += 1
+                logging.warning(f"Límite de intentos alcanzado ({regla.nombre})")
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiados intentos, intente nuevamente más tarde",
+                    headers={"Retry-After": str(max(1, math.ceil(espera)))}
+                )
+
+
+limitador_intentos = LimitadorIntentos(_crear_almacen())
+
+
+def ip_cliente(request: Request) -> str:
+    if ConfiguracionLimitador.CONFIAR_PROXY:
+        reenviado = request.headers.get('x-forwarded-for')
+        if reenviado:
+            return reenviado.split(',')[0].strip()
+
+    return request.client.host if request.client else 'desconocido'
+
+
+async def _correo_solicitud(request: Request) -> str | None:
+    # FastAPI ya leyó el JSON del cuerpo antes de resolver las dependencias; request.json() lo devuelve cacheado
+    try:
+        cuerpo = await request.json()
+    except ValueError:
+        return None
+
+    correo = cuerpo.get('correo') if isinstance(cuerpo, dict) else None
+
+    return correo.lower() if isinstance(correo, str) else None
+
+
+def limitar_intentos(regla_ip: ReglaLimite, regla_correo: ReglaLimite):
+    """
+    Dependencia que aplica el límite por IP y por correo. Se declara antes de get_conexion
+    para que los intentos rechazados no ocupen una conexión del pool.
+    """
+    async def dependency(request: Request):
+        reglas = [(regla_ip, ip_cliente(request))]
+
+        correo = await _correo_solicitud(request)
+        if correo is not None:
+            reglas.append((regla_correo, correo))
+
+        await run_in_threadpool(limitador_intentos.verificar, reglas)
+
+    return dependency
@@ -0,0 +1,70 @@
+import types
+import typing
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Type, TypeVar
+
+from pydantic import BaseModel
+
+Modelo = TypeVar('Modelo', bound=BaseModel)
+
+_object_setattr = object.__setattr__
+
+
+def _submodelo(anotacion) -> Type[BaseModel] | None:
+    """
+    Devuelve el modelo anidado de una anotación (X, X | None u Optional[X]) si existe
+    """
+    if isinstance(anotacion, type) and issubclass(anotacion, BaseModel):
+        return anotacion
+
+    if typing.get_origin(anotacion) in (typing.Union, types.UnionType):
+        for argumento in typing.get_args(anotacion):
+            if isinstance(argumento, type) and issubclass(argumento, BaseModel):
+                return argumento
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def _plan_modelo(modelo: Type[BaseModel]) -> tuple:
+    """
+    Precalcula por modelo los campos, sus valores por defecto y los modelos anidados
+    """
+    return tuple(
+        (nombre, campo, campo.is_required(), _submodelo(campo.annotation))
+        for nombre, campo in modelo.model_fields.items()
+    )
+
+
+def construir_modelo(modelo: Type[Modelo], datos: Dict[str, Any]) -> Modelo:
+    """
+    Construye el modelo sin volver a validar datos que provienen de nuestro propio esquema.
+    Si falta un campo requerido se usa el constructor normal para obtener el error de validación.
+    """
+    valores = {}
+
+    for nombre, campo, requerido, submodelo in _plan_modelo(modelo):
+        if nombre in datos:
+            valor = datos[nombre]
+        elif requerido:
+            return modelo(**datos)
+        else:
+            valor = campo.get_default(call_default_factory=True)
+
+        if submodelo is not None and type(valor) is dict:
+            valor = construir_modelo(submodelo, valor)
+
+        valores[nombre] = valor
+
+    instancia = modelo.__new__(modelo)
+    _object_setattr(instancia, '__dict__', valores)
+    # Igual que el constructor: los campos que tomaron su valor por defecto no cuentan como asignados
+    _object_setattr(instancia, '__pydantic_fields_set__', {nombre for nombre in valores if nombre in datos})
+    _object_setattr(instancia, '__pydantic_extra__', None)
+    _object_setattr(instancia, '__pydantic_private__', None)
+
+    return instancia
+
+
+def construir_modelos(modelo: Type[Modelo], filas: Iterable[Dict[str, Any]] | None) -> List[Modelo]:
+    return [construir_modelo(modelo, fila) for fila in filas or []]
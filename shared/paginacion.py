@@ -0,0 +1,313 @@
+import base64
+import binascii
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple
+
+import asyncpg
+import psycopg2
+from fastapi import HTTPException, status
+
+from models.paginacion import Paginacion
+from shared.utils import execute_query, execute_query_async
+
+
+class ModoTotal:
+    EXACTO = 'exacto'  # count(*) over () en la misma sentencia de la página
+    CACHE = 'cache'  # último total exacto mientras no supere la antigüedad configurada
+    ESTIMADO = 'estimado'  # reltuples del planificador (pg_class), sin contar filas
+
+
+class ConfiguracionPaginacion:
+    MODO_TOTAL = os.getenv('DB_PAGINACION_MODO_TOTAL', ModoTotal.EXACTO)
+    TOTAL_CACHE_SEGUNDOS = float(os.getenv('DB_PAGINACION_TOTAL_CACHE_SEGUNDOS', '60'))
+
+
+class ColumnaOrden(NamedTuple):
+    expresion: str  # columna en el SQL (e.fecha_creacion)
+    clave: str  # clave de la fila ya convertida a camelCase (fechaCreacion)
+    tipo: type = int
+    descendente: bool = False
+
+
+class OrdenKeyset:
+    """
+    Orden total de un listado para paginar por keyset (seek) en vez de LIMIT/OFFSET.
+    La última columna debe desempatar (normalmente la llave primaria).
+    """
+
+    def __init__(self, nombre: str, columnas: List[ColumnaOrden]):
+        self.nombre = nombre
+        self.columnas = columnas
+
+    def order_by(self) -> str:
+        return " order by " + ", ".join(
+            f"{columna.expresion} desc" if columna.descendente else columna.expresion
+            for columna in self.columnas
+        )
+
+    def condicion(self, valores: list) -> tuple[str, list]:
+        """
+        Condición para continuar después de la fila con esos valores.
+        Las columnas consecutivas con la misma dirección se comparan como fila ((a, b) < (x, y))
+        para que postgres pueda usar el índice; solo se expande con OR donde cambia la dirección.
+        """
+        grupos = []
+        for columna, valor in zip(self.columnas, valores):
+            if grupos and grupos[-1][0] == columna.descendente:
+                grupos[-1][1].append((columna.expresion, valor))
+            else:
+                grupos.append((columna.descendente, [(columna.expresion, valor)]))
+
+        alternativas = []
+        values = []
+        anteriores = []
+
+        for descendente, columnas in grupos:
+            operador = "<" if descendente else ">"
+            expresiones = ", ".join(expresion for expresion, _ in columnas)
+            marcadores = ", ".join(["%s"] * len(columnas))
+
+            igualdades = [f"{expresion} = %s" for expresion, _ in anteriores]
+            igualdades.append(f"({expresiones}) {operador} ({marcadores})")
+            alternativas.append("(" + " and ".join(igualdades) + ")")
+
+            values.extend(valor for _, valor in anteriores)
+            values.extend(valor for _, valor in columnas)
+
+            anteriores.extend(columnas)
+
+        return "(" + " or ".join(alternativas) + ")", values
+
+    def codificar(self, fila: Dict[str, Any]) -> str:
+        valores = []
+        for columna in self.columnas:
+            valor = fila[columna.clave]
+            valores.append(valor.isoformat() if isinstance(valor, datetime) else valor)
+
+        contenido = json.dumps({"k": self.nombre, "v": valores}, separators=(',', ':'))
+
+        return base64.urlsafe_b64encode(contenido.encode()).decode().rstrip('=')
+
+    def decodificar(self, cursor: str) -> list:
+        try:
+            contenido = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+            if contenido.get("k") != self.nombre or len(contenido.get("v", [])) != len(self.columnas):
+                raise ValueError(cursor)
+
+            return [
+                datetime.fromisoformat(valor) if columna.tipo is datetime else columna.tipo(valor)
+                for columna, valor in zip(self.columnas, contenido["v"])
+            ]
+
+        except (ValueError, TypeError, AttributeError, binascii.Error):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor de paginación inválido"
+            )
+
+
+def agregar_condicion(where_clause: str, condicion: str) -> str:
+    return where_clause + (" and " if where_clause else " where ") + condicion
+
+
+def condicion_cursor(orden: OrdenKeyset, cursor: str | None) -> tuple[str | None, list]:
+    """
+    Condición para continuar la página desde el cursor recibido (None en la primera página)
+    """
+    if cursor is None:
+        return None, []
+
+    return orden.condicion(orden.decodificar(cursor))
+
+
+def limite_keyset(orden: OrdenKeyset, limite: int) -> tuple[str, list]:
+    """
+    Orden y limite + 1 filas: la fila extra solo indica si existe una página siguiente
+    """
+    return orden.order_by() + " limit %s", [limite + 1]
+
+
+def armar_pagina(orden: OrdenKeyset, filas: List[Dict[str, Any]] | None, limite: int) -> tuple[list, str | None]:
+    filas = filas or []
+
+    if len(filas) <= limite:
+        return filas, None
+
+    filas = filas[:limite]
+
+    return filas, orden.codificar(filas[-1])
+
+
+class CacheTotales:
+    """
+    Totales de listados sin filtros por proceso, para no contar la tabla en cada página
+    """
+
+    def __init__(self):
+        self._totales: Dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str, antiguedad_maxima: float) -> int | None:
+        with self._lock:
+            registro = self._totales.get(clave)
+
+        if registro is None or time.monotonic() - registro[1] > antiguedad_maxima:
+            return None
+
+        return registro[0]
+
+    def guardar(self, clave: str, total: int):
+        with self._lock:
+            self._totales[clave] = (total, time.monotonic())
+
+    def invalidar(self, clave: str):
+        with self._lock:
+            self._totales.pop(clave, None)
+
+
+cache_totales = CacheTotales()
+
+
+class ConsultaPaginada:
+    """
+    Página y total en una sola sentencia: la consulta filtrada se envuelve y el total sale
+    de count(*) over () (o de pg_class / la cache de totales si el listado no tiene filtros).
+    El orden se expresa con los nombres de las columnas de salida de la consulta.
+    """
+
+    def __init__(
+            self,
+            sql: str,
+            values: list,
+            orden: str,
+            clave: str,
+            tabla: str,
+            filtrada: bool
+    ):
+        self.sql = sql
+        self.values = list(values)
+        self.orden = orden
+        self.clave = clave
+        self.tabla = tabla
+        self.filtrada = filtrada
+
+    def modo_efectivo(self, modo_total: str | None) -> str:
+        # Los totales aproximados solo tienen sentido para el listado completo
+        if self.filtrada:
+            return ModoTotal.EXACTO
+
+        return modo_total or ConfiguracionPaginacion.MODO_TOTAL
+
+    def sentencia(self, numero_pagina: int, limite: int, modo_total: str, total_cache: int | None) -> tuple[str, list]:
+        if total_cache is not None:
+            columna_total, values_total = "", []
+        elif modo_total == ModoTotal.ESTIMADO:
+            columna_total = (", (select case when reltuples < 0 then null else reltuples::bigint end"
+                             " from pg_class where oid = to_regclass(%s)) as total_paginacion")
+            values_total = [self.tabla]
+        else:
+            columna_total, values_total = ", count(*) over () as total_paginacion", []
+
+        sql = f"select filas.*{columna_total} from ({self.sql}) filas order by {self.orden} limit %s offset %s"
+
+        return sql, values_total + self.values + [limite, (numero_pagina - 1) * limite]
+
+    def sentencia_conteo(self) -> tuple[str, list]:
+        return f"select count(*) as total from ({self.sql}) filas", self.values
+
+
+def normalizar_pagina(numero_pagina: int, limite: int) -> tuple[int, int]:
+    return max(numero_pagina, 1), limite if limite >= 1 else 10
+
+
+def armar_paginacion(total: int, numero_pagina: int, limite: int) -> Paginacion:
+    return Paginacion(
+        total=total,
+        numeroPagina=numero_pagina,
+        limite=limite,
+        totalPaginas=math.ceil(total / limite)
+    )
+
+
+def _total_de_filas(filas: list, total_cache: int | None) -> int | None:
+    if total_cache is not None:
+        return total_cache
+
+    return filas[0]['totalPaginacion'] if filas else None
+
+
+def paginar_pg(
+        consulta: ConsultaPaginada,
+        numero_pagina: int,
+        limite: int,
+        modo_total: str | None = None,
+        conexion: psycopg2.extensions.connection | None = None
+) -> tuple[List[Dict[str, Any]], Paginacion]:
+    numero_pagina, limite = normalizar_pagina(numero_pagina, limite)
+    modo_total = consulta.modo_efectivo(modo_total)
+
+    total_cache = None
+    if modo_total == ModoTotal.CACHE:
+        total_cache = cache_totales.obtener(consulta.clave, ConfiguracionPaginacion.TOTAL_CACHE_SEGUNDOS)
+
+    sql, values = consulta.sentencia(numero_pagina, limite, modo_total, total_cache)
+    filas = execute_query(sql, values, conn=conexion, nombre_sentencia=f"pagina_{consulta.clave}") or []
+    total = _total_de_filas(filas, total_cache)
+
+    if total is None and (filas or numero_pagina > 1):
+        # Página fuera de rango o tabla sin estadísticas: se cuenta aparte (caso poco frecuente)
+        sql_conteo, values_conteo = consulta.sentencia_conteo()
+        total = execute_query(
+            sql_conteo, values_conteo, conn=conexion, nombre_sentencia=f"conteo_{consulta.clave}"
+        )[0]['total']
+
+        total_paginas = math.ceil(total / limite)
+        if not filas and 0 < total_paginas < numero_pagina:
+            return paginar_pg(consulta, total_paginas, limite, ModoTotal.EXACTO, conexion)
+
+    total = total or 0
+
+    if modo_total == ModoTotal.CACHE and total_cache is None:
+        cache_totales.guardar(consulta.clave, total)
+
+    return filas, armar_paginacion(total, numero_pagina, limite)
+
+
+async def paginar_async_pg(
+        consulta: ConsultaPaginada,
+        numero_pagina: int,
+        limite: int,
+        modo_total: str | None = None,
+        conexion: asyncpg.Connection | None = None
+) -> tuple[List[Dict[str, Any]], Paginacion]:
+    numero_pagina, limite = normalizar_pagina(numero_pagina, limite)
+    modo_total = consulta.modo_efectivo(modo_total)
+
+    total_cache = None
+    if modo_total == ModoTotal.CACHE:
+        total_cache = cache_totales.obtener(consulta.clave, ConfiguracionPaginacion.TOTAL_CACHE_SEGUNDOS)
+
+    sql, values = consulta.sentencia(numero_pagina, limite, modo_total, total_cache)
+    filas = await execute_query_async(sql, values, conn=conexion) or []
+    total = _total_de_filas(filas, total_cache)
+
+    if total is None and (filas or numero_pagina > 1):
+        sql_conteo, values_conteo = consulta.sentencia_conteo()
+        total = (await execute_query_async(sql_conteo, values_conteo, conn=conexion))[0]['total']
+
+        total_paginas = math.ceil(total / limite)
+        if not filas and 0 < total_paginas < numero_pagina:
+            return await paginar_async_pg(consulta, total_paginas, limite, ModoTotal.EXACTO, conexion)
+
+    total = total or 0
+
+    if modo_total == ModoTotal.CACHE and total_cache is None:
+        cache_totales.guardar(consulta.clave, total)
+
+    return filas, armar_paginacion(total, numero_pagina, limite)
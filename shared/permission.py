@@ -1,44 +1,147 @@
+import hashlib
+import time
+
+import asyncpg
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from psycopg2.extensions import connection
 
-from database.usuario import buscar_rol_usuario_pg
+from database.connection import get_conexion, get_conexion_async
+from database.usuario import buscar_rol_usuario_pg, buscar_rol_usuario_async_pg
+from shared.cache import cache_autorizacion, cache_tokens
+from shared.constante import Estado
+from shared.revocacion import registro_revocaciones
 
 SECRET_KEY = "supersecreto123"  # Mismo que el usado al firmar el token
 ALGORITHM = "HS256"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+
+def _credentials_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _permissions_exception():
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="No tiene los permisos necesarios",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _decodificar_token(token: str) -> dict:
+    # La firma y los claims se verifican una vez por token y proceso; la revocación se revisa siempre
+    digest = hashlib.sha256(token.encode()).digest()
+
+    payload = cache_tokens.obtener(digest)
+    if payload is not None:
+        return payload
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+        if payload.get("sub") is None:
+            raise _credentials_exception()
+
+        payload["sub"] = int(payload["sub"])
+
+    except (JWTError, ValueError):
+        raise _credentials_exception()
+
+    exp = payload.get("exp")
+    cache_tokens.guardar(digest, payload, exp - time.time() if isinstance(exp, (int, float)) else None)
+
+    return payload
+
+
+def claims_usuario(usuario: dict) -> dict:
+    # Rol, estado y versión viajan en el token para autorizar sin consultar la base de datos
+    return {
+        "sub": str(usuario['usuarioId']),
+        "rol": usuario['rolId'],
+        "estado": usuario['estado'],
+        "ver": usuario['tokenVersion'],
+        "nombre": usuario['nombre'],
+        "correo": usuario['correo']
+    }
+
+
+def _usuario_desde_claims(payload: dict, rol_id: int) -> dict | None:
+    """
+    Autoriza con los claims del token y el registro de revocaciones en memoria.
+    Devuelve None si el token no trae claims de rol (emitido antes) o el registro aún no se cargó.
+    """
+    if "rol" not in payload or "ver" not in payload or not registro_revocaciones.cargado:
+        return None
+
+    usuario_id = payload["sub"]
+
+    if not registro_revocaciones.version_vigente(usuario_id, payload["ver"]):
+        raise _credentials_exception()
+
+    if payload["rol"] != rol_id or payload.get("estado") != Estado.ACTIVO \
+            or not registro_revocaciones.rol_activo(rol_id):
+        raise _permissions_exception()
+
+    return {
+        "usuarioId": usuario_id,
+        "nombre": payload.get("nombre"),
+        "correo": payload.get("correo"),
+        "estado": payload["estado"]
+    }
+
+
 def get_current_user(rol_id: int):
-    def dependency(token: str = Depends(oauth2_scheme)):
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido o expirado",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-        permissions_exception = HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tiene los permisos necesarios",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            usuario_id = payload.get("sub")
-
-            if usuario_id is None:
-                raise credentials_exception
+    def dependency(token: str = Depends(oauth2_scheme), conexion: connection = Depends(get_conexion)):
+        payload = _decodificar_token(token)
 
+        usuario = _usuario_desde_claims(payload, rol_id)
+        if usuario is not None:
+            return usuario
+
+        usuario_id = payload["sub"]
+        usuario_rol = cache_autorizacion.obtener((usuario_id, rol_id))
+
+        if usuario_rol is None:
             # Validar que el usuario tenga el rol
-            usuario_rol = buscar_rol_usuario_pg(usuario_id, rol_id)
+            usuario_rol = buscar_rol_usuario_pg(usuario_id, rol_id, conexion)
+
+            if not usuario_rol:
+                raise _permissions_exception()
+
+            cache_autorizacion.guardar((usuario_id, rol_id), usuario_rol)
+
+        return dict(usuario_rol)
+
+    return dependency  # <-- retornas la función interior
+
+
+def get_current_user_async(rol_id: int):
+    async def dependency(token: str = Depends(oauth2_scheme),
+                         conexion: asyncpg.Connection = Depends(get_conexion_async)):
+        payload = _decodificar_token(token)
+
+        usuario = _usuario_desde_claims(payload, rol_id)
+        if usuario is not None:
+            return usuario
+
+        usuario_id = payload["sub"]
+        usuario_rol = cache_autorizacion.obtener((usuario_id, rol_id))
+
+        if usuario_rol is None:
+            usuario_rol = await buscar_rol_usuario_async_pg(usuario_id, rol_id, conexion)
 
             if not usuario_rol:
-                raise permissions_exception
+                raise _permissions_exception()
 
-            return usuario_rol
+            cache_autorizacion.guardar((usuario_id, rol_id), usuario_rol)
 
-        except JWTError:
-            raise credentials_exception
+        return dict(usuario_rol)
 
-    return dependency  # <-- retornas la función interior
\ No newline at end of file
+    return dependency
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+
+from shared.utils import hash_password, verify_password
+
+
+class ConfiguracionPoolClaves:
+    PROCESOS = int(os.getenv('AUTH_HASH_PROCESOS', '2'))
+    # Operaciones esperando un proceso libre antes de rechazar con 503
+    MAX_EN_COLA = int(os.getenv('AUTH_HASH_MAX_EN_COLA', '16'))
+    REINTENTAR_SEGUNDOS = int(os.getenv('AUTH_HASH_REINTENTAR_SEGUNDOS', '1'))
+
+
+class PoolClaves:
+    """
+    Procesos dedicados a bcrypt: el hash y la verificación de claves no ocupan el threadpool
+    ni compiten por CPU con el resto de la API, y la cola tiene un límite fijo
+    """
+
+    def __init__(self, procesos: int, max_en_cola: int):
+        self.procesos = procesos
+        self.max_en_cola = max_en_cola
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pendientes = 0
+
+        self.completadas = 0
+        self.rechazos = 0
+
+    def _obtener_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: los procesos no heredan hilos ni conexiones del proceso de la API
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.procesos,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+
+        return self._executor
+
+    def _reservar(self):
+        with self._lock:
+            if self._pendientes >= self.procesos + self.max_en_cola:
+                self.rechazos += 1
+                logging.warning("Pool de claves saturado, se rechaza la operación")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="El servicio de autenticación está ocupado, intente nuevamente",
+                    headers={"Retry-After": str(ConfiguracionPoolClaves.REINTENTAR_SEGUNDOS)}
+                )
+
+            self._pendientes += 1
+
+    def _liberar(self):
+        with self._lock:
+            self._pendientes -= 1
+            self.completadas += 1
+
+    async def _ejecutar(self, funcion, *args):
+        self._reservar()
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._obtener_executor(), funcion, *args)
+        except BrokenProcessPool:
+            # Un proceso murió: se descarta el executor para que el próximo pedido cree uno nuevo
+            logging.exception("El pool de claves quedó inutilizable, se recreará")
+            self.cerrar()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="El servicio de autenticación está ocupado, intente nuevamente",
+                headers={"Retry-After": str(ConfiguracionPoolClaves.REINTENTAR_SEGUNDOS)}
+            )
+        finally:
+            self._liberar()
+
+    async def hashear(self, clave: str) -> str:
+        return await self._ejecutar(hash_password, clave)
+
+    async def verificar(self, clave: str, clave_hash: str) -> bool:
+        return await self._ejecutar(verify_password, clave, clave_hash)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                'procesos': self.procesos,
+                'maxEnCola': self.max_en_cola,
+                'pendientes': self._pendientes,
+                'completadas': self.completadas,
+                'rechazos': self.rechazos
+            }
+
+    def cerrar(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+pool_claves = PoolClaves(ConfiguracionPoolClaves.PROCESOS, ConfiguracionPoolClaves.MAX_EN_COLA)
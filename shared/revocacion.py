@@ -0,0 +1,100 @@
+import logging
+import os
+import threading
+import time
+
+from database.usuario import obtener_versiones_token_pg, obtener_roles_inactivos_pg
+
+
+class ConfiguracionRevocacion:
+    INTERVALO_SEGUNDOS = float(os.getenv('AUTH_REVOCACION_INTERVALO_SEGUNDOS', '15'))
+
+
+class RegistroRevocaciones:
+    """
+    Copia en memoria de usuario_token_version y de los roles inactivos, refrescada en segundo plano,
+    para autorizar con los claims del token sin consultar la base de datos
+    """
+
+    def __init__(self, intervalo_segundos: float):
+        self.intervalo_segundos = intervalo_segundos
+        self._versiones: dict[int, int] = {}
+        self._roles_inactivos: set[int] = set()
+        # rol_id -> generación del último registrar_estado_rol, para que un refresco no lo pise
+        self._cambios_rol: dict[int, int] = {}
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: threading.Thread | None = None
+        self.cargado = False
+        self.ultima_actualizacion: float | None = None
+
+    def refrescar(self):
+        """
+        Combina la lectura con lo registrado en memoria mientras se consultaba: las versiones solo suben,
+        y los roles que cambiaron después de empezar la lectura conservan su estado en memoria
+        """
+        with self._lock:
+            generacion_inicio = self._generacion
+
+        versiones = obtener_versiones_token_pg()
+        roles_inactivos = obtener_roles_inactivos_pg()
+
+        with self._lock:
+            for usuario_id, version in versiones.items():
+                if version > self._versiones.get(usuario_id, 0):
+                    self._versiones[usuario_id] = version
+
+            recientes = {rol_id for rol_id, generacion in self._cambios_rol.items() if generacion > generacion_inicio}
+            self._roles_inactivos = (roles_inactivos - recientes) | (self._roles_inactivos & recientes)
+            # Los cambios anteriores a la lectura ya están en lo que devolvió la base
+            self._cambios_rol = {rol_id: self._cambios_rol[rol_id] for rol_id in recientes}
+
+            self.cargado = True
+            self.ultima_actualizacion = time.time()
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            try:
+                self.refrescar()
+            except Exception as e:
+                logging.error(f"No se pudo refrescar el registro de revocaciones: {str(e)}")
+
+            self._detener.wait(self.intervalo_segundos)
+
+    def iniciar(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name='revocaciones', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def version_vigente(self, usuario_id: int, version: int) -> bool:
+        with self._lock:
+            return version >= self._versiones.get(usuario_id, 0)
+
+    def rol_activo(self, rol_id: int) -> bool:
+        with self._lock:
+            return rol_id not in self._roles_inactivos
+
+    def registrar_version(self, usuario_id: int, version: int):
+        with self._lock:
+            if version > self._versiones.get(usuario_id, 0):
+                self._versiones[usuario_id] = version
+
+    def registrar_estado_rol(self, rol_id: int, activo: bool):
+        with self._lock:
+            self._generacion += 1
+            self._cambios_rol[rol_id] = self._generacion
+
+            if activo:
+                self._roles_inactivos.discard(rol_id)
+            else:
+                self._roles_inactivos.add(rol_id)
+
+
+registro_revocaciones = RegistroRevocaciones(ConfiguracionRevocacion.INTERVALO_SEGUNDOS)
@@ -0,0 +1,35 @@
+import hashlib
+import hmac
+import os
+import secrets
+
+
+class ConfiguracionSesion:
+    SECRETO = os.getenv('AUTH_REFRESH_SECRETO', 'supersecreto123')
+    DURACION_DIAS = int(os.getenv('AUTH_REFRESH_DIAS', '14'))
+
+
+def generar_secreto() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def firmar_secreto(secreto: str) -> str:
+    # HMAC en lugar de bcrypt: el secreto es aleatorio de 256 bits, no hace falta un hash lento
+    return hmac.new(ConfiguracionSesion.SECRETO.encode(), secreto.encode(), hashlib.sha256).hexdigest()
+
+
+def secreto_valido(secreto: str, refresh_hash: str) -> bool:
+    return hmac.compare_digest(firmar_secreto(secreto), refresh_hash)
+
+
+def armar_refresh_token(sesion_id: int, secreto: str) -> str:
+    return f"{sesion_id}.{secreto}"
+
+
+def leer_refresh_token(refresh_token: str) -> tuple[int, str] | None:
+    sesion_id, _, secreto = refresh_token.partition('.')
+
+    if not sesion_id.isdigit() or not secreto:
+        return None
+
+    return int(sesion_id), secreto
@@ -0,0 +1,131 @@
+import io
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple
+
+from pydantic import BaseModel
+from starlette.responses import StreamingResponse
+
+
+class FormatoStream:
+    NDJSON = 'ndjson'
+    JSON = 'json'
+
+
+# Cantidad de registros que se agrupan en cada chunk enviado al cliente
+REGISTROS_POR_CHUNK = 500
+
+# Bytes del ZIP que se acumulan antes de enviarlos al cliente
+BYTES_POR_CHUNK_ZIP = 64 * 1024
+
+
+def serializar_ndjson(modelos: Iterable[BaseModel]) -> Iterator[bytes]:
+    """
+    Un objeto JSON por línea (application/x-ndjson)
+    """
+    lote = []
+
+    for modelo in modelos:
+        lote.append(modelo.model_dump_json())
+
+        if len(lote) >= REGISTROS_POR_CHUNK:
+            yield ('\n'.join(lote) + '\n').encode()
+            lote = []
+
+    if lote:
+        yield ('\n'.join(lote) + '\n').encode()
+
+
+def serializar_json(modelos: Iterable[BaseModel]) -> Iterator[bytes]:
+    """
+    Mismo formato que ResponseList ({"data": [...]}) pero enviado por partes
+    """
+    yield b'{"data":['
+
+    lote = []
+    primero = True
+
+    for modelo in modelos:
+        lote.append(modelo.model_dump_json())
+
+        if len(lote) >= REGISTROS_POR_CHUNK:
+            yield (('' if primero else ',') + ','.join(lote)).encode()
+            primero = False
+            lote = []
+
+    if lote:
+        yield (('' if primero else ',') + ','.join(lote)).encode()
+
+    yield b']}'
+
+
+def respuesta_stream(modelos: Iterable[BaseModel], formato: str = FormatoStream.NDJSON) -> StreamingResponse:
+    if formato == FormatoStream.JSON:
+        return StreamingResponse(serializar_json(modelos), media_type="application/json")
+
+    return StreamingResponse(serializar_ndjson(modelos), media_type="application/x-ndjson")
+
+
+class EntradaZip(NamedTuple):
+    nombre: str
+    tamano: int
+    fecha: datetime
+    bloques: Iterable[bytes]
+
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino no posicionable para zipfile: acumula lo escrito hasta que el generador lo envía.
+    Al no poder volver atrás, zipfile escribe el crc y los tamaños en un data descriptor.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.pendiente = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self.pendiente += datos
+        return len(datos)
+
+    def vaciar(self) -> bytes:
+        datos = bytes(self.pendiente)
+        self.pendiente.clear()
+        return datos
+
+
+def serializar_zip(entradas: Iterable[EntradaZip]) -> Iterator[bytes]:
+    """
+    ZIP armado a medida que llegan las entradas, sin compresión (ZIP_STORED): los PDF ya vienen
+    comprimidos. La memoria depende del tamaño de bloque, no del tamaño del archivo.
+    """
+    salida = _SalidaZip()
+
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        for entrada in entradas:
+            info = zipfile.ZipInfo(entrada.nombre, date_time=entrada.fecha.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            # Con el tamaño conocido zipfile decide si hace falta zip64 antes de escribir
+            info.file_size = entrada.tamano
+
+            with archivo_zip.open(info, 'w') as destino:
+                for bloque in entrada.bloques:
+                    destino.write(bloque)
+
+                    if len(salida.pendiente) >= BYTES_POR_CHUNK_ZIP:
+                        yield salida.vaciar()
+
+            yield salida.vaciar()
+
+    # Directorio central
+    yield salida.vaciar()
+
+
+def respuesta_zip(entradas: Iterable[EntradaZip], filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        serializar_zip(entradas),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
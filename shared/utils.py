@@ -1,11 +1,18 @@
+import os
+import time
+import uuid
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import Optional, Any, List, Dict
+from typing import Optional, Any, List, Dict, Iterator
 
+import asyncpg
 import psycopg2
 from jose import jwt
 from passlib.context import CryptContext
 
-from database.connection import get_connection
+from database.connection import get_connection, obtener_pool_async, ConfiguracionStreaming
+from database.metricas import metricas_consultas
+from database.sentencias import convertir_placeholders, ejecutar_sentencia
 
 
 def snake_to_camel(snake_str: str) -> str:
@@ -17,11 +24,28 @@ def snake_to_camel_dict(row: dict) -> dict:
     return {snake_to_camel(k): v for k, v in row.items()}
 
 
+@lru_cache(maxsize=1024)
+def claves_camel(columnas: tuple) -> tuple:
+    """
+    Calcula una sola vez por forma de consulta las claves camelCase de las columnas
+    """
+    return tuple(snake_to_camel(columna) for columna in columnas)
+
+
+def mapear_filas(columnas: tuple, rows) -> List[Dict[str, Any]]:
+    claves = claves_camel(columnas)
+    return [dict(zip(claves, row)) for row in rows]
+
+
 def execute_query(
         query: str,
         values=None,
-        conn: Optional[psycopg2.extensions.connection] = None
+        conn: Optional[psycopg2.extensions.connection] = None,
+        nombre_sentencia: str | None = None
 ) -> Optional[List[Dict[str, Any]]]:
+    """
+    Con nombre_sentencia la consulta se ejecuta como sentencia preparada de la conexión
+    """
     if values is None:
         values = []
     close_connection = False
@@ -34,19 +58,19 @@ def execute_query(
     result = None
 
     try:
-        cursor.execute(query, values)
+        if nombre_sentencia is not None:
+            ejecutar_sentencia(cursor, query, values, nombre_sentencia)
+        else:
+            cursor.execute(query, values)
 
         if cursor.description:  # es un SELECT
-            columns = [desc[0] for desc in cursor.description]
+            columns = tuple(desc[0] for desc in cursor.description)
             rows = cursor.fetchall()
 
             if rows is None:
                 return None
 
-            result = [
-                snake_to_camel_dict(dict(zip(columns, row)))
-                for row in rows
-            ]
+            result = mapear_filas(columns, rows)
         elif close_connection:
             conn.commit()
 
@@ -62,6 +86,77 @@ def execute_query(
     return result
 
 
+def execute_query_stream(
+        query: str,
+        values=None,
+        conn: Optional[psycopg2.extensions.connection] = None,
+        itersize: int | None = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Ejecuta un SELECT con un cursor con nombre (del lado del servidor) y entrega las filas
+    una a una, trayendo itersize filas por viaje, sin materializar todo el resultado.
+    """
+    if values is None:
+        values = []
+    close_connection = False
+
+    if conn is None:
+        conn = get_connection(solo_lectura=True)
+        close_connection = True
+
+    cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+    cursor.itersize = itersize or ConfiguracionStreaming.ITERSIZE
+
+    try:
+        cursor.execute(query, values)
+
+        claves = None
+        for row in cursor:
+            if claves is None:
+                claves = claves_camel(tuple(desc[0] for desc in cursor.description))
+            yield dict(zip(claves, row))
+
+    finally:
+        cursor.close()
+        if close_connection:
+            conn.rollback()
+            conn.close()
+
+
+async def execute_query_async(
+        query: str,
+        values=None,
+        conn: Optional[asyncpg.Connection] = None
+) -> Optional[List[Dict[str, Any]]]:
+    if values is None:
+        values = []
+
+    if conn is None:
+        pool = await obtener_pool_async()
+        async with pool.acquire() as conexion:
+            async with conexion.transaction():
+                return await execute_query_async(query, values, conexion)
+
+    inicio = time.perf_counter()
+
+    try:
+        sentencia = await conn.prepare(convertir_placeholders(query))
+        atributos = sentencia.get_attributes()
+        rows = await sentencia.fetch(*values)
+    except Exception:
+        metricas_consultas.registrar(query, time.perf_counter() - inicio, error=True)
+        raise
+
+    metricas_consultas.registrar(query, time.perf_counter() - inicio, len(rows))
+
+    if not atributos:  # no es un SELECT
+        return None
+
+    columns = tuple(atributo.name for atributo in atributos)
+
+    return mapear_filas(columns, rows)
+
+
 def formartear_secuencia_insertar_sql(sql, fields) -> str:
     query = f"{sql} ({', '.join(fields)}) values ({', '.join(['%s'] * len(fields))})"
 
@@ -78,12 +173,15 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('AUTH_ACCESS_TOKEN_MINUTOS', '60'))
+
+
 def create_access_token(data: dict):
     secret_key = "supersecreto123"
 
     algorithm = "HS256"
 
-    access_token_expire_minutes = 60
+    access_token_expire_minutes = ACCESS_TOKEN_EXPIRE_MINUTES
 
     to_encode = data.copy()
 
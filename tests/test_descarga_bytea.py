@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import database.contenido as contenido
+from database.connection import ConfiguracionStreaming
+from database.contenido import TABLA_ESTUDIANTE_DOCUMENTO, lector_archivo
+from shared.almacenamiento import etag_archivo
+from shared.descargas import respuesta_descarga, respuesta_no_modificado
+
+CONTENIDO = b'%PDF-1.4 ' + bytes(range(256)) * 4
+MODIFICACION = datetime(2024, 5, 1, 10, 30)
+
+
+class ConexionFalsa:
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def execute_query_falso(sql, values=None, conn=None, nombre_sentencia=None):
+    # Emula "substring(content from %s for %s)" devolviendo memoryview, como psycopg2 con bytea
+    if 'substring' not in sql:
+        return None
+
+    desde, cantidad, _ = values
+    return [{'bloque': memoryview(CONTENIDO[desde - 1:desde - 1 + cantidad])}]
+
+
+def crear_cliente(monkeypatch) -> TestClient:
+    monkeypatch.setattr(contenido, 'get_connection', lambda solo_lectura=False: ConexionFalsa())
+    monkeypatch.setattr(contenido, 'execute_query', execute_query_falso)
+    # Bloques chicos para que la descarga cruce varios substring
+    monkeypatch.setattr(ConfiguracionStreaming, 'BLOQUE_BYTEA', 100)
+
+    app = FastAPI()
+
+    @app.get('/documento')
+    def descargar(request: Request):
+        # Fila sin migrar: sin content_sha256 se lee del bytea
+        metadatos = {'contentSha256': None, 'contentTamano': len(CONTENIDO), 'fechaModificacion': MODIFICACION}
+        etag = etag_archivo(metadatos, 'estudiante_documento:1')
+
+        no_modificado = respuesta_no_modificado(request, etag, MODIFICACION)
+        if no_modificado is not None:
+            return no_modificado
+
+        lector = lector_archivo(TABLA_ESTUDIANTE_DOCUMENTO, 1, metadatos)
+        return respuesta_descarga(request, len(CONTENIDO), lector, 'application/pdf', 'documento.pdf',
+                                  etag=etag, ultima_modificacion=MODIFICACION)
+
+    return TestClient(app)
+
+
+def test_descarga_completa_bytea(monkeypatch):
+    respuesta = crear_cliente(monkeypatch).get('/documento')
+
+    assert respuesta.status_code == 200
+    assert respuesta.headers['content-length'] == str(len(CONTENIDO))
+    assert respuesta.content == CONTENIDO
+
+
+def test_descarga_rango_bytea(monkeypatch):
+    respuesta = crear_cliente(monkeypatch).get('/documento', headers={'Range': 'bytes=50-349'})
+
+    assert respuesta.status_code == 206
+    assert respuesta.headers['content-range'] == f'bytes 50-349/{len(CONTENIDO)}'
+    assert respuesta.content == CONTENIDO[50:350]
+
+
+def test_validador_bytea(monkeypatch):
+    cliente = crear_cliente(monkeypatch)
+    etag = cliente.get('/documento').headers['etag']
+
+    assert cliente.get('/documento', headers={'If-None-Match': etag}).status_code == 304
+
+    respuesta = cliente.get('/documento', headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert respuesta.status_code == 206
+    assert respuesta.content == CONTENIDO[:10]